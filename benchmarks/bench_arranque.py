@@ -0,0 +1,78 @@
+"""
+Presupuesto de tiempo de importación del arranque.
+
+Importa cada módulo en un intérprete nuevo con `python -X importtime`, toma la
+mediana de varias repeticiones y la compara con su presupuesto. También
+comprueba que los módulos de arranque no arrastren dependencias pesadas
+(pandas, openpyxl, matplotlib...), que deben cargarse en diferido. Termina con
+código 1 si algún módulo supera su presupuesto o carga una dependencia prohibida.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_arranque --repeticiones 5
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# módulo -> (presupuesto en ms, dependencias que no debe importar)
+PESADOS = ["pandas", "numpy", "openpyxl", "xlsxwriter", "matplotlib", "seaborn", "pyarrow"]
+PRESUPUESTOS = {
+    "main": (50, PESADOS),
+    "gui.main_window": (150, PESADOS),
+    "processors.excel_processor": (2000, ["openpyxl", "xlsxwriter", "matplotlib", "seaborn"]),
+}
+
+_LINEA = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)")
+
+
+def medir_importacion(modulo: str) -> tuple[float, set]:
+    """Devuelve (ms acumulados de importar el módulo, paquetes de primer nivel cargados)."""
+    codigo = f"import {modulo}"
+    proceso = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), check=True)
+    total, cargados = None, set()
+    for linea in proceso.stderr.splitlines():
+        coincidencia = _LINEA.match(linea)
+        if not coincidencia:
+            continue
+        acumulado, sangria, nombre = coincidencia.groups()
+        cargados.add(nombre.split(".")[0])
+        if nombre == modulo and not sangria:
+            total = int(acumulado) / 1000
+    return total, cargados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--factor", type=float, default=1.0,
+                        help="multiplica los presupuestos (p. ej. 2 en máquinas lentas)")
+    args = parser.parse_args()
+
+    fallos = []
+    print(f"{'Módulo':<30}{'Mediana (ms)':>14}{'Presupuesto':>13}")
+    for modulo, (presupuesto, prohibidos) in PRESUPUESTOS.items():
+        tiempos, cargados = [], set()
+        for _ in range(args.repeticiones):
+            tiempo, cargados = medir_importacion(modulo)
+            tiempos.append(tiempo)
+        mediana = statistics.median(tiempos)
+        limite = presupuesto * args.factor
+        print(f"{modulo:<30}{mediana:>14.1f}{limite:>13.0f}")
+        if mediana > limite:
+            fallos.append(f"{modulo}: {mediana:.1f} ms supera el presupuesto de {limite:.0f} ms")
+        arrastrados = sorted(set(prohibidos) & cargados)
+        if arrastrados:
+            fallos.append(f"{modulo}: importa {', '.join(arrastrados)} al arrancar")
+
+    for fallo in fallos:
+        print(f"FALLO - {fallo}")
+    return 1 if fallos else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,89 @@
+"""
+Benchmark del escritor formateado: escritura celda a celda frente a escritura por filas.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_escritor --filas 50000 --columnas 20
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+from utils.file_utils import FileUtils
+
+
+def escribir_celda_a_celda(writer, sheet_name, df, mask_cambios=None, resaltar=False):
+    """Escritor original: una llamada a worksheet.write y una decisión de formato por celda."""
+    workbook = writer.book
+    worksheet = workbook.add_worksheet(sheet_name)
+    writer.sheets[sheet_name] = worksheet
+
+    formato_general = workbook.add_format({'border': 1})
+    formato_cambio = workbook.add_format({'bg_color': '#FF9999', 'border': 1})
+    formato_header = workbook.add_format({'bold': True, 'bg_color': '#D9D9D9', 'border': 1})
+
+    worksheet.write(0, 0, "Index", formato_header)
+    for row_idx, index_val in enumerate(df.index, start=1):
+        worksheet.write(row_idx, 0, index_val, formato_general)
+
+    for col_idx, col_name in enumerate(df.columns, start=1):
+        worksheet.write(0, col_idx, col_name, formato_header)
+
+    for row_idx in range(df.shape[0]):
+        for col_idx in range(df.shape[1]):
+            valor = df.iat[row_idx, col_idx]
+            formato = formato_general
+            if resaltar:
+                if isinstance(valor, str) and "➔" in valor:
+                    formato = formato_cambio
+                elif mask_cambios is not None and mask_cambios.iat[row_idx, col_idx]:
+                    formato = formato_cambio
+            worksheet.write(row_idx + 1, col_idx + 1, valor, formato)
+
+    worksheet.set_column(0, df.shape[1], 20)
+
+
+def generar_tabla(filas, columnas, tasa_cambio, semilla=0):
+    """Genera una tabla de comparación sintética con una fracción de celdas "anterior ➔ nuevo"."""
+    rng = np.random.default_rng(semilla)
+    valores = rng.integers(0, 1000, size=(filas, columnas)).astype(str).astype(object)
+    mascara = rng.random((filas, columnas)) < tasa_cambio
+    valores[mascara] = [f"{v} ➔ x{v}" for v in valores[mascara]]
+    nombres = [f"col_{j}" for j in range(columnas)]
+    return pd.DataFrame(valores, columns=nombres), pd.DataFrame(mascara, columns=nombres)
+
+
+def medir(escritor, df, mascara, opciones):
+    with tempfile.TemporaryDirectory(prefix="bench_escritor_") as directorio:
+        ruta = os.path.join(directorio, "bench.xlsx")
+        inicio = time.perf_counter()
+        with pd.ExcelWriter(ruta, engine="xlsxwriter", engine_kwargs={"options": opciones}) as writer:
+            escritor(writer, "Comparación Completa", df, mascara, resaltar=True)
+        return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=50000)
+    parser.add_argument("--columnas", type=int, default=20)
+    parser.add_argument("--tasa-cambio", type=float, default=0.02)
+    args = parser.parse_args()
+
+    df, mascara = generar_tabla(args.filas, args.columnas, args.tasa_cambio)
+    celdas = df.size
+    casos = [
+        ("celda a celda", escribir_celda_a_celda, {}),
+        ("por filas", FileUtils.escribir_formateado, {}),
+        ("por filas + constant_memory", FileUtils.escribir_formateado, {"constant_memory": True}),
+    ]
+    print(f"{celdas:,} celdas ({args.filas} filas x {args.columnas} columnas, {args.tasa_cambio:.0%} cambios)")
+    for nombre, escritor, opciones in casos:
+        duracion = medir(escritor, df, mascara, opciones)
+        print(f"{nombre:<30} {duracion:8.2f} s  {celdas / duracion:12,.0f} celdas/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark por etapas de procesar_comparacion sobre un libro sintético.
+
+Mide tiempo de reloj, tiempo de CPU y pico de memoria (tracemalloc) de cada
+etapa y añade el resultado como una línea JSON al archivo de resultados, para
+poder comparar ejecuciones a lo largo del tiempo.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_etapas --filas 50000 --columnas 40 --salida benchmarks/resultados.jsonl
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+from benchmarks.generar_libro import (
+    COLUMNA_ID, HOJA_ACTUAL, HOJA_ANTERIOR, agregar_argumentos, escribir_libro, generar_hojas, parametros
+)
+from processors.excel_charts import insertar_graficos, renderizar_graficos
+from processors.excel_processor import ExcelProcessor
+from processors.historial_store import HistorialStore
+from utils.cache_libros import cache_libros
+
+
+def medir(resultados, etapa, funcion, memoria=True):
+    """Ejecuta funcion() y registra su tiempo y su pico de memoria."""
+    if memoria:
+        tracemalloc.start()
+    inicio, inicio_cpu = time.perf_counter(), time.process_time()
+    valor = funcion()
+    registro = {
+        "etapa": etapa,
+        "segundos": round(time.perf_counter() - inicio, 4),
+        "segundos_cpu": round(time.process_time() - inicio_cpu, 4),
+    }
+    if memoria:
+        registro["pico_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 2)
+        tracemalloc.stop()
+    resultados.append(registro)
+    print(f"{etapa:<30} {registro['segundos']:9.3f} s" + (f" {registro['pico_mb']:10.1f} MB" if memoria else ""))
+    return valor
+
+
+def commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def ejecutar(args) -> dict:
+    with tempfile.TemporaryDirectory(prefix="bench_comparador_") as directorio:
+        return ejecutar_en(args, directorio)
+
+
+def ejecutar_en(args, directorio: str) -> dict:
+    """Genera el libro en `directorio` y mide cada etapa; las salidas quedan en la misma carpeta."""
+    libro = os.path.join(directorio, "libro.xlsx")
+    escribir_libro(libro, *generar_hojas(**parametros(args)))
+
+    processor = ExcelProcessor()
+    memoria = not args.sin_memoria
+    resultados = []
+    mes = "Benchmark"
+
+    cache_libros.limpiar()
+    df1, df2 = medir(resultados, "cargar_datos", lambda: processor.cargar_datos(
+        libro, HOJA_ANTERIOR, HOJA_ACTUAL, args.modo_carga, args.representacion), memoria)
+    df1, df2 = medir(resultados, "alinear_dataframes", lambda: processor.data_utils.alinear_dataframes(
+        df1, df2, COLUMNA_ID, args.alineacion), memoria)
+    mascara = medir(resultados, "calcular_mascara_cambios", lambda: processor.calcular_mascara_cambios(df1, df2), memoria)
+    tabla = medir(resultados, "tabla_comparacion_completa",
+                  lambda: processor.tabla_comparacion_completa(df1, df2, mascara), memoria)
+    historial = medir(resultados, "crear_historial_de_cambios",
+                      lambda: processor.crear_historial_de_cambios(df1, df2, mes, COLUMNA_ID), memoria)
+
+    store = HistorialStore(os.path.join(directorio, "historial.sqlite"))
+    resumen = processor.crear_resumen_informe(historial, mes)
+    medir(resultados, "guardar_historial", lambda: store.guardar_mes(historial, mes, COLUMNA_ID, resumen), memoria)
+
+    comparacion = os.path.join(directorio, "comparacion.xlsx")
+    graficos = medir(resultados, "renderizar_graficos",
+                     lambda: renderizar_graficos(*store.agregados_graficos()), memoria)
+
+    def escribir():
+        with pd.ExcelWriter(comparacion, engine="xlsxwriter",
+                            engine_kwargs={"options": {"constant_memory": True}}) as writer:
+            processor.file_utils.escribir_formateado(writer, "Comparación Completa", tabla, resaltar=True)
+            processor.file_utils.escribir_formateado(writer, "Solo Cambios", tabla.solo_cambios(), resaltar=True)
+            insertar_graficos(writer.book, graficos)
+    medir(resultados, "escribir_formateado", escribir, memoria)
+
+    return {
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit_actual(),
+        "parametros": {**parametros(args), "modo_carga": args.modo_carga, "representacion": args.representacion,
+                       "alineacion": args.alineacion},
+        "entorno": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "plataforma": platform.platform(),
+        },
+        "tamano_libro_mb": round(os.path.getsize(libro) / 1024 / 1024, 2),
+        "cambios_historial": len(historial),
+        "etapas": resultados,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    agregar_argumentos(parser)
+    parser.add_argument("--modo-carga", choices=["pandas", "streaming"], default=None)
+    parser.add_argument("--representacion", choices=["category", "str"], default=None)
+    parser.add_argument("--alineacion", choices=["id", "posicion"], default="id")
+    parser.add_argument("--sin-memoria", action="store_true", help="no usar tracemalloc (tiempos más fieles)")
+    parser.add_argument("--salida", default=os.path.join("benchmarks", "resultados.jsonl"))
+    args = parser.parse_args()
+
+    resultado = ejecutar(args)
+    with open(args.salida, "a", encoding="utf-8") as archivo:
+        archivo.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+    print(f"Resultado añadido a {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark del reparto por fragmentos de columnas: tiempos de la máscara de
+cambios y del historial con un hilo frente a varios, por representación.
+
+Solo las columnas categóricas se reparten entre hilos (ver
+processors/diff_paralelo.py); con la representación "str" ambos casos deben
+tardar lo mismo. La ganancia solo puede aparecer con más de una CPU.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_fragmentos --filas 200000 --columnas 128 --hilos 4
+"""
+
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from benchmarks.generar_libro import COLUMNA_ID, agregar_argumentos, generar_hojas, parametros
+from config.settings import DIFF_CONFIG
+from processors.diff_engine import crear_historial_vectorizado
+from processors.excel_processor import ExcelProcessor
+from utils.data_utils import DataUtils
+
+
+def medir(funcion, repeticiones):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        valor = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, valor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    agregar_argumentos(parser)
+    parser.add_argument("--hilos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    processor = ExcelProcessor()
+    anterior, actual = generar_hojas(**parametros(args))
+    print(f"{args.filas} filas x {args.columnas} columnas, {os.cpu_count()} CPUs, {args.hilos} hilos")
+    for representacion in ("category", "str"):
+        df1 = DataUtils.normalizar_df(anterior, categorico=representacion == "category")
+        df2 = DataUtils.normalizar_df(actual, categorico=representacion == "category")
+        df1, df2 = DataUtils.alinear_dataframes(df1, df2, COLUMNA_ID)
+        etapas = {
+            "mascara": lambda: processor.calcular_mascara_cambios(df1, df2),
+            "historial": lambda: crear_historial_vectorizado(df1, df2, "Bench", COLUMNA_ID),
+        }
+        for nombre, funcion in etapas.items():
+            tiempos, valores = [], []
+            for hilos in (1, args.hilos):
+                DIFF_CONFIG["WORKERS"] = hilos
+                segundos, valor = medir(funcion, args.repeticiones)
+                tiempos.append(segundos)
+                valores.append(valor)
+            iguales = valores[0].equals(valores[1]) if isinstance(valores[0], pd.DataFrame) else True
+            print(f"{representacion:<9} {nombre:<10} 1 hilo {tiempos[0]:7.3f} s  {args.hilos} hilos {tiempos[1]:7.3f} s"
+                  f"  x{tiempos[0] / tiempos[1]:.2f}  {'idénticos' if iguales else 'DIFERENTES'}")
+
+
+if __name__ == "__main__":
+    main()
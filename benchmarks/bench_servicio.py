@@ -0,0 +1,122 @@
+"""
+Benchmark del servicio HTTP local: rendimiento con peticiones concurrentes.
+
+Arranca el servicio en un puerto libre, sube un libro sintético una vez y
+lanza los trabajos desde varios clientes a la vez; cada cliente envía su
+trabajo, consulta su estado hasta que termina y descarga el historial.
+Informa trabajos/s, latencias de envío y de extremo a extremo (p50/p95) y la
+velocidad de transmisión del historial en NDJSON y Arrow.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_servicio --trabajos 16 --clientes 4 --procesos 2 --filas 20000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.generar_libro import (COLUMNA_ID, HOJA_ACTUAL, HOJA_ANTERIOR, agregar_argumentos, escribir_libro,
+                                      generar_hojas, parametros)
+from processors.servicio import ServicioComparacion
+
+
+def peticion(url, datos=None, tipo="application/json"):
+    solicitud = urllib.request.Request(url, data=datos, headers={"Content-Type": tipo} if datos is not None else {})
+    with urllib.request.urlopen(solicitud) as respuesta:
+        return respuesta.read()
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(round(p * (len(valores) - 1))))]
+
+
+def cliente(base, ruta_libro, numero, intervalo):
+    """Envía un trabajo, espera a que termine y devuelve sus tiempos."""
+    config = {"archivo_base": ruta_libro, "sheet_anterior": HOJA_ANTERIOR, "sheet_actual": HOJA_ACTUAL,
+              "id_column": COLUMNA_ID, "titulo": f"Bench {numero}", "mes_actual": "2024-01"}
+    inicio = time.perf_counter()
+    trabajo = json.loads(peticion(f"{base}/trabajos", json.dumps(config).encode("utf-8")))
+    envio = time.perf_counter() - inicio
+    while trabajo["estado"] in ("en_cola", "en_curso"):
+        time.sleep(intervalo)
+        trabajo = json.loads(peticion(f"{base}/trabajos/{trabajo['id']}"))
+    return {"id": trabajo["id"], "estado": trabajo["estado"], "envio": envio,
+            "total": time.perf_counter() - inicio, "proceso": trabajo.get("segundos") or 0.0}
+
+
+def medir_historial(base, identificador, formato):
+    inicio = time.perf_counter()
+    cuerpo = peticion(f"{base}/trabajos/{identificador}/historial?formato={formato}")
+    duracion = time.perf_counter() - inicio
+    if formato == "arrow":
+        import pyarrow as pa
+        filas = pa.ipc.open_stream(cuerpo).read_all().num_rows
+    else:
+        filas = cuerpo.count(b"\n")
+    return filas, len(cuerpo), duracion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trabajos", type=int, default=16)
+    parser.add_argument("--clientes", type=int, default=4)
+    parser.add_argument("--procesos", type=int, default=None)
+    parser.add_argument("--intervalo", type=float, default=0.05, help="segundos entre consultas de estado")
+    agregar_argumentos(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_servicio_") as temporal:
+        ruta_libro = os.path.join(temporal, "libro.xlsx")
+        escribir_libro(ruta_libro, *generar_hojas(**parametros(args)))
+
+        inicio = time.perf_counter()
+        servicio = ServicioComparacion(puerto=0, procesos=args.procesos, directorio=os.path.join(temporal, "servicio"))
+        host, puerto = servicio.iniciar()
+        arranque = time.perf_counter() - inicio
+        hilo = threading.Thread(target=servicio.servir, daemon=True)
+        hilo.start()
+        base = f"http://{host}:{puerto}"
+        try:
+            with open(ruta_libro, "rb") as archivo:
+                contenido = archivo.read()
+            inicio = time.perf_counter()
+            ruta_subida = json.loads(peticion(f"{base}/archivos?nombre=libro.xlsx", contenido,
+                                              "application/octet-stream"))["ruta"]
+            subida = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.clientes) as clientes:
+                resultados = list(clientes.map(lambda numero: cliente(base, ruta_subida, numero, args.intervalo),
+                                               range(args.trabajos)))
+            duracion = time.perf_counter() - inicio
+            correctos = [resultado for resultado in resultados if resultado["estado"] == "ok"]
+
+            print(f"{args.filas} filas x {args.columnas} columnas, {args.trabajos} trabajos, "
+                  f"{args.clientes} clientes, {servicio.procesos} procesos")
+            print(f"{'arranque del pool':<28} {arranque:8.2f} s")
+            print(f"{'subida':<28} {subida:8.2f} s  {len(contenido) / subida / 2 ** 20:10.1f} MB/s")
+            print(f"{'trabajos correctos':<28} {len(correctos):8d} / {len(resultados)}")
+            print(f"{'rendimiento':<28} {len(resultados) / duracion:8.2f} trabajos/s")
+            for clave, nombre in (("envio", "envío"), ("total", "extremo a extremo"), ("proceso", "en el proceso")):
+                valores = [resultado[clave] for resultado in resultados]
+                print(f"{nombre + ' p50 / p95':<28} {percentil(valores, 0.5):8.3f} / {percentil(valores, 0.95):.3f} s"
+                      f"  (media {statistics.mean(valores):.3f} s)")
+
+            if correctos:
+                for formato in ("ndjson", "arrow"):
+                    filas, octetos, segundos = medir_historial(base, correctos[0]["id"], formato)
+                    print(f"{'historial ' + formato:<28} {segundos:8.3f} s  {filas / segundos:10,.0f} filas/s"
+                          f"  ({octetos / 2 ** 20:.1f} MB, {filas} filas)")
+        finally:
+            servicio.detener()
+
+
+if __name__ == "__main__":
+    main()
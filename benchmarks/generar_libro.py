@@ -0,0 +1,108 @@
+"""
+Generador de libros Excel sintéticos con dos hojas (anterior y actual) para los benchmarks.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.generar_libro salida.xlsx --filas 100000 --columnas 40
+"""
+
+import argparse
+import numpy as np
+import pandas as pd
+
+HOJA_ANTERIOR = "Anterior"
+HOJA_ACTUAL = "Actual"
+COLUMNA_ID = "ID"
+
+
+def generar_hojas(filas=10000, columnas=20, tasa_cambio=0.02, tasa_nuevos=0.01, tasa_eliminados=0.01,
+                  cardinalidad=50, tasa_ids_vacios=0.0, semilla=0) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Genera las hojas anterior y actual.
+    tasa_cambio: fracción de celdas modificadas en los registros comunes
+    tasa_nuevos / tasa_eliminados: fracción de registros añadidos / eliminados
+    cardinalidad: valores distintos por columna
+    tasa_ids_vacios: fracción de filas sin ID en cada hoja
+    """
+    rng = np.random.default_rng(semilla)
+    nombres = [f"Campo {j}" for j in range(columnas)]
+    vocabulario = np.array([f"valor {k}" for k in range(cardinalidad)], dtype=object)
+
+    def valores(n):
+        return vocabulario[rng.integers(0, cardinalidad, size=(n, columnas))]
+
+    anterior = pd.DataFrame(valores(filas), columns=nombres)
+    anterior.insert(0, COLUMNA_ID, [f"R{i:08d}" for i in range(filas)])
+
+    # Registros eliminados y modificaciones sobre los que permanecen
+    eliminados = rng.random(filas) < tasa_eliminados
+    actual = anterior[~eliminados].reset_index(drop=True)
+    datos = actual[nombres].to_numpy()
+    cambios = rng.random(datos.shape) < tasa_cambio
+    datos[cambios] = vocabulario[(rng.integers(1, cardinalidad, size=cambios.sum()))]
+    actual[nombres] = datos
+
+    nuevos = int(filas * tasa_nuevos)
+    if nuevos:
+        agregados = pd.DataFrame(valores(nuevos), columns=nombres)
+        agregados.insert(0, COLUMNA_ID, [f"N{i:08d}" for i in range(nuevos)])
+        actual = pd.concat([actual, agregados], ignore_index=True)
+
+    for hoja in (anterior, actual):
+        hoja.loc[rng.random(len(hoja)) < tasa_ids_vacios, COLUMNA_ID] = None
+    return anterior, actual
+
+
+def escribir_libro(ruta, anterior, actual):
+    """
+    Escribe ambas hojas en un único libro. Se escribe fila a fila porque en modo
+    constant_memory xlsxwriter descarta las celdas de filas ya volcadas, y
+    DataFrame.to_excel escribe por columnas.
+    """
+    import xlsxwriter
+
+    libro = xlsxwriter.Workbook(ruta, {"constant_memory": True})
+    try:
+        for nombre, hoja in ((HOJA_ANTERIOR, anterior), (HOJA_ACTUAL, actual)):
+            hoja_excel = libro.add_worksheet(nombre)
+            hoja_excel.write_row(0, 0, list(hoja.columns))
+            for i, fila in enumerate(hoja.itertuples(index=False, name=None), start=1):
+                hoja_excel.write_row(i, 0, [None if pd.isna(valor) else valor for valor in fila])
+    finally:
+        libro.close()
+
+
+def agregar_argumentos(parser):
+    parser.add_argument("--filas", type=int, default=10000)
+    parser.add_argument("--columnas", type=int, default=20)
+    parser.add_argument("--tasa-cambio", type=float, default=0.02)
+    parser.add_argument("--tasa-nuevos", type=float, default=0.01)
+    parser.add_argument("--tasa-eliminados", type=float, default=0.01)
+    parser.add_argument("--cardinalidad", type=int, default=50)
+    parser.add_argument("--tasa-ids-vacios", type=float, default=0.0)
+    parser.add_argument("--semilla", type=int, default=0)
+
+
+def parametros(args) -> dict:
+    return {
+        "filas": args.filas,
+        "columnas": args.columnas,
+        "tasa_cambio": args.tasa_cambio,
+        "tasa_nuevos": args.tasa_nuevos,
+        "tasa_eliminados": args.tasa_eliminados,
+        "cardinalidad": args.cardinalidad,
+        "tasa_ids_vacios": args.tasa_ids_vacios,
+        "semilla": args.semilla,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("salida")
+    agregar_argumentos(parser)
+    args = parser.parse_args()
+    escribir_libro(args.salida, *generar_hojas(**parametros(args)))
+    print(f"Libro generado: {args.salida} (hojas '{HOJA_ANTERIOR}' y '{HOJA_ACTUAL}', ID '{COLUMNA_ID}')")
+
+
+if __name__ == "__main__":
+    main()
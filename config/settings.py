@@ -7,14 +7,135 @@ APP_CONFIG = {
     "TITLE": "Comparador de Tablas Excel",
     "VERSION": "1.0.0",
     "WINDOW_SIZE": "800x650",
-    "DEFAULT_PROJECT_TITLE": "Propiedades"
+    "DEFAULT_PROJECT_TITLE": "Propiedades",
+    # Módulos que la interfaz importa en segundo plano tras mostrar la ventana
+    "PRELOAD_MODULES": ["processors.excel_processor", "openpyxl", "xlsxwriter"]
 }
 
 # Configuraciones de archivos
 FILE_CONFIG = {
-    "EXCEL_EXTENSIONS": [".xlsx", ".xls"],
+    # Formatos de entrada admitidos (ver utils/fuentes.py)
+    "EXCEL_EXTENSIONS": [".xlsx", ".xls", ".csv", ".parquet", ".pq", ".feather", ".arrow", ".ipc"],
+    "CSV_DELIMITER": ",",
+    "CSV_ENCODING": "utf-8",
     "MAX_FILE_SIZE_MB": 100,
-    "OUTPUT_ENCODING": "utf-8"
+    # Filas que se leen al sondear un archivo para proponer la columna ID
+    "PROBE_ROWS": 500,
+    "OUTPUT_ENCODING": "utf-8",
+    # "pandas" usa pd.read_excel; "streaming" lee fila a fila en modo solo lectura;
+    # "externo" ordena ambas hojas en disco y solo genera el historial (memoria acotada)
+    "LOAD_MODE": "pandas",
+    "STREAM_CHUNK_ROWS": 50000,
+    # "category" codifica cada columna como diccionario (pd.Categorical); "str" usa texto plano
+    "REPRESENTATION": "category"
+}
+
+# Etapas de la comparación que se notifican a la barra de progreso; el modo externo tiene menos
+STAGE_CONFIG = {
+    "TOTAL": 7,
+    "EXTERNAL": 3
+}
+
+# Caché de hojas ya leídas (compartida por la interfaz y el procesador)
+CACHE_CONFIG = {
+    "MAX_MB": 1024
+}
+
+# Comparación: emparejamiento de filas y reparto por fragmentos de columnas
+DIFF_CONFIG = {
+    # "id" empareja las filas por la columna ID; "posicion" por número de fila
+    "ALIGN_MODE": "id",
+    # Hilos para comparar columnas categóricas (None = número de CPUs); las de
+    # texto retienen el GIL y se comparan siempre en el hilo que llama
+    "WORKERS": None,
+    # Por debajo de este número de columnas categóricas se compara en un solo hilo
+    "PARALLEL_MIN_COLUMNS": 64,
+    "SHARDS_PER_WORKER": 2,
+    # Modo externo: filas por tramo ordenado en disco, tramos fusionados a la vez
+    # y carpeta temporal (None = la del sistema)
+    "EXTERNAL_RUN_ROWS": 200000,
+    "EXTERNAL_MAX_OPEN_RUNS": 64,
+    "EXTERNAL_TEMP_DIR": None
+}
+
+# Instantáneas de la hoja actual de cada periodo (Feather), reutilizadas como
+# hoja anterior en la ejecución del periodo siguiente (config["mes_anterior"])
+SNAPSHOT_CONFIG = {
+    "ENABLED": True,
+    # Subcarpeta del directorio de salida
+    "DIRECTORY": "instantaneas"
+}
+
+# Gráficos del historial (hoja "Gráficos" del libro de comparación)
+CHART_CONFIG = {
+    "ENABLED": False,
+    "DPI": 100,
+    "TOP_COLUMNS": 10
+}
+
+# Vista previa: estimación del resultado a partir de una muestra de IDs
+ESTIMATE_CONFIG = {
+    # IDs con menor hash cuyas filas se comparan en cada hoja
+    "SAMPLE_ROWS": 2000,
+    # Nivel de confianza de los intervalos
+    "CONFIDENCE": 0.95,
+    "TOP_COLUMNS": 10
+}
+
+# Vigilancia de carpeta (python main.py --vigilar config.json)
+WATCH_CONFIG = {
+    # Intervalo de sondeo de la carpeta
+    "POLL_SECONDS": 5,
+    # Segundos sin cambios de tamaño ni fecha antes de dar un archivo por terminado
+    "STABLE_SECONDS": 10,
+    # Trabajos pendientes como máximo; el resto espera en la carpeta
+    "MAX_QUEUE": 100,
+    # Cada cuánto se añade una línea de estado (cola, en curso, rendimiento)
+    "STATUS_SECONDS": 60,
+    "STATUS_FILE": "estado_vigilancia.jsonl",
+    # Periodo en el nombre del archivo (primer grupo), p. ej. 'Ventas 2024-05.xlsx'
+    "PERIOD_PATTERN": r"(\d{4}[-_]\d{2})"
+}
+
+# Servicio HTTP local de comparaciones
+SERVICE_CONFIG = {
+    # Solo escucha en la máquina local; no tiene autenticación
+    "HOST": "127.0.0.1",
+    "PORT": 8765,
+    # Carpeta de los archivos subidos ('<carpeta>/archivos') y de las salidas de
+    # cada trabajo ('<carpeta>/trabajos/<id>'); directorio_salida solo puede
+    # nombrar una subcarpeta de '<carpeta>/trabajos'
+    "DIRECTORY": "servicio",
+    # Trabajos en cola o en curso como máximo; el resto se rechaza con 503
+    "MAX_PENDING": 200,
+    # Trabajos terminados que se conservan para consultar su estado; al descartar
+    # uno se borran su carpeta de salida y los archivos subidos que ya no se usan
+    "MAX_FINISHED": 1000,
+    # Segundos que se conserva un archivo subido que ningún trabajo ha usado
+    "UPLOAD_TTL_SECONDS": 3600,
+    # Módulos que cada proceso del pool importa al arrancar
+    "PRELOAD_MODULES": ["pandas", "openpyxl", "processors.excel_processor"],
+    # Filas por bloque al transmitir el historial (NDJSON o Arrow)
+    "STREAM_ROWS": 10000,
+    # Tamaño máximo de un archivo subido
+    "MAX_UPLOAD_MB": 512
+}
+
+# Registro de operaciones de la interfaz
+LOG_CONFIG = {
+    # Intervalo (ms) entre volcados del registro al widget: como mucho 10 por segundo
+    "FLUSH_MS": 100,
+    # Líneas que conserva el widget; el registro completo se guarda en '<titulo>-<mes>.log'
+    "MAX_LINES": 2000,
+    # IDs de nuevas filas que se listan como muestra (0 = solo el recuento)
+    "NEW_ROWS_SAMPLE": 20
+}
+
+# Instrumentación por etapas de la comparación
+METRICS_CONFIG = {
+    "ENABLED": False,
+    # tracemalloc ralentiza notablemente el proceso; solo se activa a demanda
+    "TRACE_MEMORY": False
 }
 
 # Configuraciones de formato Excel
@@ -22,7 +143,9 @@ EXCEL_FORMAT = {
     "HEADER_COLOR": "#D9D9D9",
     "CHANGE_COLOR": "#FF9999",
     "BORDER_STYLE": 1,
-    "COLUMN_WIDTH": 20
+    "COLUMN_WIDTH": 20,
+    # Escribe los libros de comparación fila a fila sin mantenerlos en memoria
+    "CONSTANT_MEMORY": True
 }
 
 # Mensajes de la aplicación
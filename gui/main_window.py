@@ -6,12 +6,18 @@ and execute the comparison process.
 """
 
 import os
+import queue
 import datetime
+import importlib
+import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import pandas as pd
 
-from processors.excel_processor import ExcelProcessor
+from config.settings import APP_CONFIG, FILE_CONFIG, LOG_CONFIG, STAGE_CONFIG
+from gui.registro_log import RegistroLog
+
+# pandas, openpyxl and xlsxwriter are not imported here: the window is shown
+# first and those modules are imported in the background (see _precargar_modulos)
 
 
 class ComparadorExcelApp:
@@ -25,11 +31,16 @@ class ComparadorExcelApp:
         
         # Variables to hold user inputs
         self.archivo_excel = tk.StringVar()
+        self.archivo_anterior = tk.StringVar()
+        self.mes_anterior = tk.StringVar()
         self.directorio_salida = tk.StringVar()
         self.directorio_salida.set(os.getcwd())  # Current directory by default
         self.titulo_proyecto = tk.StringVar(value="Name of the Project")
         self.columna_id = tk.StringVar()
         self.mes_actual = tk.StringVar(value=datetime.datetime.now().strftime("%B"))
+        self.exportar_historial = tk.BooleanVar(value=False)
+        self.registrar_metricas = tk.BooleanVar(value=False)
+        self.generar_graficos = tk.BooleanVar(value=False)
         
         # Lists for sheets and columns
         self.hojas_disponibles = []
@@ -37,11 +48,40 @@ class ComparadorExcelApp:
         self.hoja_anterior = tk.StringVar()
         self.hoja_actual = tk.StringVar()
         
-        # Initialize the Excel processor
-        self.processor = ExcelProcessor()
+        # The Excel processor is created on first use (it imports pandas)
+        self._processor = None
+
+        # Background worker state: the worker only talks to the UI through this queue
+        self.cola_eventos = queue.Queue()
+        self.evento_cancelar = threading.Event()
+        self.hilo_comparacion = None
 
         # Create the interface
         self.crear_interfaz()
+
+        # Warm up the heavy modules once the window is on screen
+        self.root.after_idle(self._iniciar_precarga)
+
+    @property
+    def processor(self):
+        """Excel processor, imported and created on first use"""
+        if self._processor is None:
+            from processors.excel_processor import ExcelProcessor
+            self._processor = ExcelProcessor()
+        return self._processor
+
+    def _iniciar_precarga(self):
+        """Starts the background import of the heavy modules"""
+        threading.Thread(target=self._precargar_modulos, daemon=True).start()
+
+    @staticmethod
+    def _precargar_modulos():
+        """Imports the modules listed in APP_CONFIG["PRELOAD_MODULES"]; failures are left for first use"""
+        for modulo in APP_CONFIG["PRELOAD_MODULES"]:
+            try:
+                importlib.import_module(modulo)
+            except ImportError:
+                pass
         
     def crear_interfaz(self):
         """Create all user interface elements"""
@@ -75,7 +115,7 @@ class ComparadorExcelApp:
     
     def _crear_seccion_archivo(self, parent):
         """Create the file selection section"""
-        ttk.Label(parent, text="Excel File:").grid(row=1, column=0, sticky=tk.W)
+        ttk.Label(parent, text="Data File:").grid(row=1, column=0, sticky=tk.W)
         ttk.Entry(parent, textvariable=self.archivo_excel, width=50).grid(
             row=1, column=1, sticky=tk.W+tk.E)
         ttk.Button(parent, text="Browse...", command=self.seleccionar_archivo).grid(
@@ -105,17 +145,31 @@ class ComparadorExcelApp:
         sheets_frame = ttk.LabelFrame(parent, text="Sheet Selection")
         sheets_frame.grid(row=5, column=0, columnspan=3, sticky=tk.W+tk.E, pady=10)
 
-        ttk.Label(sheets_frame, text="Previous Sheet:").grid(
+        # Optional separate file for the previous snapshot (otherwise both sheets come from the data file)
+        ttk.Label(sheets_frame, text="Previous File (optional):").grid(
             row=0, column=0, sticky=tk.W, padx=5, pady=5)
+        ttk.Entry(sheets_frame, textvariable=self.archivo_anterior, width=40).grid(
+            row=0, column=1, sticky=tk.W+tk.E, padx=5, pady=5)
+        ttk.Button(sheets_frame, text="Browse...", command=self.seleccionar_archivo_anterior).grid(
+            row=0, column=2, padx=5)
+
+        ttk.Label(sheets_frame, text="Previous Sheet:").grid(
+            row=1, column=0, sticky=tk.W, padx=5, pady=5)
         self.combo_anterior = ttk.Combobox(sheets_frame, textvariable=self.hoja_anterior, 
                                            state="readonly", width=40)
-        self.combo_anterior.grid(row=0, column=1, sticky=tk.W+tk.E, padx=5, pady=5)
+        self.combo_anterior.grid(row=1, column=1, sticky=tk.W+tk.E, padx=5, pady=5)
 
         ttk.Label(sheets_frame, text="Current Sheet:").grid(
-            row=1, column=0, sticky=tk.W, padx=5, pady=5)
+            row=2, column=0, sticky=tk.W, padx=5, pady=5)
         self.combo_actual = ttk.Combobox(sheets_frame, textvariable=self.hoja_actual, 
                                          state="readonly", width=40)
-        self.combo_actual.grid(row=1, column=1, sticky=tk.W+tk.E, padx=5, pady=5)
+        self.combo_actual.grid(row=2, column=1, sticky=tk.W+tk.E, padx=5, pady=5)
+
+        # Previous period: reuse the snapshot saved by that run instead of parsing the previous sheet
+        ttk.Label(sheets_frame, text="Previous Period (snapshot):").grid(
+            row=3, column=0, sticky=tk.W, padx=5, pady=5)
+        ttk.Entry(sheets_frame, textvariable=self.mes_anterior, width=40).grid(
+            row=3, column=1, sticky=tk.W+tk.E, padx=5, pady=5)
     
     def _crear_seccion_columna_id(self, parent):
         """Create the ID column selection section"""
@@ -138,29 +192,67 @@ class ComparadorExcelApp:
         button_frame = ttk.Frame(parent)
         button_frame.grid(row=8, column=0, columnspan=3, pady=10)
 
-        ttk.Button(button_frame, text="Run Comparison", 
-                   command=self.ejecutar_comparacion).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(button_frame, text="Export full history to Excel",
+                        variable=self.exportar_historial).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(button_frame, text="Stage metrics",
+                        variable=self.registrar_metricas).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(button_frame, text="Charts",
+                        variable=self.generar_graficos).pack(side=tk.LEFT, padx=5)
+        self.boton_estimar = ttk.Button(button_frame, text="Estimate",
+                                        command=self.estimar_comparacion)
+        self.boton_estimar.pack(side=tk.LEFT, padx=5)
+        self.boton_ejecutar = ttk.Button(button_frame, text="Run Comparison",
+                                         command=self.ejecutar_comparacion)
+        self.boton_ejecutar.pack(side=tk.LEFT, padx=5)
+        self.boton_cancelar = ttk.Button(button_frame, text="Cancel", state=tk.DISABLED,
+                                         command=self.cancelar_comparacion)
+        self.boton_cancelar.pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Exit", 
                    command=self.root.destroy).pack(side=tk.LEFT, padx=5)
+
+        # Progress bar fed by the processor stages
+        self.progreso = ttk.Progressbar(parent, mode="determinate")
+        self.progreso.grid(row=9, column=0, columnspan=3, sticky=tk.W+tk.E)
+        self.etiqueta_progreso = ttk.Label(parent, text="")
+        self.etiqueta_progreso.grid(row=10, column=0, columnspan=3, sticky=tk.W)
     
     def _crear_seccion_log(self, parent):
         """Create the log section"""
         log_frame = ttk.LabelFrame(parent, text="Operation Log")
-        log_frame.grid(row=9, column=0, columnspan=3, sticky=tk.W+tk.E+tk.N+tk.S, pady=10)
+        log_frame.grid(row=11, column=0, columnspan=3, sticky=tk.W+tk.E+tk.N+tk.S, pady=10)
 
         # Text widget for the log
-        self.log_text = tk.Text(log_frame, height=10, width=80, wrap=tk.WORD)
+        self.log_text = tk.Text(log_frame, height=10, width=80, wrap=tk.WORD, font=("Courier", 9))
         self.log_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        # Batched sink: one insert per flush and a bounded number of lines in the widget
+        self.registro_log = RegistroLog(self.log_text, LOG_CONFIG["MAX_LINES"])
     
-    def seleccionar_archivo(self):
-        """Open the file explorer to select the Excel file"""
-        archivo = filedialog.askopenfilename(
-            title="Select Excel file",
-            filetypes=[("Excel Files", "*.xlsx;*.xls")]
+    def _pedir_archivo_datos(self, titulo):
+        """Ask for a data file in any of the supported formats"""
+        extensiones = FILE_CONFIG["EXCEL_EXTENSIONS"]
+        return filedialog.askopenfilename(
+            title=titulo,
+            filetypes=[("Data Files", ";".join(f"*{ext}" for ext in extensiones)),
+                       ("Excel Files", "*.xlsx;*.xls"),
+                       ("CSV Files", "*.csv"),
+                       ("Parquet Files", "*.parquet;*.pq"),
+                       ("Feather / Arrow Files", "*.feather;*.arrow;*.ipc")]
         )
+
+    def seleccionar_archivo(self):
+        """Open the file explorer to select the data file"""
+        archivo = self._pedir_archivo_datos("Select data file")
         if archivo:
             self.archivo_excel.set(archivo)
             self.log("Archivo seleccionado: " + archivo)
+
+    def seleccionar_archivo_anterior(self):
+        """Open the file explorer to select the optional previous snapshot file"""
+        archivo = self._pedir_archivo_datos("Select previous snapshot file")
+        if archivo:
+            self.archivo_anterior.set(archivo)
+            self.log("Archivo anterior seleccionado: " + archivo)
     
     def seleccionar_directorio(self):
         """Open the file explorer to select the output directory"""
@@ -171,100 +263,246 @@ class ComparadorExcelApp:
             self.directorio_salida.set(directorio)
             self.log("Output directory: " + directorio)
 
+    def _en_segundo_plano(self, trabajo, al_terminar):
+        """Runs trabajo() in a worker thread and calls al_terminar(resultado, error) back on the Tk loop"""
+        respuesta = queue.Queue(maxsize=1)
+
+        def ejecutar():
+            try:
+                respuesta.put((trabajo(), None))
+            except Exception as e:
+                respuesta.put((None, e))
+
+        def comprobar():
+            try:
+                resultado, error = respuesta.get_nowait()
+            except queue.Empty:
+                self.root.after(LOG_CONFIG["FLUSH_MS"], comprobar)
+                return
+            al_terminar(resultado, error)
+
+        threading.Thread(target=ejecutar, daemon=True).start()
+        self.root.after(LOG_CONFIG["FLUSH_MS"], comprobar)
+
     def cargar_hojas(self):
-        """Load the available sheets from the selected Excel file"""
+        """Load the available sheets from the selected file, without blocking the window"""
         archivo = self.archivo_excel.get()
         if not archivo:
-            messagebox.showerror("Error", "Please select an Excel file first")
+            messagebox.showerror("Error", "Please select a data file first")
             return
-        
-        try:
-            # Load available sheets
-            excel = pd.ExcelFile(archivo)
-            self.hojas_disponibles = excel.sheet_names
-            
-            # Update the combo boxes with available sheets
-            self.combo_anterior['values'] = self.hojas_disponibles
-            self.combo_actual['values'] = self.hojas_disponibles
+        archivo_anterior = self.archivo_anterior.get()
 
-            # Select the first two sheets if there are at least two
-            if len(self.hojas_disponibles) >= 2:
-                self.hoja_anterior.set(self.hojas_disponibles[0])
-                self.hoja_actual.set(self.hojas_disponibles[1])
-            elif len(self.hojas_disponibles) == 1:
-                self.hoja_anterior.set(self.hojas_disponibles[0])
-                self.hoja_actual.set(self.hojas_disponibles[0])
+        def trabajo():
+            from utils.cache_libros import cache_libros
 
-            # Load the columns from the first sheet
-            self.cargar_columnas()
+            # Only the workbook manifest is read (see utils/lector_xlsx.py)
+            hojas = cache_libros.nombres_hojas(archivo)
+            return hojas, cache_libros.nombres_hojas(archivo_anterior) if archivo_anterior else hojas
 
-            self.log(f"Loaded {len(self.hojas_disponibles)} sheets from the file")
+        self.log("Reading the file structure...")
+        self._en_segundo_plano(trabajo, self._hojas_cargadas)
+
+    def _hojas_cargadas(self, resultado, error):
+        """Fills the sheet combo boxes once the worker has read the sheet names"""
+        if error is not None:
+            messagebox.showerror("Error", f"Error al cargar el archivo: {str(error)}")
+            self.log(f"ERROR: {str(error)}")
+            return
+
+        self.hojas_disponibles, hojas_anteriores = resultado
+        if not self.hojas_disponibles or not hojas_anteriores:
+            # Clear the previous selection so a stale sheet is not compared
+            self.combo_anterior['values'] = self.combo_actual['values'] = ()
+            self.hoja_anterior.set("")
+            self.hoja_actual.set("")
+            self.log("ERROR: The selected file has no sheets to compare")
+            return
+
+        # Update the combo boxes with available sheets
+        self.combo_anterior['values'] = hojas_anteriores
+        self.combo_actual['values'] = self.hojas_disponibles
+
+        # With a separate previous file, use the first sheet of each file
+        if self.archivo_anterior.get():
+            self.hoja_anterior.set(hojas_anteriores[0])
+            self.hoja_actual.set(self.hojas_disponibles[0])
+        # Select the first two sheets if there are at least two
+        elif len(self.hojas_disponibles) >= 2:
+            self.hoja_anterior.set(self.hojas_disponibles[0])
+            self.hoja_actual.set(self.hojas_disponibles[1])
+        elif len(self.hojas_disponibles) == 1:
+            self.hoja_anterior.set(self.hojas_disponibles[0])
+            self.hoja_actual.set(self.hojas_disponibles[0])
+
+        self.log(f"Loaded {len(self.hojas_disponibles)} sheets from the file")
+
+        # Load the columns from the current sheet
+        self.cargar_columnas()
 
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al cargar el archivo: {str(e)}")
-            self.log(f"ERROR: {str(e)}")
-    
     def cargar_columnas(self):
-        """Load the available columns in the selected sheet"""
+        """Load the columns of the selected sheet and rank the ID candidates, without blocking the window"""
         archivo = self.archivo_excel.get()
         hoja = self.hoja_actual.get()
         
         if not archivo or not hoja:
             return
-        
-        try:
-            # Load the columns
-            df = pd.read_excel(archivo, sheet_name=hoja, nrows=0)
-            self.columnas_disponibles = df.columns.tolist()
 
-            # Update the ID columns combo box
-            self.combo_id['values'] = self.columnas_disponibles
+        def trabajo():
+            from utils.cache_libros import cache_libros
+            from utils.data_utils import DataUtils
 
-            # Try to automatically select a suitable ID column
-            id_columns = [col for col in self.columnas_disponibles if 'id' in col.lower()]
-            if id_columns:
-                self.columna_id.set(id_columns[0])
-            elif self.columnas_disponibles:
-                self.columna_id.set(self.columnas_disponibles[0])
+            # Header, dimension and a small sample of rows only
+            columnas, muestra, filas = cache_libros.sondeo(archivo, hoja)
+            return columnas, DataUtils.ordenar_columnas_id(muestra), len(muestra), filas
 
-            self.log(f"Loaded {len(self.columnas_disponibles)} columns from the sheet '{hoja}'")
+        self._en_segundo_plano(trabajo, lambda resultado, error: self._columnas_cargadas(hoja, resultado, error))
 
-        except Exception as e:
-            messagebox.showerror("Error", f"Error loading columns: {str(e)}")
-            self.log(f"ERROR: {str(e)}")
+    def _columnas_cargadas(self, hoja, resultado, error):
+        """Fills the ID combo box and selects the most unique column of the sample"""
+        if error is not None:
+            messagebox.showerror("Error", f"Error loading columns: {str(error)}")
+            self.log(f"ERROR: {str(error)}")
+            return
+
+        self.columnas_disponibles, candidatas, filas_muestra, filas = resultado
+        self.combo_id['values'] = self.columnas_disponibles
+        if candidatas:
+            self.columna_id.set(candidatas[0][0])
+
+        tamano = f" (~{filas} rows)" if filas is not None else ""
+        self.log(f"Loaded {len(self.columnas_disponibles)} columns from the sheet '{hoja}'{tamano}")
+        if candidatas and filas_muestra:
+            resumen = ", ".join(f"{col} ({proporcion:.0%} unique)" for col, proporcion in candidatas[:3])
+            self.log(f"ID candidates in the first {filas_muestra} rows: {resumen}")
     
     def log(self, mensaje):
         """Adds a message to the log with date and time"""
-        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-        self.log_text.insert(tk.END, f"[{timestamp}] {mensaje}\n")
-        self.log_text.see(tk.END)  # Auto-scroll to the end
+        self.registro_log.agregar(mensaje)
+        self.registro_log.volcar()
 
-    def ejecutar_comparacion(self):
-        """Executes the comparison process with the selected parameters"""
-        # Validate that all necessary fields are filled
-        if not self.validar_campos():
-            return
-            
-        # Configure the processing
-        config = {
+    def _leer_configuracion(self):
+        """Collects the processing parameters from the form"""
+        return {
             "archivo_base": self.archivo_excel.get(),
+            "archivo_anterior": self.archivo_anterior.get() or None,
             "titulo": self.titulo_proyecto.get(),
             "mes_actual": self.mes_actual.get(),
+            "mes_anterior": self.mes_anterior.get() or None,
             "sheet_anterior": self.hoja_anterior.get(),
             "sheet_actual": self.hoja_actual.get(),
             "id_column": self.columna_id.get(),
-            "directorio_salida": self.directorio_salida.get()
+            "directorio_salida": self.directorio_salida.get(),
+            "exportar_historial": self.exportar_historial.get(),
+            "metricas": self.registrar_metricas.get(),
+            "graficos": self.generar_graficos.get()
         }
+
+    def estimar_comparacion(self):
+        """Estimates the comparison result from a sample, in a worker thread"""
+        if not self.validar_campos():
+            return
+
+        config = self._leer_configuracion()
+        self.log("Estimating the comparison from a sample...")
+        self.boton_ejecutar.config(state=tk.DISABLED)
+        self.boton_estimar.config(state=tk.DISABLED)
+        self.hilo_comparacion = threading.Thread(
+            target=self._trabajo_estimacion, args=(config,), daemon=True)
+        self.hilo_comparacion.start()
+        self.root.after(LOG_CONFIG["FLUSH_MS"], self._procesar_cola_eventos)
+
+    def _trabajo_estimacion(self, config):
+        """Runs in the worker thread; the estimate goes through the event queue"""
+        try:
+            estimacion = self.processor.estimar_comparacion(
+                config, log_func=lambda mensaje: self.cola_eventos.put(("log", mensaje)))
+            self.cola_eventos.put(("estimacion", estimacion))
+        except Exception as e:
+            self.cola_eventos.put(("error", e))
+
+    def ejecutar_comparacion(self):
+        """Executes the comparison process with the selected parameters"""
+        # Validate that all necessary fields are filled
+        if not self.validar_campos():
+            return
+            
+        config = self._leer_configuracion()
         
+        # The full log of the run is spilled to a file next to the outputs
+        try:
+            directorio = config["directorio_salida"] or "."
+            os.makedirs(directorio, exist_ok=True)
+            ruta_log = os.path.join(directorio, f"{config['titulo']}-{config['mes_actual']}.log")
+            self.registro_log.abrir_archivo(ruta_log)
+            self.log(f"Full log: {ruta_log}")
+        except OSError as e:
+            self.log(f"The log file could not be created: {e}")
+
         self.log("Iniciando proceso de comparación...")
         
+        # Execute the comparison in a worker thread so the window stays responsive
+        self.evento_cancelar.clear()
+        self.boton_ejecutar.config(state=tk.DISABLED)
+        self.boton_estimar.config(state=tk.DISABLED)
+        self.boton_cancelar.config(state=tk.NORMAL)
+        # The stage count comes from the settings: self.processor would import pandas on the Tk thread
+        etapas = STAGE_CONFIG["EXTERNAL"] if FILE_CONFIG["LOAD_MODE"] == "externo" else STAGE_CONFIG["TOTAL"]
+        self.progreso.config(value=0, maximum=etapas)
+        self.hilo_comparacion = threading.Thread(
+            target=self._trabajo_comparacion, args=(config,), daemon=True)
+        self.hilo_comparacion.start()
+        self.root.after(LOG_CONFIG["FLUSH_MS"], self._procesar_cola_eventos)
+
+    def _trabajo_comparacion(self, config):
+        """Runs in the worker thread; every result goes through the event queue"""
+        from processors.excel_processor import ComparacionCancelada
+
         try:
-            # Change the current working directory to the output directory
-            os.chdir(config["directorio_salida"])
-            
-            # Execute the comparison
-            resumen = self.processor.procesar_comparacion(config, self.log)
+            resumen = self.processor.procesar_comparacion(
+                config,
+                log_func=lambda mensaje: self.cola_eventos.put(("log", mensaje)),
+                progreso_func=lambda etapa, total, texto: self.cola_eventos.put(("progreso", (etapa, total, texto))),
+                cancelar=self.evento_cancelar)
+            self.cola_eventos.put(("fin", resumen))
+        except ComparacionCancelada:
+            self.cola_eventos.put(("cancelado", None))
+        except Exception as e:
+            self.cola_eventos.put(("error", e))
+
+    def _procesar_cola_eventos(self):
+        """Polls the worker queue from the Tk loop"""
+        terminado = False
+        while True:
+            try:
+                tipo, dato = self.cola_eventos.get_nowait()
+            except queue.Empty:
+                break
+
+            if tipo == "log":
+                # Buffered only: the widget is updated once per poll
+                self.registro_log.agregar(dato)
+            elif tipo == "progreso":
+                etapa, total, texto = dato
+                self.progreso.config(value=etapa, maximum=total)
+                self.etiqueta_progreso.config(text=f"{etapa}/{total} - {texto}")
+            else:
+                terminado = True
+                self.registro_log.volcar()
+                self._finalizar_comparacion(tipo, dato)
+
+        self.registro_log.volcar()
+        if not terminado:
+            self.root.after(LOG_CONFIG["FLUSH_MS"], self._procesar_cola_eventos)
+
+    def _finalizar_comparacion(self, tipo, dato):
+        """Restores the buttons and reports the worker result"""
+        self.boton_ejecutar.config(state=tk.NORMAL)
+        self.boton_estimar.config(state=tk.NORMAL)
+        self.boton_cancelar.config(state=tk.DISABLED)
+        self.hilo_comparacion = None
 
+        if tipo == "fin":
+            resumen = dato
             # Show success message
             mensaje = (f"Process completed successfully.\n\n"
                       f"Detected {resumen['Total de Cambios'].values[0]} changes:\n"
@@ -273,10 +511,39 @@ class ComparadorExcelApp:
                       f"- {resumen['Registros Eliminados'].values[0]} deleted records")
                       
             messagebox.showinfo("Process Completed", mensaje)
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Error during processing: {str(e)}")
-            self.log(f"ERROR: {str(e)}")
+        elif tipo == "estimacion":
+            self._mostrar_estimacion(dato)
+        elif tipo == "cancelado":
+            self.etiqueta_progreso.config(text="Cancelled")
+            self.log("Comparison cancelled by the user")
+        else:
+            messagebox.showerror("Error", f"Error during processing: {str(dato)}")
+            self.log(f"ERROR: {str(dato)}")
+        self.registro_log.cerrar_archivo()
+
+    def _mostrar_estimacion(self, estimacion):
+        """Shows the sampled estimate with its confidence ranges"""
+        resumen = estimacion["resumen"].iloc[0]
+        columnas = [f"- {fila['Columna']}: ~{fila['Cambios']} ({fila['Mínimo']}-{fila['Máximo']})"
+                    for _, fila in estimacion["top_columnas"].iterrows() if fila["Máximo"] > 0]
+        mensaje = (f"Estimate from {estimacion['registros_muestra']} of {estimacion['registros_comunes']} "
+                   f"common records ({estimacion['confianza']:.0%} confidence):\n\n"
+                   f"~{resumen['Total de Cambios']} changes "
+                   f"({resumen['Total de Cambios (mín)']}-{resumen['Total de Cambios (máx)']}):\n"
+                   f"- ~{resumen['Modificaciones']} modifications "
+                   f"({resumen['Modificaciones (mín)']}-{resumen['Modificaciones (máx)']})\n"
+                   f"- {resumen['Nuevos Registros']} new records\n"
+                   f"- {resumen['Registros Eliminados']} deleted records\n\n"
+                   "Columns with the most changes:\n" + ("\n".join(columnas) or "- none"))
+        self.log(mensaje)
+        messagebox.showinfo("Estimate", mensaje)
+
+    def cancelar_comparacion(self):
+        """Asks the worker to stop at the next stage boundary"""
+        if self.hilo_comparacion is not None:
+            self.evento_cancelar.set()
+            self.boton_cancelar.config(state=tk.DISABLED)
+            self.log("Cancelling after the current stage...")
     
     def validar_campos(self):
         """Validates that all necessary fields are complete"""
@@ -0,0 +1,51 @@
+"""
+BATCHED LOG SINK FOR THE OPERATION LOG WIDGET
+Messages are buffered and written to the Text widget in one insert per flush,
+the widget keeps only the last lines (ring buffer) and, while a file is open,
+every message is also written there in full.
+"""
+
+import datetime
+import tkinter as tk
+
+
+class RegistroLog:
+    """Buffers log messages and flushes them to a Text widget in batches"""
+
+    def __init__(self, widget, max_lineas=2000):
+        self.widget = widget
+        self.max_lineas = max_lineas
+        self.pendientes = []
+        self.archivo = None
+
+    def agregar(self, mensaje):
+        """Queues a message, stamped with the time it was produced"""
+        linea = f"[{datetime.datetime.now():%H:%M:%S}] {mensaje}\n"
+        self.pendientes.append(linea)
+        if self.archivo is not None:
+            self.archivo.write(linea)
+
+    def volcar(self):
+        """Writes every pending message with a single insert and trims the oldest lines"""
+        if not self.pendientes:
+            return
+        self.widget.insert(tk.END, "".join(self.pendientes))
+        self.pendientes = []
+
+        # The Text widget always ends with an empty line after the last "\n"
+        lineas = int(self.widget.index("end-1c").split(".")[0]) - 1
+        if lineas > self.max_lineas:
+            self.widget.delete("1.0", f"{lineas - self.max_lineas + 1}.0")
+        self.widget.see(tk.END)
+        if self.archivo is not None:
+            self.archivo.flush()
+
+    def abrir_archivo(self, ruta):
+        """Starts spilling the full log to a file (replacing the previous one)"""
+        self.cerrar_archivo()
+        self.archivo = open(ruta, "w", encoding="utf-8")
+
+    def cerrar_archivo(self):
+        if self.archivo is not None:
+            self.archivo.close()
+            self.archivo = None
@@ -1,16 +1,101 @@
 """
 Main entry point for the Comparador Excel application.
-This script initializes the main window and starts the Tkinter event loop.
+Without arguments it initializes the main window and starts the Tkinter event loop.
+With --lote it runs the comparisons of a manifest headless, across a process pool.
+With --vigilar it watches a folder and runs a comparison for every new workbook that arrives.
+With --servir it exposes the comparisons as a local HTTP service backed by a warm process pool.
 """
 
-import tkinter as tk
-from gui.main_window import ComparadorExcelApp
+import argparse
+import datetime
+import os
+
+
+def log(mensaje):
+    """Prints a timestamped line for the headless modes"""
+    print(f"[{datetime.datetime.now():%H:%M:%S}] {mensaje}", flush=True)
+
+
+def main_gui():
+    """Starts the graphical application"""
+    import tkinter as tk
+    from gui.main_window import ComparadorExcelApp
 
-def main():
-    """Main function to start the application"""
     root = tk.Tk()
     app = ComparadorExcelApp(root)
     root.mainloop()
 
+
+def main_lote(args):
+    """Runs every job of the manifest and writes the aggregate summary"""
+    from processors.lote import ejecutar_lote, leer_manifiesto
+
+    trabajos = leer_manifiesto(args.lote)
+    log(f"{len(trabajos)} jobs read from {args.lote}")
+    resumen = ejecutar_lote(trabajos, args.procesos, log)
+
+    ruta_resumen = args.resumen or os.path.join(os.path.dirname(os.path.abspath(args.lote)), "Resumen Lote.xlsx")
+    resumen.to_excel(ruta_resumen, index=False)
+    log(f"Aggregate summary: {ruta_resumen}")
+    return 0 if (resumen["Estado"] == "ok").sum() == len(trabajos) else 1
+
+
+def main_vigilar(args):
+    """Watches the configured folder until interrupted (or until idle with --una-vez)"""
+    from processors.vigilancia import Vigilante, leer_configuracion
+
+    vigilante = Vigilante(leer_configuracion(args.vigilar), args.procesos, log)
+    try:
+        vigilante.ejecutar(una_vez=args.una_vez)
+    except KeyboardInterrupt:
+        # Interrupted jobs have no "fin" record, so they run again on the next start
+        log("Stopped")
+    log(f"Status log: {vigilante.ruta_estado}")
+    return 0 if vigilante.errores == 0 else 1
+
+
+def main_servir(args):
+    """Serves the local HTTP API until interrupted"""
+    from processors.servicio import ServicioComparacion
+
+    servicio = ServicioComparacion(puerto=args.puerto, procesos=args.procesos, log_func=log)
+    host, puerto = servicio.iniciar()
+    log(f"Serving on http://{host}:{puerto} (files and outputs in {servicio.directorio})")
+    try:
+        servicio.servir()
+    except KeyboardInterrupt:
+        log("Stopping: waiting for running jobs")
+    finally:
+        servicio.detener()
+    return 0
+
+
+def main():
+    """Main function to start the application"""
+    parser = argparse.ArgumentParser(description="Comparator of Excel Databases")
+    parser.add_argument("--lote", metavar="MANIFEST",
+                        help="JSON or CSV manifest with the comparisons to run headless")
+    parser.add_argument("--procesos", type=int, default=None,
+                        help="number of worker processes (default: CPU count)")
+    parser.add_argument("--resumen", metavar="XLSX", help="path of the aggregate summary workbook")
+    parser.add_argument("--vigilar", metavar="CONFIG",
+                        help="JSON config of the folder to watch and the rules that map files to comparisons")
+    parser.add_argument("--una-vez", action="store_true",
+                        help="with --vigilar, exit once every detected file has been processed")
+    parser.add_argument("--servir", action="store_true",
+                        help="run the local HTTP comparison service (see processors/servicio.py)")
+    parser.add_argument("--puerto", type=int, default=None, help="with --servir, port to listen on")
+    args = parser.parse_args()
+
+    if args.lote:
+        return main_lote(args)
+    if args.vigilar:
+        return main_vigilar(args)
+    if args.servir:
+        return main_servir(args)
+    main_gui()
+    return 0
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    raise SystemExit(main())
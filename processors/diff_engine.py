@@ -0,0 +1,239 @@
+"""
+Motor vectorizado para generar el historial de cambios entre dos DataFrames
+"""
+
+import time
+import numpy as np
+import pandas as pd
+
+from utils.data_utils import DataUtils
+from processors.diff_paralelo import mapear_fragmentos
+
+# Constantes para tipos de cambio
+MODIFICACION = "Modificación"
+NUEVO_REGISTRO = "Nuevo Registro"
+NUEVO_REGISTRO_CAMPO = "Nuevo Registro - Campo"
+REGISTRO_ELIMINADO = "Registro Eliminado"
+
+COLUMNAS_HISTORIAL = ["Fila (índice)", "Columna", "Valor Anterior", "Valor Nuevo", "Mes", "Tipo de Cambio"]
+
+
+def _indexar_por_id(df: pd.DataFrame, id_column: str) -> pd.DataFrame:
+    """Descarta filas sin ID y usa el ID (como texto) como índice."""
+    df_clean = df.dropna(subset=[id_column])
+    ids = df_clean[id_column].astype(str)
+    # normalizar_df convierte los IDs vacíos en "": también se descartan
+    con_id = (ids != "").to_numpy(dtype=bool)
+    df_clean, ids = df_clean[con_id], ids[con_id]
+    if ids.duplicated().any():
+        duplicados = ids[ids.duplicated()].unique()[:5].tolist()
+        raise ValueError(f"La columna '{id_column}' contiene IDs duplicados: {duplicados}")
+    datos = df_clean.drop(columns=[id_column])
+    datos.index = pd.Index(ids.to_numpy(dtype=object), name=id_column)
+    return datos
+
+
+TIPOS_CAMBIO = [MODIFICACION, NUEVO_REGISTRO, NUEVO_REGISTRO_CAMPO, REGISTRO_ELIMINADO]
+_CODIGO_TIPO = {tipo: codigo for codigo, tipo in enumerate(TIPOS_CAMBIO)}
+COLUMNA_NUEVO_COMPLETO = "Nuevo Registro Completo"
+COLUMNA_ELIMINADO_COMPLETO = "Registro Eliminado Completo"
+
+
+def _bloque(ids, columnas, anteriores, nuevos, tipos) -> dict:
+    """
+    Arma un bloque del historial como arrays: IDs y valores como referencias a
+    los textos existentes (object), columnas y tipos como códigos enteros.
+    Los argumentos escalares se repiten en todas las filas.
+    """
+    n = len(ids)
+
+    def valores(valor):
+        if isinstance(valor, str):
+            return np.full(n, valor, dtype=object)
+        return np.asarray(valor, dtype=object)
+
+    def codigos(valor, dtype):
+        return np.full(n, valor, dtype=dtype) if np.ndim(valor) == 0 else np.asarray(valor, dtype=dtype)
+
+    return {
+        "ids": np.asarray(ids, dtype=object),
+        "columnas": codigos(columnas, np.int32),
+        "anteriores": valores(anteriores),
+        "nuevos": valores(nuevos),
+        "tipos": codigos(tipos, np.int8),
+    }
+
+
+def _ensamblar(bloques: list[dict], id_column: str, mes: str, etiquetas_columnas: list) -> pd.DataFrame:
+    """
+    Une los bloques en el DataFrame del historial. Todas las columnas son
+    categóricas: cada texto distinto se guarda una vez y cada fila ocupa solo
+    sus códigos (el prefijo "ID: " se añade una vez por registro).
+    """
+    def unir(campo):
+        return np.concatenate([bloque[campo] for bloque in bloques])
+
+    codigos_id, ids = pd.factorize(unir("ids"))
+    ids = pd.Index(ids, dtype=object)
+    n = len(codigos_id)
+    return pd.DataFrame({
+        id_column: pd.Categorical.from_codes(codigos_id, categories=ids),
+        "Fila (índice)": pd.Categorical.from_codes(codigos_id, categories="ID: " + ids),
+        "Columna": pd.Categorical.from_codes(unir("columnas"), categories=pd.Index(etiquetas_columnas, dtype=object)),
+        "Valor Anterior": pd.Categorical(unir("anteriores")),
+        "Valor Nuevo": pd.Categorical(unir("nuevos")),
+        "Mes": pd.Categorical.from_codes(np.zeros(n, dtype=np.int8), categories=[mes]),
+        "Tipo de Cambio": pd.Categorical.from_codes(unir("tipos"), categories=TIPOS_CAMBIO),
+    })
+
+
+def _modificaciones(datos1: pd.DataFrame, datos2: pd.DataFrame, posiciones: dict, log_func=None,
+                    hilos: int = None) -> dict:
+    columnas = [col for col in datos1.columns if col in datos2.columns]
+    comunes = datos1.index[datos1.index.isin(datos2.index)]
+    anterior = datos1.loc[comunes, columnas]
+    actual = datos2.loc[comunes, columnas]
+
+    # Prefiltro por huellas: una huella por registro (alineado por ID) y la
+    # comparación de huellas por columna indican qué filas y columnas pueden
+    # tener cambios; solo ese subconjunto pasa a la comparación celda a celda.
+    # Ambas fases se reparten por fragmentos de columnas (ver diff_paralelo)
+    def huellas_fragmento(posiciones):
+        huellas1 = np.zeros(len(comunes), dtype=np.uint64)
+        huellas2 = np.zeros(len(comunes), dtype=np.uint64)
+        cambiadas = []
+        for j in posiciones:
+            h1 = DataUtils.huellas_columna(anterior.iloc[:, j])
+            h2 = DataUtils.huellas_columna(actual.iloc[:, j])
+            huellas1 = DataUtils.combinar_huellas(huellas1, h1, j)
+            huellas2 = DataUtils.combinar_huellas(huellas2, h2, j)
+            if not np.array_equal(h1, h2):
+                cambiadas.append(int(j))
+        return huellas1, huellas2, cambiadas
+
+    # Las huellas de una columna categórica se indexan por código sin pasar por texto
+    categoricas = [DataUtils.es_categorica(anterior.iloc[:, j]) and DataUtils.es_categorica(actual.iloc[:, j])
+                   for j in range(len(columnas))]
+    parciales = mapear_fragmentos(huellas_fragmento, len(columnas), hilos, categoricas)
+    huellas1 = np.zeros(len(comunes), dtype=np.uint64)
+    huellas2 = np.zeros(len(comunes), dtype=np.uint64)
+    columnas_cambiadas = []
+    for parcial1, parcial2, cambiadas in parciales:
+        huellas1 += parcial1
+        huellas2 += parcial2
+        columnas_cambiadas += cambiadas
+    filas_cambiadas = np.flatnonzero(huellas1 != huellas2)
+
+    cambiadas = set(columnas_cambiadas)
+    sin_cambios = [col for j, col in enumerate(columnas) if j not in cambiadas]
+    log_func and log_func(f"Huellas: {len(filas_cambiadas)} de {len(comunes)} registros comunes con diferencias; "
+                          f"{len(sin_cambios)} de {len(columnas)} columnas sin cambios")
+
+    sub_anterior = anterior.iloc[filas_cambiadas, columnas_cambiadas]
+    sub_actual = actual.iloc[filas_cambiadas, columnas_cambiadas]
+
+    def celdas_fragmento(posiciones):
+        filas, cols = [], []
+        for k in posiciones:
+            valores1, valores2 = DataUtils.valores_comparables(sub_anterior.iloc[:, k], sub_actual.iloc[:, k])
+            diferentes = np.flatnonzero(valores1 != valores2)
+            filas.append(diferentes)
+            cols.append(np.full(len(diferentes), k))
+        return filas, cols
+
+    filas, cols = [np.array([], dtype=np.int64)], [np.array([], dtype=np.int64)]
+    por_codigo = [DataUtils.comparables_por_codigo(sub_anterior.iloc[:, k], sub_actual.iloc[:, k])
+                  for k in range(len(columnas_cambiadas))]
+    for filas_fragmento, cols_fragmento in mapear_fragmentos(celdas_fragmento, len(columnas_cambiadas), hilos,
+                                                             por_codigo):
+        filas += filas_fragmento
+        cols += cols_fragmento
+    filas, cols = np.concatenate(filas), np.concatenate(cols)
+
+    # Orden determinista: registro a registro y, dentro de cada uno, por columna
+    orden = np.lexsort((cols, filas))
+    filas, cols = filas[orden], cols[orden]
+    codigos_columnas = np.array([posiciones[col] for col in columnas], dtype=np.int32)
+    return _bloque(
+        comunes.to_numpy(dtype=object)[filas_cambiadas[filas]],
+        codigos_columnas[np.asarray(columnas_cambiadas, dtype=int)[cols]],
+        sub_anterior.to_numpy(dtype=object)[filas, cols],
+        sub_actual.to_numpy(dtype=object)[filas, cols],
+        _CODIGO_TIPO[MODIFICACION],
+    )
+
+
+def _nuevos(datos1: pd.DataFrame, datos2: pd.DataFrame, posiciones: dict) -> dict:
+    nuevos_ids = datos2.index[~datos2.index.isin(datos1.index)]
+    n, k = len(nuevos_ids), datos2.shape[1]
+
+    # Cada registro nuevo ocupa k + 1 filas: la fila resumen y una por campo
+    columnas = np.empty((n, k + 1), dtype=np.int32)
+    columnas[:, 0] = posiciones[COLUMNA_NUEVO_COMPLETO]
+    columnas[:, 1:] = [posiciones[col] for col in datos2.columns]
+
+    valores = np.empty((n, k + 1), dtype=object)
+    valores[:, 0] = f"Nuevo registro con {k} campos"
+    valores[:, 1:] = datos2.loc[nuevos_ids].to_numpy(dtype=object)
+
+    tipos = np.full((n, k + 1), _CODIGO_TIPO[NUEVO_REGISTRO_CAMPO], dtype=np.int8)
+    tipos[:, 0] = _CODIGO_TIPO[NUEVO_REGISTRO]
+
+    return _bloque(
+        np.repeat(nuevos_ids.to_numpy(dtype=object), k + 1),
+        columnas.ravel(),
+        "N/A",
+        valores.ravel(),
+        tipos.ravel(),
+    )
+
+
+def _eliminados(datos1: pd.DataFrame, datos2: pd.DataFrame, posiciones: dict) -> dict:
+    eliminados_ids = datos1.index[~datos1.index.isin(datos2.index)]
+    return _bloque(
+        eliminados_ids.to_numpy(dtype=object),
+        posiciones[COLUMNA_ELIMINADO_COMPLETO],
+        f"Registro eliminado con {datos1.shape[1]} campos",
+        "N/A",
+        _CODIGO_TIPO[REGISTRO_ELIMINADO],
+    )
+
+
+def crear_historial_vectorizado(df1: pd.DataFrame, df2: pd.DataFrame, mes: str, id_column: str, log_func=None) -> pd.DataFrame:
+    """
+    Genera el historial de cambios entre dos DataFrames alineándolos por ID.
+
+    Produce las mismas filas que el recorrido registro a registro: primero las
+    modificaciones (en el orden de df1), luego los registros nuevos con una fila
+    por campo (en el orden de df2) y por último los registros eliminados.
+    El historial se acumula por columnas (ver _ensamblar).
+    """
+    inicio = time.perf_counter()
+    datos1 = _indexar_por_id(df1, id_column)
+    datos2 = _indexar_por_id(df2, id_column)
+
+    en_actual = datos1.index.isin(datos2.index)
+    en_anterior = datos2.index.isin(datos1.index)
+
+    # Diccionario común de nombres para la columna "Columna" del historial
+    etiquetas_columnas = list(dict.fromkeys([*datos1.columns, *datos2.columns,
+                                             COLUMNA_NUEVO_COMPLETO, COLUMNA_ELIMINADO_COMPLETO]))
+    posiciones = {col: codigo for codigo, col in enumerate(etiquetas_columnas)}
+
+    log_func and log_func(f"Analizando {en_actual.sum()} registros comunes para modificaciones...")
+    modificaciones = _modificaciones(datos1, datos2, posiciones, log_func)
+
+    log_func and log_func(f"Detectados {(~en_anterior).sum()} nuevos registros...")
+    nuevos = _nuevos(datos1, datos2, posiciones)
+
+    log_func and log_func(f"Detectados {(~en_actual).sum()} registros eliminados...")
+    eliminados = _eliminados(datos1, datos2, posiciones)
+
+    historial = _ensamblar([modificaciones, nuevos, eliminados], id_column, mes, etiquetas_columnas)
+
+    duracion = time.perf_counter() - inicio
+    registros = len(datos1) + (~en_anterior).sum()
+    velocidad = registros / duracion if duracion > 0 else float("inf")
+    log_func and log_func(f"Historial completado: {len(historial)} cambios detectados en total "
+                          f"({registros} registros en {duracion:.2f} s, {velocidad:,.0f} registros/s)")
+    return historial
@@ -0,0 +1,138 @@
+"""
+Comparación fuera de memoria: ordenación externa por ID y fusión en streaming
+"""
+
+import heapq
+import os
+import pickle
+import tempfile
+from operator import itemgetter
+
+from processors.diff_engine import (
+    COLUMNA_ELIMINADO_COMPLETO, COLUMNA_NUEVO_COMPLETO, MODIFICACION, NUEVO_REGISTRO, NUEVO_REGISTRO_CAMPO,
+    REGISTRO_ELIMINADO
+)
+
+# Filas por cada pickle dentro de un tramo: equilibra llamadas a pickle y memoria de lectura
+_FILAS_POR_PICKLE = 1000
+_clave = itemgetter(0)
+
+
+def _escribir_tramo(filas: list, directorio: str) -> str:
+    """Ordena por ID un bloque de (id, valores) y lo vuelca a un archivo temporal."""
+    filas.sort(key=_clave)
+    descriptor, ruta = tempfile.mkstemp(suffix=".tramo", dir=directorio)
+    with os.fdopen(descriptor, "wb") as archivo:
+        for inicio in range(0, len(filas), _FILAS_POR_PICKLE):
+            pickle.dump(filas[inicio:inicio + _FILAS_POR_PICKLE], archivo, protocol=pickle.HIGHEST_PROTOCOL)
+    return ruta
+
+
+def _leer_tramo(ruta: str):
+    with open(ruta, "rb") as archivo:
+        while True:
+            try:
+                bloque = pickle.load(archivo)
+            except EOFError:
+                return
+            yield from bloque
+
+
+def _volcar_fusion(rutas: list[str], directorio: str) -> str:
+    """Fusiona varios tramos en uno nuevo y borra los originales."""
+    descriptor, ruta = tempfile.mkstemp(suffix=".tramo", dir=directorio)
+    with os.fdopen(descriptor, "wb") as archivo:
+        bloque = []
+        for fila in heapq.merge(*(_leer_tramo(r) for r in rutas), key=_clave):
+            bloque.append(fila)
+            if len(bloque) >= _FILAS_POR_PICKLE:
+                pickle.dump(bloque, archivo, protocol=pickle.HIGHEST_PROTOCOL)
+                bloque = []
+        if bloque:
+            pickle.dump(bloque, archivo, protocol=pickle.HIGHEST_PROTOCOL)
+    for r in rutas:
+        os.remove(r)
+    return ruta
+
+
+def ordenar_en_disco(filas, posicion_id: int, directorio: str, filas_por_tramo: int = 200000,
+                     max_tramos_abiertos: int = 64):
+    """
+    Reparte las filas en tramos ordenados por ID escritos en `directorio` y
+    devuelve (iterador ordenado de (id, fila), número de filas). Como mucho se
+    mantienen en memoria filas_por_tramo filas; si hay más tramos que
+    max_tramos_abiertos se fusionan por grupos antes de la fusión final.
+    Las filas sin ID (vacío, o None si la hoja no tiene la columna) se
+    descartan, igual que en el motor en memoria.
+    """
+    tramos, bloque, total = [], [], 0
+    for fila in filas:
+        id_valor = fila[posicion_id]
+        if not id_valor:
+            continue
+        bloque.append((id_valor, fila))
+        total += 1
+        if len(bloque) >= filas_por_tramo:
+            tramos.append(_escribir_tramo(bloque, directorio))
+            bloque = []
+    if bloque or not tramos:
+        tramos.append(_escribir_tramo(bloque, directorio))
+
+    while len(tramos) > max_tramos_abiertos:
+        tramos = [_volcar_fusion(tramos[i:i + max_tramos_abiertos], directorio)
+                  for i in range(0, len(tramos), max_tramos_abiertos)]
+    return heapq.merge(*(_leer_tramo(r) for r in tramos), key=_clave), total
+
+
+def _sin_duplicados(flujo, id_column: str):
+    """Recorre un flujo ordenado por ID y falla ante el primer ID repetido."""
+    anterior = None
+    for id_valor, fila in flujo:
+        if id_valor == anterior:
+            raise ValueError(f"La columna '{id_column}' contiene IDs duplicados: ['{id_valor}']")
+        anterior = id_valor
+        yield id_valor, fila
+
+
+def historial_por_fusion(flujo1, flujo2, columnas: list[str], posicion_id: int, id_column: str, mes: str):
+    """
+    Une dos flujos ordenados por ID y genera las filas del historial como tuplas
+    (id_valor, fila, columna, valor_anterior, valor_nuevo, mes, tipo_cambio),
+    con los mismos tipos y textos que crear_historial_vectorizado. Las filas
+    salen en orden de ID en lugar de agrupadas por tipo de cambio.
+    Los valores ausentes (None) equivalen a la celda vacía.
+    """
+    campos = [(j, col) for j, col in enumerate(columnas) if j != posicion_id]
+    resumen_nuevo = f"Nuevo registro con {len(campos)} campos"
+    resumen_eliminado = f"Registro eliminado con {len(campos)} campos"
+    fin = object()
+
+    flujo1, flujo2 = _sin_duplicados(flujo1, id_column), _sin_duplicados(flujo2, id_column)
+    actual1, actual2 = next(flujo1, fin), next(flujo2, fin)
+    while actual1 is not fin or actual2 is not fin:
+        if actual2 is fin or (actual1 is not fin and actual1[0] < actual2[0]):
+            id_valor = actual1[0]
+            yield (id_valor, f"ID: {id_valor}", COLUMNA_ELIMINADO_COMPLETO, resumen_eliminado, "N/A", mes,
+                   REGISTRO_ELIMINADO)
+            actual1 = next(flujo1, fin)
+        elif actual1 is fin or actual2[0] < actual1[0]:
+            id_valor, fila = actual2
+            yield id_valor, f"ID: {id_valor}", COLUMNA_NUEVO_COMPLETO, "N/A", resumen_nuevo, mes, NUEVO_REGISTRO
+            for j, col in campos:
+                yield id_valor, f"ID: {id_valor}", col, "N/A", fila[j], mes, NUEVO_REGISTRO_CAMPO
+            actual2 = next(flujo2, fin)
+        else:
+            id_valor, fila1 = actual1
+            fila2 = actual2[1]
+            for j, col in campos:
+                if (fila1[j] or "") != (fila2[j] or ""):
+                    yield id_valor, f"ID: {id_valor}", col, fila1[j], fila2[j], mes, MODIFICACION
+            actual1, actual2 = next(flujo1, fin), next(flujo2, fin)
+
+
+def proyectar_filas(filas, columnas_hoja: list[str], columnas: list[str]):
+    """Reordena cada fila de una hoja a la lista común de columnas (None si la hoja no la tiene)."""
+    posiciones = {col: j for j, col in enumerate(columnas_hoja)}
+    indices = [posiciones.get(col) for col in columnas]
+    for fila in filas:
+        yield tuple(None if j is None else fila[j] for j in indices)
@@ -0,0 +1,46 @@
+"""
+Reparto de la comparación por fragmentos de columnas entre varios hilos (solo columnas que liberan el GIL)
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from config.settings import DIFF_CONFIG
+
+
+def fragmentos_columnas(n_columnas: int, n_fragmentos: int) -> list[np.ndarray]:
+    """Divide las posiciones 0..n_columnas-1 en fragmentos contiguos y no vacíos."""
+    n_fragmentos = max(1, min(n_fragmentos, n_columnas))
+    return [fragmento for fragmento in np.array_split(np.arange(n_columnas), n_fragmentos) if len(fragmento)]
+
+
+def mapear_fragmentos(funcion, n_columnas: int, hilos: int = None, sin_gil=None) -> list:
+    """
+    Ejecuta funcion(posiciones) sobre fragmentos de columnas y devuelve sus
+    resultados: primero el del fragmento del hilo actual (si lo hay) y después
+    los de los fragmentos repartidos, en orden. Los hilos comparten los
+    DataFrames sin copiarlos.
+
+    sin_gil marca (arreglo booleano por columna) las columnas cuyo trabajo son
+    operaciones de NumPy sobre códigos enteros o hashes, que liberan el GIL;
+    solo esas se reparten entre hilos. Las columnas de texto (object) se hashean
+    y comparan con el GIL retenido, así que repartirlas solo añadiría coste: se
+    procesan en un único fragmento en el hilo actual, a la vez que el pool.
+    Sin sin_gil, o con pocas columnas, todo se procesa en el hilo actual.
+    """
+    hilos = hilos or DIFF_CONFIG["WORKERS"] or os.cpu_count() or 1
+    todas = np.arange(n_columnas)
+    if sin_gil is None or hilos <= 1 or n_columnas < DIFF_CONFIG["PARALLEL_MIN_COLUMNS"]:
+        return [funcion(todas)]
+
+    sin_gil = np.asarray(sin_gil, dtype=bool)
+    repartidas, locales = todas[sin_gil], todas[~sin_gil]
+    if len(repartidas) < DIFF_CONFIG["PARALLEL_MIN_COLUMNS"]:
+        return [funcion(todas)]
+
+    fragmentos = fragmentos_columnas(len(repartidas), hilos * DIFF_CONFIG["SHARDS_PER_WORKER"])
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        futuros = [pool.submit(funcion, repartidas[fragmento]) for fragmento in fragmentos]
+        resultados = [funcion(locales)] if len(locales) else []
+        return resultados + [futuro.result() for futuro in futuros]
@@ -0,0 +1,172 @@
+"""
+Estimación rápida de una comparación a partir de una muestra de IDs
+"""
+
+import math
+from itertools import islice
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from utils import fuentes
+from utils.data_utils import DataUtils
+from utils.file_utils import FileUtils
+
+_FILAS_POR_BLOQUE = 20000
+_SIN_UMBRAL = np.uint64(np.iinfo(np.uint64).max)
+
+
+def _hash_ids(ids) -> np.ndarray:
+    return pd.util.hash_array(np.asarray(ids, dtype=object))
+
+
+def _ids_hoja(ruta: str, hoja: str, posicion: int, tabla: pd.DataFrame = None):
+    """
+    Generador de bloques (IDs, posiciones) con los IDs no vacíos de la hoja.
+    En .xlsx solo se decodifica la columna ID y la posición es el número de
+    fila de la hoja; en el resto de formatos, la fila de `tabla`.
+    """
+    if tabla is not None:
+        ids = tabla.iloc[:, posicion].to_numpy(dtype=object)
+        filas = np.flatnonzero(ids != "")
+        yield ids[filas], filas
+        return
+
+    valores = FileUtils.valores_columna_streaming(ruta, hoja, posicion)
+    while True:
+        bloque = list(islice(valores, _FILAS_POR_BLOQUE))
+        if not bloque:
+            return
+        numeros, ids = zip(*bloque)
+        ids = np.asarray(ids, dtype=object)
+        validos = ids != ""
+        yield ids[validos], np.asarray(numeros, dtype=np.int64)[validos]
+
+
+def muestrear_hoja(ruta: str, hoja: str, id_column: str, tamano: int):
+    """
+    Devuelve (columnas, ids, muestra, umbral): todos los IDs no vacíos y solo
+    las filas de los `tamano` IDs con menor hash, cuyo hash no supera `umbral`.
+    Como el hash depende solo del ID, dos hojas muestreadas así conservan las
+    mismas filas para los IDs comunes por debajo del menor de sus umbrales.
+    En .xlsx una primera pasada lee solo la columna ID y la segunda decodifica
+    únicamente las filas de la muestra, deteniéndose tras la última.
+    """
+    es_xlsx = fuentes.es_excel(ruta) and not ruta.lower().endswith(".xls")
+    tabla = None if es_xlsx else DataUtils.normalizar_df(fuentes.leer_tabla(ruta, hoja))
+    columnas = fuentes.columnas(ruta, hoja) if es_xlsx else tabla.columns.tolist()
+    if id_column not in columnas:
+        raise ValueError(f"La columna ID '{id_column}' no existe en la hoja '{hoja}'")
+
+    ids, candidatos, hashes = [], np.array([], dtype=np.int64), np.array([], dtype=np.uint64)
+    for ids_bloque, filas_bloque in _ids_hoja(ruta, hoja, columnas.index(id_column), tabla):
+        ids.append(ids_bloque)
+        candidatos = np.concatenate([candidatos, filas_bloque])
+        hashes = np.concatenate([hashes, _hash_ids(ids_bloque)])
+        # Solo se conservan las filas con los `tamano` hashes más pequeños
+        if len(hashes) > tamano:
+            menores = np.argpartition(hashes, tamano - 1)[:tamano]
+            candidatos, hashes = candidatos[menores], hashes[menores]
+
+    ids = np.concatenate(ids) if ids else np.array([], dtype=object)
+    umbral = hashes.max() if len(ids) > tamano else _SIN_UMBRAL
+    orden = np.sort(candidatos)
+    if es_xlsx:
+        muestra = FileUtils.leer_filas_streaming(ruta, hoja, orden.tolist())
+    else:
+        muestra = tabla.iloc[orden].reset_index(drop=True)
+    return columnas, ids, muestra, umbral
+
+
+def _intervalo_proporcion(exitos: int, n: int, z: float, correccion: float) -> tuple[float, float]:
+    """Intervalo de Wilson para una proporción, con el tamaño efectivo corregido por población finita."""
+    if n == 0:
+        return 0.0, 1.0
+    if correccion <= 0:
+        return exitos / n, exitos / n
+    n_efectivo = n / correccion
+    p = exitos / n
+    denominador = 1 + z ** 2 / n_efectivo
+    centro = (p + z ** 2 / (2 * n_efectivo)) / denominador
+    margen = z * math.sqrt(p * (1 - p) / n_efectivo + z ** 2 / (4 * n_efectivo ** 2)) / denominador
+    return max(0.0, centro - margen), min(1.0, centro + margen)
+
+
+def estimar_cambios(anterior: tuple, actual: tuple, id_column: str, mes: str, confianza: float = 0.95,
+                    top: int = 10) -> dict:
+    """
+    Estima el resumen de crear_resumen_informe a partir de dos resultados de
+    muestrear_hoja. Los registros nuevos y eliminados se cuentan exactamente
+    con los IDs; las modificaciones se extrapolan desde los IDs comunes de la
+    muestra, con intervalos de confianza (normal para el total de
+    modificaciones y de Wilson para cada columna, ambos con corrección por
+    población finita).
+    """
+    columnas1, ids1, muestra1, umbral1 = anterior
+    columnas2, ids2, muestra2, umbral2 = actual
+    ids1, ids2 = pd.unique(ids1), pd.unique(ids2)
+    comunes = np.intersect1d(ids1, ids2)
+    n_nuevos = len(ids2) - len(comunes)
+    n_eliminados = len(ids1) - len(comunes)
+    columnas = list(dict.fromkeys([*columnas1, *columnas2]))
+    campos = [col for col in columnas if col != id_column]
+
+    # IDs comunes de la muestra: los que quedan por debajo de ambos umbrales
+    umbral = min(umbral1, umbral2)
+    muestreados = comunes[_hash_ids(comunes) <= umbral]
+    N, n = len(comunes), len(muestreados)
+
+    cambios = np.zeros((n, len(campos)), dtype=bool)
+    if n:
+        sub1 = muestra1.drop_duplicates(id_column).set_index(id_column).reindex(muestreados)
+        sub2 = muestra2.drop_duplicates(id_column).set_index(id_column).reindex(muestreados)
+        for j, col in enumerate(campos):
+            serie1 = sub1[col] if col in sub1.columns else pd.Series(np.nan, index=sub1.index)
+            serie2 = sub2[col] if col in sub2.columns else pd.Series(np.nan, index=sub2.index)
+            valores1, valores2 = DataUtils.valores_comparables(serie1, serie2)
+            cambios[:, j] = valores1 != valores2
+
+    z = NormalDist().inv_cdf(0.5 + confianza / 2)
+    correccion = (N - n) / (N - 1) if N > 1 else 0.0
+    por_registro = cambios.sum(axis=1)
+    observadas = int(por_registro.sum())
+    if n:
+        estimadas = N * por_registro.mean()
+        margen = z * N * por_registro.std(ddof=1) / math.sqrt(n) * math.sqrt(correccion) if n > 1 else N * len(campos)
+    else:
+        estimadas, margen = 0.0, N * len(campos)
+    # La muestra es una cota inferior exacta y N x campos una superior
+    modificaciones = (round(estimadas), max(observadas, math.floor(estimadas - margen)),
+                      min(N * len(campos), math.ceil(estimadas + margen)))
+
+    fijos = n_nuevos * (len(campos) + 1) + n_eliminados
+    resumen = pd.DataFrame([{
+        "Mes": mes,
+        "Total de Cambios": modificaciones[0] + fijos,
+        "Total de Cambios (mín)": modificaciones[1] + fijos,
+        "Total de Cambios (máx)": modificaciones[2] + fijos,
+        "Modificaciones": modificaciones[0],
+        "Modificaciones (mín)": modificaciones[1],
+        "Modificaciones (máx)": modificaciones[2],
+        # Igual que en crear_resumen_informe, cada registro nuevo cuenta su fila resumen y una por campo
+        "Nuevos Registros": n_nuevos * (len(campos) + 1),
+        "Registros Eliminados": n_eliminados
+    }])
+
+    filas = []
+    for j, col in enumerate(campos):
+        exitos = int(cambios[:, j].sum())
+        minimo, maximo = _intervalo_proporcion(exitos, n, z, correccion)
+        filas.append({"Columna": col, "Cambios": round(N * exitos / n) if n else 0,
+                      "Mínimo": max(exitos, math.floor(N * minimo)), "Máximo": math.ceil(N * maximo)})
+    top_columnas = pd.DataFrame(filas, columns=["Columna", "Cambios", "Mínimo", "Máximo"])
+    top_columnas = top_columnas.sort_values(["Cambios", "Máximo"], ascending=False, kind="stable").head(top)
+
+    return {
+        "resumen": resumen,
+        "top_columnas": top_columnas.reset_index(drop=True),
+        "registros_comunes": N,
+        "registros_muestra": n,
+        "confianza": confianza
+    }
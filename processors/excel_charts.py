@@ -1,57 +1,79 @@
-import matplotlib.pyplot as plt
-import seaborn as sns
-from openpyxl import load_workbook
-from openpyxl.drawing.image import Image
-import tempfile
-import os
-
-def generar_graficos_historial(historial_df, archivo_excel, log_func=None):
-    if historial_df.empty:
-        log_func and log_func("No hay datos para graficar.")
-        return
+"""
+Gráficos del historial de cambios, renderizados en memoria e insertados al escribir el libro
+"""
+
+import io
+import pandas as pd
 
-    resumen_mes = historial_df.groupby(["Mes", "Tipo de Cambio"]).size().unstack(fill_value=0)
+HOJA_GRAFICOS = "Gráficos"
+FILAS_POR_GRAFICO = 32
 
-    plt.figure(figsize=(10, 6))
-    resumen_mes.plot(kind='bar', stacked=True)
-    plt.title("Cambios por Tipo y Mes")
-    plt.ylabel("Cantidad de Cambios")
-    plt.xlabel("Mes")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
 
-    temp_dir = tempfile.gettempdir()
-    grafico_path = os.path.join(temp_dir, "cambios_por_mes.png")
-    plt.savefig(grafico_path)
-    plt.close()
+def _png(figura, dpi: int) -> bytes:
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
 
-    top_columnas = historial_df["Columna"].value_counts().head(10)
-    plt.figure(figsize=(10, 6))
-    sns.barplot(x=top_columnas.values, y=top_columnas.index, palette="viridis")
-    plt.title("Top 10 Columnas con Más Cambios")
-    plt.xlabel("Cantidad de Cambios")
-    plt.ylabel("Columna")
-    plt.tight_layout()
+    FigureCanvasAgg(figura)
+    buffer = io.BytesIO()
+    figura.savefig(buffer, format="png", dpi=dpi)
+    return buffer.getvalue()
 
-    grafico2_path = os.path.join(temp_dir, "top_columnas_cambios.png")
-    plt.savefig(grafico2_path)
-    plt.close()
 
-    wb = load_workbook(archivo_excel)
-    if "Gráficos" in wb.sheetnames:
-        ws = wb["Gráficos"]
-    else:
-        ws = wb.create_sheet("Gráficos")
+def renderizar_graficos(resumen_mes: pd.DataFrame, top_columnas: pd.Series, dpi: int = 100) -> list[tuple[str, bytes]]:
+    """
+    Devuelve los gráficos como [(nombre, png)]. Se usan objetos Figure con el
+    lienzo Agg, sin el estado global de pyplot ni archivos temporales, así que
+    puede ejecutarse en un hilo mientras se escribe el libro.
+    """
+    # Importación diferida: matplotlib tarda en cargarse y solo se usa aquí
+    import numpy as np
+    from matplotlib import colormaps
+    from matplotlib.figure import Figure
 
-    img1 = Image(grafico_path)
-    img2 = Image(grafico2_path)
+    imagenes = []
+    if resumen_mes.empty:
+        return imagenes
 
-    ws.add_image(img1, "A1")
-    ws.add_image(img2, "A20")
+    figura = Figure(figsize=(10, 6))
+    ax = figura.add_subplot()
+    posiciones = np.arange(len(resumen_mes.index))
+    base = np.zeros(len(posiciones))
+    for tipo in resumen_mes.columns:
+        valores = resumen_mes[tipo].to_numpy(dtype=float)
+        ax.bar(posiciones, valores, bottom=base, label=str(tipo))
+        base += valores
+    ax.set_xticks(posiciones, [str(mes) for mes in resumen_mes.index], rotation=45)
+    ax.set_title("Cambios por Tipo y Mes")
+    ax.set_ylabel("Cantidad de Cambios")
+    ax.set_xlabel("Mes")
+    ax.legend(title="Tipo de Cambio")
+    figura.tight_layout()
+    imagenes.append(("cambios_por_mes.png", _png(figura, dpi)))
 
-    wb.save(archivo_excel)
+    figura = Figure(figsize=(10, 6))
+    ax = figura.add_subplot()
+    posiciones = np.arange(len(top_columnas))
+    colores = colormaps["viridis"](np.linspace(0, 1, max(len(posiciones), 1)))
+    ax.barh(posiciones, top_columnas.to_numpy(dtype=float), color=colores[:len(posiciones)])
+    ax.set_yticks(posiciones, [str(col) for col in top_columnas.index])
+    ax.invert_yaxis()
+    ax.set_title(f"Top {len(top_columnas)} Columnas con Más Cambios")
+    ax.set_xlabel("Cantidad de Cambios")
+    ax.set_ylabel("Columna")
+    figura.tight_layout()
+    imagenes.append(("top_columnas_cambios.png", _png(figura, dpi)))
+    return imagenes
 
-    os.remove(grafico_path)
-    os.remove(grafico2_path)
 
+def insertar_graficos(workbook, imagenes: list[tuple[str, bytes]], log_func=None):
+    """
+    Añade la hoja de gráficos a un libro de xlsxwriter que aún se está
+    escribiendo (p. ej. writer.book de un pd.ExcelWriter), sin releerlo ni volver a guardarlo.
+    """
+    if not imagenes:
+        log_func and log_func("No hay datos para graficar.")
+        return
+    hoja = workbook.add_worksheet(HOJA_GRAFICOS)
+    # Cada imagen de 10x6 pulgadas a 100 ppp ocupa unas 30 filas
+    for numero, (nombre, png) in enumerate(imagenes):
+        hoja.insert_image(numero * FILAS_POR_GRAFICO, 0, nombre, {"image_data": io.BytesIO(png)})
     log_func and log_func("Gráficos generados y añadidos al archivo Excel.")
@@ -3,38 +3,176 @@ Módulo para el procesamiento y comparación de archivos Excel
 """
 
 import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
+from config.settings import (
+    CHART_CONFIG, DIFF_CONFIG, ESTIMATE_CONFIG, EXCEL_FORMAT, FILE_CONFIG, LOG_CONFIG, METRICS_CONFIG, SNAPSHOT_CONFIG,
+    STAGE_CONFIG
+)
+from utils import fuentes
+from utils.cache_libros import cache_libros
 from utils.data_utils import DataUtils
 from utils.file_utils import FileUtils
+from utils.metricas import MedidorEtapas
+from utils.tabla_comparacion import TablaComparacion
+from processors.diff_engine import (
+    MODIFICACION, NUEVO_REGISTRO, REGISTRO_ELIMINADO, crear_historial_vectorizado
+)
+from processors.estimacion import estimar_cambios, muestrear_hoja
+from processors.excel_charts import insertar_graficos, renderizar_graficos
+from processors.diff_externo import historial_por_fusion, ordenar_en_disco, proyectar_filas
+from processors.diff_paralelo import mapear_fragmentos
+from processors.historial_store import HistorialStore, ruta_base_datos
+from processors.snapshots import SnapshotStore
 
-# Constantes para tipos de cambio
-MODIFICACION = "Modificación"
-NUEVO_REGISTRO = "Nuevo Registro"
-NUEVO_REGISTRO_CAMPO = "Nuevo Registro - Campo"
-REGISTRO_ELIMINADO = "Registro Eliminado"
+
+class ComparacionCancelada(Exception):
+    """Se lanza cuando se cancela la comparación entre dos etapas"""
 
 
 class ExcelProcessor:
     """Clase para procesar y comparar archivos Excel"""
-    
+
+    TOTAL_ETAPAS = STAGE_CONFIG["TOTAL"]
+    ETAPAS_EXTERNAS = STAGE_CONFIG["EXTERNAL"]
+
     def __init__(self):
         self.data_utils = DataUtils()
         self.file_utils = FileUtils()
     
-    def cargar_datos(self, archivo: str, sheet_anterior: str, sheet_actual: str) -> tuple[pd.DataFrame, pd.DataFrame]:
-        """Carga y normaliza datos desde las hojas especificadas en un archivo Excel."""
+    def cargar_datos(self, archivo: str, sheet_anterior: str, sheet_actual: str, modo: str = None,
+                     representacion: str = None, archivo_anterior: str = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Carga y normaliza datos desde las hojas especificadas.
+        archivo_anterior: si se indica, la hoja anterior se lee de ese archivo
+        y la actual de `archivo`; cada uno puede ser Excel, CSV, Parquet o
+        Feather/Arrow (ver utils/fuentes.py; en los formatos planos se ignora la hoja).
+        modo = "pandas" -> pd.read_excel sobre ambas hojas
+        modo = "streaming" -> lectura fila a fila en solo lectura (solo .xlsx)
+        representacion = "category" -> columnas codificadas como diccionario
+        representacion = "str" -> columnas de texto
+        """
         try:
-            hojas = pd.read_excel(archivo, sheet_name=[sheet_anterior, sheet_actual])
-            df_anterior = self.data_utils.normalizar_df(hojas[sheet_anterior])
-            df_actual = self.data_utils.normalizar_df(hojas[sheet_actual])
-            return df_anterior, df_actual
+            if archivo_anterior and archivo_anterior != archivo:
+                anterior = self._obtener_hojas(archivo_anterior, [sheet_anterior], modo, representacion)
+                actual = self._obtener_hojas(archivo, [sheet_actual], modo, representacion)
+                return anterior[sheet_anterior], actual[sheet_actual]
+            hojas = self._obtener_hojas(archivo, [sheet_anterior, sheet_actual], modo, representacion)
+            return hojas[sheet_anterior], hojas[sheet_actual]
         except Exception as e:
             raise Exception(f"Error al cargar datos: {e}")
 
-    def tabla_comparacion_completa(self, df1: pd.DataFrame, df2: pd.DataFrame) -> pd.DataFrame:
-        """Crea una tabla que muestra los cambios entre dos DataFrames."""
-        df1_str, df2_str = df1.astype(str), df2.astype(str)
-        return df1.where(df1 == df2, df1_str + " ➔ " + df2_str)
+    def _obtener_hojas(self, archivo: str, hojas: list[str], modo: str = None, representacion: str = None) -> dict:
+        """Devuelve las hojas pedidas de un archivo, desde la caché o leyéndolas."""
+        modo = modo or FILE_CONFIG["LOAD_MODE"]
+        representacion = representacion or FILE_CONFIG["REPRESENTATION"]
+        if not fuentes.es_excel(archivo):
+            modo = "nativo"
+        elif archivo.lower().endswith(".xls"):
+            modo = "pandas"
+        categorico = representacion == "category"
+        return cache_libros.obtener_hojas(archivo, hojas, f"{modo}/{representacion}",
+                                          lambda faltantes: self._leer_hojas(archivo, faltantes, modo, categorico))
+
+    def _leer_hojas(self, archivo: str, hojas: list[str], modo: str, categorico: bool = False) -> dict:
+        """Lee y normaliza las hojas indicadas con el modo de carga elegido."""
+        if not fuentes.es_excel(archivo):
+            tabla = self.data_utils.normalizar_df(fuentes.leer_tabla(archivo), categorico)
+            return {hoja: tabla for hoja in hojas}
+
+        if modo == "streaming":
+            chunk = FILE_CONFIG["STREAM_CHUNK_ROWS"]
+            return {hoja: self.file_utils.leer_hoja_streaming(archivo, hoja, chunk, categorico) for hoja in hojas}
+
+        leidas = pd.read_excel(archivo, sheet_name=hojas)
+        return {hoja: self.data_utils.normalizar_df(df, categorico) for hoja, df in leidas.items()}
+
+    def _cargar_con_instantaneas(self, config: dict, log_func=None) -> tuple[pd.DataFrame, pd.DataFrame, str]:
+        """
+        Carga ambas hojas. Si existe la instantánea de config["mes_anterior"], la
+        hoja anterior se toma de ella y solo se lee la actual. La hoja actual
+        se prepara como instantánea de config["mes_actual"] para el periodo
+        siguiente; se devuelve su ruta temporal (o None) para confirmarla solo
+        si la comparación termina bien (SnapshotStore.confirmar).
+        """
+        archivo, titulo, mes_anterior = config["archivo_base"], config["titulo"], config.get("mes_anterior")
+        modo = config.get("modo_carga")
+        representacion = config.get("representacion") or FILE_CONFIG["REPRESENTATION"]
+        activas = config.get("instantaneas", SNAPSHOT_CONFIG["ENABLED"])
+        store = SnapshotStore(os.path.join(config.get("directorio_salida") or ".", SNAPSHOT_CONFIG["DIRECTORY"]))
+
+        df1 = None
+        if activas and mes_anterior:
+            try:
+                if store.existe(titulo, mes_anterior):
+                    log_func and log_func(f"Cargando la hoja anterior desde la instantánea de '{mes_anterior}'...")
+                    df1 = store.leer(titulo, mes_anterior, representacion == "category")
+                else:
+                    log_func and log_func(f"No hay instantánea de '{mes_anterior}'; se lee la hoja '{config['sheet_anterior']}'")
+            except Exception as e:
+                log_func and log_func(f"No se pudo leer la instantánea de '{mes_anterior}': {e}")
+
+        if df1 is None:
+            log_func and log_func(f"Cargando datos de las hojas '{config['sheet_anterior']}' y '{config['sheet_actual']}'...")
+            df1, df2 = self.cargar_datos(archivo, config["sheet_anterior"], config["sheet_actual"], modo,
+                                         representacion, config.get("archivo_anterior"))
+        else:
+            log_func and log_func(f"Cargando datos de la hoja '{config['sheet_actual']}'...")
+            df2 = self.cargar_datos(archivo, config["sheet_actual"], config["sheet_actual"], modo, representacion)[1]
+
+        instantanea = None
+        if activas:
+            try:
+                instantanea = store.preparar(df2, titulo, config["mes_actual"])
+            except Exception as e:
+                log_func and log_func(f"No se pudo guardar la instantánea de '{config['mes_actual']}': {e}")
+        return df1, df2, instantanea
+
+    def _confirmar_instantanea(self, instantanea: str, mes: str, log_func=None):
+        try:
+            ruta = SnapshotStore.confirmar(instantanea)
+            log_func and log_func(f"Instantánea de '{mes}' guardada en '{ruta}'")
+        except Exception as e:
+            SnapshotStore.descartar(instantanea)
+            log_func and log_func(f"No se pudo guardar la instantánea de '{mes}': {e}")
+
+    def _filas_con_diferencias(self, df1: pd.DataFrame, df2: pd.DataFrame):
+        """Marca las filas cuya huella difiere entre dos DataFrames ya alineados (nulo equivale a vacío)."""
+        return self.data_utils.huellas_filas(df1) != self.data_utils.huellas_filas(df2)
+
+    def tabla_comparacion_completa(self, df1: pd.DataFrame, df2: pd.DataFrame,
+                                   mask_cambios: pd.DataFrame = None) -> TablaComparacion:
+        """
+        Crea la tabla que muestra los cambios entre dos DataFrames. Solo se
+        generan textos "anterior ➔ nuevo" para las celdas cambiadas; el resto se
+        lee de df1 al escribir. Si ya se tiene la máscara de cambios se reutiliza.
+        """
+        if mask_cambios is None:
+            mask_cambios = self.calcular_mascara_cambios(df1, df2)
+        return TablaComparacion.construir(df1, df2, mask_cambios)
+
+    def calcular_mascara_cambios(self, df1: pd.DataFrame, df2: pd.DataFrame) -> pd.DataFrame:
+        """
+        Marca las celdas con cambios (un nulo equivale a la celda vacía),
+        comparando solo las filas con huella distinta.
+        """
+        posiciones = np.flatnonzero(self._filas_con_diferencias(df1, df2))
+        sub1, sub2 = df1.iloc[posiciones], df2.iloc[posiciones]
+        cambios = np.zeros((len(posiciones), df1.shape[1]), dtype=bool)
+
+        def fragmento(columnas):
+            # Cada fragmento escribe solo sus propias columnas del arreglo compartido
+            for j in columnas:
+                valores1, valores2 = self.data_utils.valores_comparables(sub1.iloc[:, j], sub2.iloc[:, j])
+                cambios[:, j] = valores1 != valores2
+
+        mapear_fragmentos(fragmento, df1.shape[1], sin_gil=[
+            self.data_utils.comparables_por_codigo(sub1.iloc[:, j], sub2.iloc[:, j]) for j in range(df1.shape[1])])
+        mascara = np.zeros(df1.shape, dtype=bool)
+        mascara[posiciones] = cambios
+        return pd.DataFrame(mascara, index=df1.index, columns=df1.columns)
 
     def crear_reemplazo(self, df1: pd.DataFrame, df2: pd.DataFrame) -> pd.DataFrame:
         """Crea un DataFrame que reemplaza valores antiguos con nuevos."""
@@ -70,103 +208,30 @@ class ExcelProcessor:
     def detectar_filas_eliminadas(self, df1: pd.DataFrame, df2: pd.DataFrame, id_column: str) -> pd.DataFrame:
         return self._filas_por_diferencia_ids(df1, df2, id_column, "eliminadas")
 
-    def crear_historial_de_cambios(self, df1: pd.DataFrame, df2: pd.DataFrame, mes: str, id_column: str, log_func=None) -> list[dict]:
+    def crear_historial_de_cambios(self, df1: pd.DataFrame, df2: pd.DataFrame, mes: str, id_column: str, log_func=None) -> pd.DataFrame:
         """
         Genera un historial detallado de todos los cambios entre dos DataFrames,
         teniendo en cuenta modificaciones, añadidos y eliminaciones.
         """
-        historial = []
-
         if id_column not in df1.columns or id_column not in df2.columns:
             log_func and log_func(f"Advertencia: La columna '{id_column}' no existe en ambos DataFrames.")
-            return historial
-
-        df1_clean = df1.dropna(subset=[id_column]).copy()
-        df2_clean = df2.dropna(subset=[id_column]).copy()
-
-        df1_clean[id_column] = df1_clean[id_column].astype(str)
-        df2_clean[id_column] = df2_clean[id_column].astype(str)
-
-        dict_df1 = df1_clean.set_index(id_column).to_dict('index')
-        dict_df2 = df2_clean.set_index(id_column).to_dict('index')
-
-        ids_df1 = set(dict_df1.keys())
-        ids_df2 = set(dict_df2.keys())
-
-        # Modificaciones
-        ids_comunes = ids_df1 & ids_df2
-        log_func and log_func(f"Analizando {len(ids_comunes)} registros comunes para modificaciones...")
-
-        for facility_id in ids_comunes:
-            registro_anterior = dict_df1[facility_id]
-            registro_actual = dict_df2[facility_id]
-            for col in df1_clean.columns:
-                if col in df2_clean.columns and col != id_column:
-                    val1, val2 = registro_anterior.get(col, ""), registro_actual.get(col, "")
-                    str_val1, str_val2 = ("" if pd.isna(val1) else str(val1)), ("" if pd.isna(val2) else str(val2))
-                    if str_val1 != str_val2:
-                        historial.append({
-                            id_column: facility_id,
-                            "Fila (índice)": f"ID: {facility_id}",
-                            "Columna": col,
-                            "Valor Anterior": val1,
-                            "Valor Nuevo": val2,
-                            "Mes": mes,
-                            "Tipo de Cambio": MODIFICACION
-                        })
-
-        # Nuevos registros
-        nuevos_ids = ids_df2 - ids_df1
-        log_func and log_func(f"Detectados {len(nuevos_ids)} nuevos registros...")
-        for facility_id in nuevos_ids:
-            registro_nuevo = dict_df2[facility_id]
-            historial.append({
-                id_column: facility_id,
-                "Fila (índice)": f"ID: {facility_id}",
-                "Columna": "Nuevo Registro Completo",
-                "Valor Anterior": "N/A",
-                "Valor Nuevo": f"Nuevo registro con {len(registro_nuevo)} campos",
-                "Mes": mes,
-                "Tipo de Cambio": NUEVO_REGISTRO
-            })
-            for col, val in registro_nuevo.items():
-                if col != id_column:
-                    historial.append({
-                        id_column: facility_id,
-                        "Fila (índice)": f"ID: {facility_id}",
-                        "Columna": col,
-                        "Valor Anterior": "N/A",
-                        "Valor Nuevo": val,
-                        "Mes": mes,
-                        "Tipo de Cambio": NUEVO_REGISTRO_CAMPO
-                    })
-
-        # Registros eliminados
-        eliminados_ids = ids_df1 - ids_df2
-        log_func and log_func(f"Detectados {len(eliminados_ids)} registros eliminados...")
-        for facility_id in eliminados_ids:
-            registro_eliminado = dict_df1[facility_id]
-            historial.append({
-                id_column: facility_id,
-                "Fila (índice)": f"ID: {facility_id}",
-                "Columna": "Registro Eliminado Completo",
-                "Valor Anterior": f"Registro eliminado con {len(registro_eliminado)} campos",
-                "Valor Nuevo": "N/A",
-                "Mes": mes,
-                "Tipo de Cambio": REGISTRO_ELIMINADO
-            })
+            return pd.DataFrame()
 
-        log_func and log_func(f"Historial completado: {len(historial)} cambios detectados en total")
-        return historial
+        return crear_historial_vectorizado(df1, df2, mes, id_column, log_func)
 
     def obtener_resumen_nuevas_filas(self, df1: pd.DataFrame, df2: pd.DataFrame, id_column: str, log_func=None) -> pd.DataFrame:
         nuevas_filas = self.detectar_nuevas_filas(df1, df2, id_column)
         if nuevas_filas.empty:
             log_func and log_func("No se detectaron nuevas filas.")
             return pd.DataFrame()
-        log_func and log_func(f"Se detectaron {len(nuevas_filas)} nuevas filas:")
-        for _, row in nuevas_filas.iterrows():
-            log_func and log_func(f"  - Nueva fila con ID: {row[id_column]}")
+        # Un único mensaje con el recuento y una muestra de IDs, no uno por fila
+        muestra = nuevas_filas[id_column].head(LOG_CONFIG["NEW_ROWS_SAMPLE"]).astype(str).tolist()
+        mensaje = f"Se detectaron {len(nuevas_filas)} nuevas filas"
+        if muestra:
+            mensaje += ": " + ", ".join(muestra)
+            if len(nuevas_filas) > len(muestra):
+                mensaje += f" ... y {len(nuevas_filas) - len(muestra)} más"
+        log_func and log_func(mensaje)
         return nuevas_filas
 
     def crear_resumen_informe(self, historial_df: pd.DataFrame, mes: str) -> pd.DataFrame:
@@ -178,59 +243,249 @@ class ExcelProcessor:
                 "Nuevos Registros": 0,
                 "Registros Eliminados": 0
             }])
+        # Conteo por tipo: con la columna categórica solo se recorren los códigos
+        por_tipo = historial_df["Tipo de Cambio"].value_counts()
         return pd.DataFrame([{
             "Mes": mes,
             "Total de Cambios": len(historial_df),
-            "Modificaciones": (historial_df["Tipo de Cambio"] == MODIFICACION).sum(),
-            "Nuevos Registros": historial_df["Tipo de Cambio"].str.contains(NUEVO_REGISTRO, na=False).sum(),
-            "Registros Eliminados": (historial_df["Tipo de Cambio"] == REGISTRO_ELIMINADO).sum()
+            "Modificaciones": int(por_tipo.get(MODIFICACION, 0)),
+            "Nuevos Registros": int(por_tipo[por_tipo.index.astype(str).str.contains(NUEVO_REGISTRO)].sum()),
+            "Registros Eliminados": int(por_tipo.get(REGISTRO_ELIMINADO, 0))
         }])
 
-    def procesar_comparacion(self, config: dict, log_func=None) -> pd.DataFrame:
+    def estimar_comparacion(self, config: dict, log_func=None) -> dict:
+        """
+        Vista previa de la comparación: estima el resumen de crear_resumen_informe
+        y las columnas con más cambios, con intervalos de confianza, recorriendo
+        los IDs de ambas hojas y comparando solo una muestra de filas.
+        """
+        archivo = config["archivo_base"]
+        id_column = config["id_column"]
+        tamano = config.get("tamano_muestra") or ESTIMATE_CONFIG["SAMPLE_ROWS"]
+
+        log_func and log_func(f"Estimando la comparación con una muestra de {tamano} registros...")
+        anterior = muestrear_hoja(config.get("archivo_anterior") or archivo, config["sheet_anterior"], id_column, tamano)
+        actual = muestrear_hoja(archivo, config["sheet_actual"], id_column, tamano)
+        estimacion = estimar_cambios(anterior, actual, id_column, config.get("mes_actual", ""),
+                                     ESTIMATE_CONFIG["CONFIDENCE"], ESTIMATE_CONFIG["TOP_COLUMNS"])
+        log_func and log_func(f"Estimación basada en {estimacion['registros_muestra']} de "
+                              f"{estimacion['registros_comunes']} registros comunes")
+        return estimacion
+
+    def _iniciar_etapa(self, numero: int, descripcion: str, progreso_func=None, cancelar=None, total: int = None):
+        """Comprueba la cancelación y notifica el avance antes de cada etapa."""
+        if cancelar is not None and cancelar.is_set():
+            raise ComparacionCancelada("Comparación cancelada por el usuario")
+        progreso_func and progreso_func(numero, total or self.TOTAL_ETAPAS, descripcion)
+
+    def procesar_comparacion(self, config: dict, log_func=None, progreso_func=None, cancelar=None) -> pd.DataFrame:
+        """
+        Ejecuta la comparación completa.
+        progreso_func(etapa, total, descripcion) recibe el avance por etapas y
+        cancelar (p. ej. un threading.Event) detiene el proceso entre etapas.
+        Con config["metricas"] se miden las etapas y se guarda un JSON de métricas.
+        config["alineacion"] ("id" o "posicion") elige cómo se emparejan las filas.
+        config["archivo_anterior"] (opcional) es el archivo de la hoja anterior.
+        config["mes_anterior"] (opcional) toma la hoja anterior de la instantánea de ese periodo.
+        config["graficos"] añade la hoja "Gráficos" al libro de comparación.
+        Con config["modo_carga"] = "externo" se delega en procesar_comparacion_externa.
+        """
+        if (config.get("modo_carga") or FILE_CONFIG["LOAD_MODE"]) == "externo":
+            return self.procesar_comparacion_externa(config, log_func, progreso_func, cancelar)
+        instantanea = None
         try:
             archivo, mes, id_column, titulo = config["archivo_base"], config["mes_actual"], config["id_column"], config["titulo"]
-
-            log_func and log_func(f"Cargando datos de las hojas '{config['sheet_anterior']}' y '{config['sheet_actual']}'...")
-            df1, df2 = self.cargar_datos(archivo, config["sheet_anterior"], config["sheet_actual"])
-
-            log_func and log_func(f"Alineando DataFrames... {df1.shape} y {df2.shape}")
-            df1, df2 = self.data_utils.alinear_dataframes(df1, df2)
-
-            log_func and log_func("Generando tabla de comparación completa...")
-            comparacion_completa = self.tabla_comparacion_completa(df1, df2)
-            mask_cambios = (df1 != df2) & ~(df1.eq("") & df2.eq(""))
-
-            self.obtener_resumen_nuevas_filas(df1, df2, id_column, log_func)
-
-            log_func and log_func("Creando historial de cambios...")
-            historial = self.crear_historial_de_cambios(df1, df2, mes, id_column, log_func)
-            historial_df = pd.DataFrame(historial)
-
+            medidor = MedidorEtapas(config.get("metricas", METRICS_CONFIG["ENABLED"]),
+                                    config.get("metricas_memoria", METRICS_CONFIG["TRACE_MEMORY"]))
+
+            def etapa(numero, descripcion, nombre, filas_entrada=None):
+                self._iniciar_etapa(numero, descripcion, progreso_func, cancelar)
+                return medidor.etapa(nombre, filas_entrada)
+
+            with etapa(0, "Cargando datos", "cargar_datos") as metrica:
+                df1, df2, instantanea = self._cargar_con_instantaneas(config, log_func)
+                metrica["filas_salida"] = len(df1) + len(df2)
+
+            with etapa(1, f"Alineando {len(df1)} y {len(df2)} filas", "alinear_dataframes", len(df1) + len(df2)) as metrica:
+                alineacion = config.get("alineacion") or DIFF_CONFIG["ALIGN_MODE"]
+                log_func and log_func(f"Alineando DataFrames por {alineacion}... {df1.shape} y {df2.shape}")
+                df1, df2 = self.data_utils.alinear_dataframes(df1, df2, id_column, alineacion)
+                metrica["filas_salida"] = len(df1)
+
+            with etapa(2, f"Comparando {df1.shape[0]} filas x {df1.shape[1]} columnas", "comparar", len(df1)) as metrica:
+                log_func and log_func("Generando tabla de comparación completa...")
+                mask_cambios = self.calcular_mascara_cambios(df1, df2)
+                comparacion_completa = self.tabla_comparacion_completa(df1, df2, mask_cambios)
+                filas_con_cambios = comparacion_completa.filas_con_cambios()
+                metrica["filas_salida"] = int(filas_con_cambios.sum())
+
+                self.obtener_resumen_nuevas_filas(df1, df2, id_column, log_func)
+
+            with etapa(3, "Creando historial de cambios", "crear_historial", len(df1) + len(df2)) as metrica:
+                log_func and log_func("Creando historial de cambios...")
+                historial_df = self.crear_historial_de_cambios(df1, df2, mes, id_column, log_func)
+                metrica["filas_salida"] = len(historial_df)
+
+            # Las rutas de salida se construyen explícitamente (sin os.chdir) para
+            # poder ejecutar varias comparaciones a la vez en un mismo proceso
+            directorio = config.get("directorio_salida") or "."
+            self.file_utils.crear_directorio_si_no_existe(directorio)
             nombres = {
-                "historial": f"{titulo} - Historial de Cambios.xlsx",
-                "comparacion": f"{titulo}-procedimiento-{mes}.xlsx",
-                "actualizados": f"{titulo} - Datos Actualizados.xlsx"
+                "historial_db": ruta_base_datos(directorio, titulo),
+                "comparacion": os.path.join(directorio, f"{titulo}-procedimiento-{mes}.xlsx"),
+                "actualizados": os.path.join(directorio, f"{titulo} - Datos Actualizados.xlsx")
             }
+            ruta_historial_excel = os.path.join(directorio, f"{titulo} - Historial de Cambios.xlsx")
+
+            with etapa(4, f"Guardando {len(historial_df)} cambios en el historial", "guardar_historial",
+                       len(historial_df)) as metrica:
+                log_func and log_func("Generando resumen de cambios...")
+                resumen = self.crear_resumen_informe(historial_df, mes)
+                store = HistorialStore.abrir(nombres["historial_db"], ruta_historial_excel, log_func)
+                store.guardar_mes(historial_df, mes, id_column, resumen)
+                metrica["filas_salida"] = len(historial_df)
+                metrica["archivos"].append(store.ruta)
+
+            # Los gráficos del historial acumulado se renderizan en otro hilo
+            # mientras se escriben los libros y se insertan al final de la escritura
+            graficos = None
+            if config.get("graficos", CHART_CONFIG["ENABLED"]):
+                log_func and log_func("Generando gráficos en segundo plano...")
+                pool_graficos = ThreadPoolExecutor(max_workers=1)
+                graficos = pool_graficos.submit(renderizar_graficos, *store.agregados_graficos(CHART_CONFIG["TOP_COLUMNS"]),
+                                                CHART_CONFIG["DPI"])
+                pool_graficos.shutdown(wait=False)
+
+            with etapa(5, "Exportando historial", "exportar_historial") as metrica:
+                if config.get("exportar_historial", False):
+                    log_func and log_func("Exportando historial a Excel...")
+                    store.exportar_excel(ruta_historial_excel, config.get("meses_exportar"))
+                    nombres["historial"] = ruta_historial_excel
+                    metrica["archivos"].append(ruta_historial_excel)
+
+            with etapa(6, "Escribiendo archivos de resultados", "escribir_resultados", len(df1)) as metrica:
+                log_func and log_func("Creando DataFrame actualizado...")
+                reemplazo = self.crear_reemplazo(df1, df2)
+                opciones = {"constant_memory": EXCEL_FORMAT["CONSTANT_MEMORY"]}
+                with pd.ExcelWriter(nombres["comparacion"], engine="xlsxwriter", engine_kwargs={"options": opciones}) as writer:
+                    self.file_utils.escribir_formateado(writer, "Comparación Completa", comparacion_completa, resaltar=True)
+                    self.file_utils.escribir_formateado(writer, "Solo Cambios", comparacion_completa.solo_cambios(),
+                                                        resaltar=True)
+                    if graficos is not None:
+                        # El historial ya está guardado: un fallo de los gráficos solo omite su hoja
+                        try:
+                            imagenes = graficos.result()
+                        except Exception as e:
+                            log_func and log_func(f"No se pudieron generar los gráficos; se omite la hoja: {e}")
+                        else:
+                            insertar_graficos(writer.book, imagenes, log_func)
+
+                pd.DataFrame(reemplazo).to_excel(nombres["actualizados"], index=False)
+                metrica["filas_salida"] = len(df1) + int(filas_con_cambios.sum()) + len(reemplazo)
+                metrica["archivos"] += [nombres["comparacion"], nombres["actualizados"]]
+            progreso_func and progreso_func(self.TOTAL_ETAPAS, self.TOTAL_ETAPAS, "Completado")
+
+            # Solo una ejecución completa deja la instantánea de la que parte el periodo siguiente
+            if instantanea:
+                self._confirmar_instantanea(instantanea, mes, log_func)
+                instantanea = None
+
+            if medidor.activo:
+                nombres["metricas"] = os.path.join(directorio, f"{titulo}-metricas-{mes}.json")
+                medidor.guardar_json(nombres["metricas"], {"titulo": titulo, "mes": mes})
+                log_func and log_func("Métricas por etapa:")
+                for linea in medidor.tabla_resumen():
+                    log_func and log_func(linea)
 
-            if os.path.exists(nombres["historial"]):
-                historial_existente = pd.read_excel(nombres["historial"])
-                historial_total = pd.concat([historial_existente, historial_df], ignore_index=True)
-            else:
-                historial_total = historial_df
-            historial_total.to_excel(nombres["historial"], index=False)
+            log_func and log_func("Proceso completado exitosamente.")
+            log_func and log_func("Archivos generados:")
+            for archivo in nombres.values():
+                log_func and log_func(f"- {archivo}")
 
-            log_func and log_func("Generando resumen de cambios...")
-            resumen = self.crear_resumen_informe(historial_df, mes)
-            with pd.ExcelWriter(nombres["historial"], engine='openpyxl', mode='a') as writer:
-                resumen.to_excel(writer, sheet_name='Resumen Informe', index=False)
+            return resumen
 
-            log_func and log_func("Creando DataFrame actualizado...")
-            reemplazo = self.crear_reemplazo(df1, df2)
-            with pd.ExcelWriter(nombres["comparacion"], engine="xlsxwriter") as writer:
-                self.file_utils.escribir_formateado(writer, "Comparación Completa", comparacion_completa, mask_cambios, resaltar=True)
-                self.file_utils.escribir_formateado(writer, "Solo Cambios", comparacion_completa[mask_cambios.any(axis=1)], mask_cambios, resaltar=True)
+        except ComparacionCancelada:
+            log_func and log_func("Comparación cancelada.")
+            raise
+        except Exception as e:
+            log_func and log_func(f"Error durante el procesamiento: {e}")
+            raise
+        finally:
+            if instantanea:
+                SnapshotStore.descartar(instantanea)
 
-            pd.DataFrame(reemplazo).to_excel(nombres["actualizados"], index=False)
+    def procesar_comparacion_externa(self, config: dict, log_func=None, progreso_func=None, cancelar=None) -> pd.DataFrame:
+        """
+        Variante con memoria acotada para hojas que no caben en memoria: ambas
+        hojas se leen en streaming, se ordenan por ID en tramos en disco y se
+        fusionan, y las filas del historial pasan directamente al almacén SQLite.
+        Solo genera el historial (y su exportación opcional): no escribe el libro
+        de comparación ni el de datos actualizados.
+        """
+        try:
+            archivo, mes, id_column, titulo = config["archivo_base"], config["mes_actual"], config["id_column"], config["titulo"]
+            hojas = [config["sheet_anterior"], config["sheet_actual"]]
+            archivos = [config.get("archivo_anterior") or archivo, archivo]
+            if not all(ruta.lower().endswith(".xlsx") for ruta in archivos):
+                raise ValueError("El modo externo solo admite archivos .xlsx")
+            medidor = MedidorEtapas(config.get("metricas", METRICS_CONFIG["ENABLED"]),
+                                    config.get("metricas_memoria", METRICS_CONFIG["TRACE_MEMORY"]))
+
+            def etapa(numero, descripcion, nombre, filas_entrada=None):
+                self._iniciar_etapa(numero, descripcion, progreso_func, cancelar, self.ETAPAS_EXTERNAS)
+                return medidor.etapa(nombre, filas_entrada)
+
+            directorio = config.get("directorio_salida") or "."
+            self.file_utils.crear_directorio_si_no_existe(directorio)
+            nombres = {"historial_db": ruta_base_datos(directorio, titulo)}
+            ruta_historial_excel = os.path.join(directorio, f"{titulo} - Historial de Cambios.xlsx")
+
+            with tempfile.TemporaryDirectory(prefix="comparador_", dir=DIFF_CONFIG["EXTERNAL_TEMP_DIR"]) as temporal:
+                with etapa(0, "Ordenando hojas por ID en disco", "ordenar_en_disco") as metrica:
+                    lectores = [self.file_utils.iterar_filas_streaming(ruta, hoja) for ruta, hoja in zip(archivos, hojas)]
+                    encabezados = [next(lector) for lector in lectores]
+                    # Como en memoria: una hoja sin la columna ID no tiene registros que emparejar
+                    for hoja, columnas_hoja in zip(hojas, encabezados):
+                        if id_column not in columnas_hoja:
+                            log_func and log_func(f"Advertencia: La columna '{id_column}' no existe en la hoja "
+                                                  f"'{hoja}'; ninguna de sus filas tiene ID")
+                    columnas = sorted(set(encabezados[0]) | set(encabezados[1]))
+                    posicion_id = columnas.index(id_column)
+
+                    flujos, filas = [], []
+                    for hoja, lector, columnas_hoja in zip(hojas, lectores, encabezados):
+                        log_func and log_func(f"Ordenando la hoja '{hoja}' por '{id_column}' en disco...")
+                        flujo, total = ordenar_en_disco(proyectar_filas(lector, columnas_hoja, columnas), posicion_id,
+                                                        temporal, DIFF_CONFIG["EXTERNAL_RUN_ROWS"],
+                                                        DIFF_CONFIG["EXTERNAL_MAX_OPEN_RUNS"])
+                        flujos.append(flujo)
+                        filas.append(total)
+                    log_func and log_func(f"Hojas ordenadas: {filas[0]} y {filas[1]} registros con ID")
+                    metrica["filas_salida"] = sum(filas)
+
+                with etapa(1, "Fusionando hojas y guardando el historial", "fusionar_historial", sum(filas)) as metrica:
+                    log_func and log_func("Creando historial de cambios por fusión ordenada...")
+                    store = HistorialStore.abrir(nombres["historial_db"], ruta_historial_excel, log_func)
+                    resumen = store.guardar_mes_filas(
+                        historial_por_fusion(*flujos, columnas, posicion_id, id_column, mes), mes, id_column)
+                    metrica["filas_salida"] = int(resumen["Total de Cambios"].iloc[0])
+                    metrica["archivos"].append(store.ruta)
+                    log_func and log_func(f"Historial completado: {metrica['filas_salida']} cambios detectados en total")
+
+            with etapa(2, "Exportando historial", "exportar_historial") as metrica:
+                if config.get("exportar_historial", False):
+                    log_func and log_func("Exportando historial a Excel...")
+                    store.exportar_excel(ruta_historial_excel, config.get("meses_exportar"))
+                    nombres["historial"] = ruta_historial_excel
+                    metrica["archivos"].append(ruta_historial_excel)
+            progreso_func and progreso_func(self.ETAPAS_EXTERNAS, self.ETAPAS_EXTERNAS, "Completado")
+
+            if medidor.activo:
+                nombres["metricas"] = os.path.join(directorio, f"{titulo}-metricas-{mes}.json")
+                medidor.guardar_json(nombres["metricas"], {"titulo": titulo, "mes": mes})
+                log_func and log_func("Métricas por etapa:")
+                for linea in medidor.tabla_resumen():
+                    log_func and log_func(linea)
 
             log_func and log_func("Proceso completado exitosamente.")
             log_func and log_func("Archivos generados:")
@@ -239,6 +494,9 @@ class ExcelProcessor:
 
             return resumen
 
+        except ComparacionCancelada:
+            log_func and log_func("Comparación cancelada.")
+            raise
         except Exception as e:
             log_func and log_func(f"Error durante el procesamiento: {e}")
             raise
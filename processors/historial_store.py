@@ -0,0 +1,251 @@
+"""
+Almacén del historial de cambios en SQLite, particionado por mes
+"""
+
+import os
+import sqlite3
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+from processors.diff_engine import MODIFICACION, NUEVO_REGISTRO, REGISTRO_ELIMINADO
+
+COLUMNAS_TABLA = ["id_valor", "fila", "columna", "valor_anterior", "valor_nuevo", "mes", "tipo_cambio"]
+COLUMNAS_EXCEL = ["Fila (índice)", "Columna", "Valor Anterior", "Valor Nuevo", "Mes", "Tipo de Cambio"]
+COLUMNAS_RESUMEN = ["Mes", "Total de Cambios", "Modificaciones", "Nuevos Registros", "Registros Eliminados"]
+
+
+def ruta_base_datos(directorio: str, titulo: str) -> str:
+    """Ruta del almacén del historial de un título dentro de su carpeta de salida."""
+    return os.path.join(directorio, f"{titulo} - Historial de Cambios.sqlite")
+
+
+class HistorialStore:
+    """
+    Historial acumulado de solo escritura incremental: cada ejecución reemplaza
+    únicamente las filas de su mes, sin releer ni reescribir los meses anteriores.
+    El Excel del historial se genera bajo demanda con exportar_excel.
+    """
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        with self._conectar() as con:
+            con.executescript("""
+                CREATE TABLE IF NOT EXISTS historial (
+                    orden INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id_columna TEXT,
+                    id_valor TEXT,
+                    fila TEXT,
+                    columna TEXT,
+                    valor_anterior TEXT,
+                    valor_nuevo TEXT,
+                    mes TEXT,
+                    tipo_cambio TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_historial_mes ON historial (mes);
+                CREATE TABLE IF NOT EXISTS resumen (
+                    mes TEXT PRIMARY KEY,
+                    total INTEGER,
+                    modificaciones INTEGER,
+                    nuevos INTEGER,
+                    eliminados INTEGER
+                );
+            """)
+
+    @contextmanager
+    def _conectar(self):
+        """Abre una conexión con una transacción que se confirma al salir."""
+        con = sqlite3.connect(self.ruta)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    @staticmethod
+    def _como_texto(serie: pd.Series) -> list:
+        """Convierte una columna a texto para SQLite, con NULL para valores nulos."""
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            # Solo se convierte cada categoría una vez; el código -1 (nulo) toma el None final
+            textos = np.append(serie.cat.categories.to_numpy(dtype=object).astype(str), None)
+            return textos[serie.cat.codes.to_numpy()].tolist()
+        valores = serie.to_numpy(dtype=object)
+        return np.where(pd.isna(valores), None, valores.astype(str)).tolist()
+
+    def guardar_mes(self, historial_df: pd.DataFrame, mes: str, id_column: str, resumen: pd.DataFrame = None):
+        """Reemplaza el historial (y el resumen) del mes con los cambios de esta ejecución."""
+        with self._conectar() as con:
+            con.execute("DELETE FROM historial WHERE mes = ?", (mes,))
+            if not historial_df.empty:
+                columnas = [self._como_texto(historial_df[id_column])]
+                columnas += [self._como_texto(historial_df[col]) for col in COLUMNAS_EXCEL]
+                con.executemany(
+                    "INSERT INTO historial (id_columna, id_valor, fila, columna, valor_anterior, "
+                    "valor_nuevo, mes, tipo_cambio) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    ((id_column, *fila) for fila in zip(*columnas)))
+            if resumen is not None:
+                self._insertar_resumen(con, resumen)
+
+    def guardar_mes_filas(self, filas, mes: str, id_column: str) -> pd.DataFrame:
+        """
+        Reemplaza el historial del mes con las filas de un iterable de tuplas en
+        el orden de COLUMNAS_TABLA, sin materializarlo. El resumen del mes se
+        calcula en SQLite, se guarda y se devuelve con el formato de crear_resumen_informe.
+        """
+        with self._conectar() as con:
+            con.execute("DELETE FROM historial WHERE mes = ?", (mes,))
+            con.executemany(
+                "INSERT INTO historial (id_columna, id_valor, fila, columna, valor_anterior, "
+                "valor_nuevo, mes, tipo_cambio) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ((id_column, *fila) for fila in filas))
+            fila_resumen = self._resumir_mes(con, mes)
+        return pd.DataFrame([fila_resumen], columns=COLUMNAS_RESUMEN)
+
+    @staticmethod
+    def _resumir_mes(con, mes: str) -> tuple:
+        """Calcula en SQLite el resumen del mes a partir de sus filas y lo guarda."""
+        totales = con.execute(
+            "SELECT COUNT(*), TOTAL(tipo_cambio = ?), TOTAL(tipo_cambio LIKE ?), TOTAL(tipo_cambio = ?) "
+            "FROM historial WHERE mes = ?",
+            (MODIFICACION, f"{NUEVO_REGISTRO}%", REGISTRO_ELIMINADO, mes)).fetchone()
+        fila_resumen = (mes, *(int(valor) for valor in totales))
+        con.execute("INSERT OR REPLACE INTO resumen VALUES (?, ?, ?, ?, ?)", fila_resumen)
+        return fila_resumen
+
+    def meses(self) -> list[str]:
+        """Devuelve los meses almacenados en orden de inserción."""
+        with self._conectar() as con:
+            filas = con.execute("SELECT mes FROM historial GROUP BY mes ORDER BY MIN(orden)").fetchall()
+        return [fila[0] for fila in filas]
+
+    def leer(self, meses: list[str] = None) -> pd.DataFrame:
+        """Lee el historial completo o solo los meses indicados, en el formato del Excel."""
+        consulta = "SELECT id_columna, " + ", ".join(COLUMNAS_TABLA) + " FROM historial"
+        parametros = []
+        if meses:
+            consulta += f" WHERE mes IN ({', '.join('?' * len(meses))})"
+            parametros = list(meses)
+        consulta += " ORDER BY orden"
+
+        with self._conectar() as con:
+            df = pd.read_sql_query(consulta, con, params=parametros)
+
+        id_columnas = df["id_columna"].dropna().unique()
+        nombre_id = id_columnas[0] if len(id_columnas) == 1 else "ID"
+        df = df.drop(columns=["id_columna"])
+        df.columns = [nombre_id] + COLUMNAS_EXCEL
+        return df
+
+    def iterar_filas(self, meses: list[str] = None, filas_por_bloque: int = 10000):
+        """
+        Devuelve (columnas, generador de listas de tuplas) con las filas del
+        historial en el formato de leer, en bloques de `filas_por_bloque`, sin
+        cargar el historial completo en memoria.
+        """
+        filtro, parametros = "", []
+        if meses:
+            filtro = f" WHERE mes IN ({', '.join('?' * len(meses))})"
+            parametros = list(meses)
+        with self._conectar() as con:
+            id_columnas = con.execute(f"SELECT DISTINCT id_columna FROM historial{filtro or ' WHERE 1'} "
+                                      "AND id_columna IS NOT NULL LIMIT 2", parametros).fetchall()
+        columnas = [id_columnas[0][0] if len(id_columnas) == 1 else "ID"] + COLUMNAS_EXCEL
+
+        def bloques():
+            with self._conectar() as con:
+                cursor = con.execute("SELECT " + ", ".join(COLUMNAS_TABLA) + f" FROM historial{filtro} ORDER BY orden",
+                                     parametros)
+                while True:
+                    filas = cursor.fetchmany(filas_por_bloque)
+                    if not filas:
+                        return
+                    yield filas
+        return columnas, bloques()
+
+    def leer_resumen(self, meses: list[str] = None) -> pd.DataFrame:
+        with self._conectar() as con:
+            df = pd.read_sql_query("SELECT mes, total, modificaciones, nuevos, eliminados FROM resumen", con)
+        df.columns = COLUMNAS_RESUMEN
+        if meses:
+            df = df[df["Mes"].isin(meses)]
+        return df
+
+    def agregados_graficos(self, top: int = 10) -> tuple[pd.DataFrame, pd.Series]:
+        """
+        Cambios por mes y tipo y columnas con más cambios de todo el historial,
+        calculados en SQLite sin leer las filas, listos para excel_charts.renderizar_graficos.
+        """
+        with self._conectar() as con:
+            por_mes = pd.read_sql_query(
+                "SELECT mes, tipo_cambio, COUNT(*) AS n, MIN(orden) AS orden FROM historial "
+                "GROUP BY mes, tipo_cambio", con)
+            columnas = pd.read_sql_query(
+                "SELECT columna, COUNT(*) AS n FROM historial GROUP BY columna ORDER BY n DESC LIMIT ?",
+                con, params=[top])
+
+        meses = por_mes.groupby("mes")["orden"].min().sort_values().index
+        resumen_mes = por_mes.pivot_table(index="mes", columns="tipo_cambio", values="n", aggfunc="sum", fill_value=0)
+        resumen_mes = resumen_mes.reindex(meses)
+        resumen_mes.index.name, resumen_mes.columns.name = "Mes", "Tipo de Cambio"
+        top_columnas = pd.Series(columnas["n"].to_numpy(), index=columnas["columna"].to_numpy(), name="count")
+        return resumen_mes, top_columnas
+
+    def exportar_excel(self, ruta_excel: str, meses: list[str] = None):
+        """Genera el Excel del historial (todo o un rango de meses) con su hoja de resumen."""
+        with pd.ExcelWriter(ruta_excel, engine="xlsxwriter") as writer:
+            self.leer(meses).to_excel(writer, sheet_name="Historial", index=False)
+            self.leer_resumen(meses).to_excel(writer, sheet_name="Resumen Informe", index=False)
+
+    def importar_excel(self, ruta_excel: str):
+        """
+        Migra un 'Historial de Cambios.xlsx' existente al almacén, mes a mes,
+        con su hoja "Resumen Informe". Los meses sin fila de resumen en el
+        libro se resumen a partir de las filas importadas. Las celdas se leen
+        como texto tal cual: "N/A" o "null" son valores, no nulos.
+        """
+        hojas = pd.read_excel(ruta_excel, sheet_name=None, dtype=str, keep_default_na=False)
+        historial = next(iter(hojas.values()), pd.DataFrame())
+        if historial.empty or "Mes" not in historial.columns:
+            return
+        id_column = historial.columns[0]
+        for mes, filas in historial.groupby("Mes", sort=False):
+            self.guardar_mes(filas, str(mes), id_column)
+
+        resumen = hojas.get("Resumen Informe")
+        with self._conectar() as con:
+            if resumen is not None and set(COLUMNAS_RESUMEN) <= set(resumen.columns):
+                self._insertar_resumen(con, resumen[(resumen[COLUMNAS_RESUMEN] != "").all(axis=1)])
+            faltantes = con.execute(
+                "SELECT DISTINCT mes FROM historial WHERE mes NOT IN (SELECT mes FROM resumen)").fetchall()
+            for (mes,) in faltantes:
+                self._resumir_mes(con, mes)
+
+    @staticmethod
+    def _insertar_resumen(con, resumen: pd.DataFrame):
+        """Reemplaza las filas de resumen de los meses incluidos en `resumen`."""
+        for fila in resumen[COLUMNAS_RESUMEN].itertuples(index=False):
+            con.execute("INSERT OR REPLACE INTO resumen VALUES (?, ?, ?, ?, ?)",
+                        (str(fila[0]), *(int(float(valor)) for valor in fila[1:])))
+
+    @classmethod
+    def abrir(cls, ruta: str, ruta_excel_anterior: str = None, log_func=None) -> "HistorialStore":
+        """
+        Abre el almacén; si es nuevo y existe un historial en Excel, lo importa una
+        vez. La importación se hace en un archivo aparte que solo ocupa `ruta` al
+        terminar, así que una importación interrumpida se repite en la siguiente apertura.
+        """
+        if os.path.exists(ruta) or not (ruta_excel_anterior and os.path.exists(ruta_excel_anterior)):
+            return cls(ruta)
+
+        log_func and log_func(f"Importando historial existente desde '{ruta_excel_anterior}'...")
+        temporal = ruta + ".importando"
+        try:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            cls(temporal).importar_excel(ruta_excel_anterior)
+            os.replace(temporal, ruta)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+        return cls(ruta)
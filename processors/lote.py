@@ -0,0 +1,136 @@
+"""
+Ejecución por lotes: muchas comparaciones en paralelo a partir de un manifiesto
+"""
+
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+
+from processors.excel_processor import ExcelProcessor
+from utils.cache_libros import cache_libros
+
+CAMPOS_OBLIGATORIOS = ["archivo_base", "sheet_anterior", "sheet_actual", "id_column", "titulo", "mes_actual"]
+# Opciones sí/no: en un CSV llegan como texto ("False" sería verdadero)
+CAMPOS_BOOLEANOS = ["exportar_historial", "metricas", "metricas_memoria", "graficos", "instantaneas"]
+_VERDADEROS = {"1", "true", "verdadero", "si", "sí", "yes", "y", "s"}
+_FALSOS = {"0", "false", "falso", "no", "n"}
+
+
+def _booleano(valor: str, campo: str, numero: int) -> bool:
+    texto = valor.strip().lower()
+    if texto in _VERDADEROS:
+        return True
+    if texto in _FALSOS:
+        return False
+    raise ValueError(f"Trabajo {numero} del manifiesto: valor no válido para '{campo}': '{valor}'")
+
+
+def leer_manifiesto(ruta: str) -> list[dict]:
+    """
+    Lee la lista de trabajos desde un JSON (lista de objetos o {"trabajos": [...]})
+    o un CSV con una columna por campo de configuración. Las rutas relativas se
+    resuelven respecto a la carpeta del manifiesto.
+    """
+    if ruta.lower().endswith(".csv"):
+        with open(ruta, newline="", encoding="utf-8-sig") as archivo:
+            trabajos = [dict(fila) for fila in csv.DictReader(archivo)]
+        for numero, trabajo in enumerate(trabajos, start=1):
+            for campo in CAMPOS_BOOLEANOS:
+                valor = trabajo.pop(campo, None)
+                # Una celda vacía deja el valor por defecto
+                if valor is not None and valor.strip():
+                    trabajo[campo] = _booleano(valor, campo, numero)
+    else:
+        with open(ruta, encoding="utf-8") as archivo:
+            contenido = json.load(archivo)
+        trabajos = contenido["trabajos"] if isinstance(contenido, dict) else contenido
+
+    base = os.path.dirname(os.path.abspath(ruta))
+    for numero, trabajo in enumerate(trabajos, start=1):
+        faltantes = [campo for campo in CAMPOS_OBLIGATORIOS if not trabajo.get(campo)]
+        if faltantes:
+            raise ValueError(f"Trabajo {numero} del manifiesto sin los campos: {', '.join(faltantes)}")
+        trabajo["archivo_base"] = os.path.join(base, trabajo["archivo_base"])
+        if trabajo.get("archivo_anterior"):
+            trabajo["archivo_anterior"] = os.path.join(base, trabajo["archivo_anterior"])
+        trabajo["directorio_salida"] = os.path.join(base, trabajo.get("directorio_salida") or ".")
+    return trabajos
+
+
+def ejecutar_trabajo(config: dict) -> dict:
+    """
+    Ejecuta una comparación; su log se escribe en '<titulo>-<mes>.log' junto a las salidas.
+    Salvo que el trabajo indique "instantaneas", no se guarda la instantánea de
+    la hoja actual: en lotes y en el servicio ningún trabajo posterior la leería.
+    """
+    config = {"instantaneas": False, **config}
+    # En los procesos del pool cada trabajo lee sus propios libros: la caché solo retendría hojas muertas
+    cache_libros.limitar(0)
+    ruta_log = os.path.join(config["directorio_salida"], f"{config['titulo']}-{config['mes_actual']}.log")
+    inicio = time.perf_counter()
+    resultado = {"titulo": config["titulo"], "mes": config["mes_actual"], "archivo": config["archivo_base"], "log": ruta_log}
+
+    # La carpeta y el log también pueden fallar (sin permisos, '/' en el título): el trabajo queda en error
+    try:
+        os.makedirs(config["directorio_salida"], exist_ok=True)
+        with open(ruta_log, "w", encoding="utf-8") as log:
+            def log_func(mensaje):
+                log.write(f"[{time.strftime('%H:%M:%S')}] {mensaje}\n")
+                log.flush()
+
+            resumen = ExcelProcessor().procesar_comparacion(config, log_func)
+        resultado.update(estado="ok", resumen=resumen.to_dict("records")[0])
+    except Exception as e:
+        resultado.update(estado="error", error=str(e))
+
+    resultado["segundos"] = round(time.perf_counter() - inicio, 2)
+    return resultado
+
+
+def resumen_lote(resultados: list[dict]) -> pd.DataFrame:
+    """Agrega los resúmenes de crear_resumen_informe de cada trabajo, con una fila de totales."""
+    filas = []
+    for resultado in resultados:
+        fila = {"Título": resultado["titulo"], "Archivo": resultado["archivo"], "Estado": resultado["estado"]}
+        fila.update(resultado.get("resumen") or {"Mes": resultado["mes"]})
+        fila["Segundos"] = resultado["segundos"]
+        fila["Error"] = resultado.get("error", "")
+        filas.append(fila)
+
+    resumen = pd.DataFrame(filas)
+    columnas_numericas = ["Total de Cambios", "Modificaciones", "Nuevos Registros", "Registros Eliminados", "Segundos"]
+    columnas_numericas = [col for col in columnas_numericas if col in resumen.columns]
+    totales = {"Título": "TOTAL", "Estado": f"{(resumen['Estado'] == 'ok').sum()}/{len(resumen)} ok"}
+    totales.update(resumen[columnas_numericas].sum().to_dict())
+    return pd.concat([resumen, pd.DataFrame([totales])], ignore_index=True)
+
+
+def ejecutar_lote(trabajos: list[dict], procesos: int = None, log_func=None) -> pd.DataFrame:
+    """Reparte los trabajos en un pool de procesos y devuelve el resumen agregado."""
+    resultados = [None] * len(trabajos)
+    completados = 0
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        futuros = {pool.submit(ejecutar_trabajo, trabajo): numero for numero, trabajo in enumerate(trabajos)}
+        for futuro in as_completed(futuros):
+            try:
+                resultado = futuro.result()
+            except Exception as e:
+                # El proceso murió (BrokenProcessPool) o el trabajo falló fuera de su propio try:
+                # el trabajo sigue teniendo su fila en el resumen
+                trabajo = trabajos[futuros[futuro]]
+                resultado = {"titulo": trabajo["titulo"], "mes": trabajo["mes_actual"],
+                             "archivo": trabajo["archivo_base"], "estado": "error",
+                             "error": str(e) or type(e).__name__, "segundos": 0.0}
+            # Se conserva el orden del manifiesto, no el de finalización
+            resultados[futuros[futuro]] = resultado
+            completados += 1
+            if resultado["estado"] == "ok":
+                detalle = f"{resultado['resumen']['Total de Cambios']} cambios"
+            else:
+                detalle = resultado.get("error") or "error sin mensaje"
+            log_func and log_func(f"[{completados}/{len(trabajos)}] {resultado['titulo']} ({resultado['mes']}): "
+                                  f"{resultado['estado']} - {detalle} en {resultado['segundos']} s")
+    return resumen_lote(resultados)
@@ -0,0 +1,520 @@
+"""
+Servicio HTTP local: recibe comparaciones, las ejecuta en un pool de procesos precalentado y transmite el historial
+"""
+
+import importlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from config.settings import SERVICE_CONFIG
+from processors.historial_store import HistorialStore, ruta_base_datos
+from processors.lote import CAMPOS_OBLIGATORIOS, ejecutar_trabajo
+from utils import fuentes
+
+TIPO_NDJSON = "application/x-ndjson"
+TIPO_ARROW = "application/vnd.apache.arrow.stream"
+_BLOQUE_SUBIDA = 1 << 20
+# Datos internos de un trabajo que no forman parte de su estado público
+_INTERNOS = {"futuro", "pool", "config", "archivos", "directorio_propio"}
+
+
+class ServicioSaturado(Exception):
+    """Se alcanzó el máximo de trabajos pendientes o no hay procesos con los que ejecutarlos."""
+    pass
+
+
+def _calentar():
+    """Inicializador de cada proceso del pool: las bibliotecas pesadas se importan una sola vez."""
+    for modulo in SERVICE_CONFIG["PRELOAD_MODULES"]:
+        importlib.import_module(modulo)
+
+
+def _listo() -> int:
+    return os.getpid()
+
+
+class _SalidaFragmentada:
+    """Archivo de solo escritura que envía cada escritura como un fragmento HTTP/1.1 'chunked'."""
+
+    closed = False
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, datos) -> int:
+        datos = bytes(datos)
+        if datos:
+            self.wfile.write(f"{len(datos):X}\r\n".encode("ascii") + datos + b"\r\n")
+        return len(datos)
+
+    def flush(self):
+        self.wfile.flush()
+
+    def cerrar(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class ServicioComparacion:
+    """
+    API HTTP local sobre procesar_comparacion (ver ejecutar_trabajo):
+
+    - POST /archivos?nombre=libro.xlsx: guarda el cuerpo como archivo y devuelve su ruta.
+    - POST /trabajos: encola una comparación (JSON con los campos del manifiesto
+      del modo por lotes; las rutas pueden ser las devueltas por /archivos) y
+      responde 202 con su id sin esperar a que termine.
+    - GET /trabajos y GET /trabajos/<id>: estado, resumen o error de los trabajos.
+    - GET /trabajos/<id>/historial?formato=ndjson|arrow[&meses=todos|m1,m2]:
+      transmite por bloques las filas del historial del trabajo (por defecto, su mes).
+    - GET /salud: procesos y trabajos en cola, en curso y terminados.
+
+    Los procesos del pool se crean y se calientan (pandas, openpyxl y el
+    procesador ya importados) antes de aceptar peticiones, así que ningún
+    trabajo paga el arranque. Si un proceso muere (p. ej. sin memoria), el pool
+    roto se sustituye por uno nuevo, también calentado, y los trabajos que
+    estaban en él se reenvían una vez; el nuevo pool se calienta fuera del
+    bloqueo, así que las consultas de estado no esperan.
+
+    Las salidas de cada trabajo van a '<carpeta>/trabajos/<id>' (o a la
+    subcarpeta de '<carpeta>/trabajos' que indique directorio_salida) y se
+    borran, junto con los archivos subidos que ya no use ningún trabajo, cuando
+    el trabajo sale de la lista de terminados.
+    """
+
+    def __init__(self, host: str = None, puerto: int = None, procesos: int = None, directorio: str = None,
+                 log_func=None):
+        self.host = host or SERVICE_CONFIG["HOST"]
+        self.puerto = SERVICE_CONFIG["PORT"] if puerto is None else puerto
+        self.procesos = procesos or os.cpu_count() or 1
+        self.directorio = os.path.abspath(directorio or SERVICE_CONFIG["DIRECTORY"])
+        self.log_func = log_func
+        self.trabajos = OrderedDict()  # id -> trabajo, en orden de llegada
+        self.archivos = {}             # ruta subida -> (momento de subida, usada por algún trabajo)
+        self.completados = 0
+        self.errores = 0
+        self.bloqueo = threading.Lock()
+        self.pool = None
+        self._pool_roto = False
+        # Serializa la sustitución del pool sin retener self.bloqueo mientras se calienta
+        self._bloqueo_pool = threading.Lock()
+        self._deteniendo = False
+        self.servidor = None
+        self._sirviendo = False
+
+    # --- ciclo de vida --------------------------------------------------------
+
+    def iniciar(self) -> tuple[str, int]:
+        """Crea y calienta el pool y abre el puerto; devuelve la dirección (host, puerto) real."""
+        os.makedirs(os.path.join(self.directorio, "archivos"), exist_ok=True)
+        os.makedirs(os.path.join(self.directorio, "trabajos"), exist_ok=True)
+
+        self.pool = self._crear_pool()
+        self.servidor = ThreadingHTTPServer((self.host, self.puerto), _Manejador)
+        self.servidor.daemon_threads = True
+        self.servidor.servicio = self
+        return self.servidor.server_address[:2]
+
+    def _crear_pool(self) -> ProcessPoolExecutor:
+        """Crea un pool y espera a que cada proceso haya ejecutado _calentar."""
+        inicio = time.perf_counter()
+        pool = ProcessPoolExecutor(max_workers=self.procesos, initializer=_calentar)
+        try:
+            pids = {futuro.result() for futuro in [pool.submit(_listo) for _ in range(self.procesos)]}
+        except BaseException:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        self.log_func and self.log_func(f"Pool de {len(pids)} procesos listo en {time.perf_counter() - inicio:.2f} s")
+        return pool
+
+    def _marcar_roto(self, pool: ProcessPoolExecutor):
+        with self.bloqueo:
+            if pool is self.pool:
+                self._pool_roto = True
+
+    def _pool_sano(self) -> ProcessPoolExecutor:
+        """Pool vigente; si está roto, crea y calienta otro fuera de self.bloqueo y lo pone en su lugar."""
+        with self._bloqueo_pool:
+            with self.bloqueo:
+                pool, roto = self.pool, self._pool_roto
+            if not roto:
+                return pool
+            self.log_func and self.log_func("Un proceso del pool terminó de forma anormal; se crea un pool nuevo")
+            nuevo = self._crear_pool()
+            with self.bloqueo:
+                self.pool, self._pool_roto = nuevo, False
+            pool.shutdown(wait=False, cancel_futures=True)
+            return nuevo
+
+    def _someter(self, config: dict) -> tuple:
+        """Envía el trabajo al pool; si el pool está roto lo sustituye y lo intenta de nuevo. Devuelve (pool, futuro)."""
+        for _ in range(2):
+            pool = self._pool_sano()
+            try:
+                return pool, pool.submit(ejecutar_trabajo, config)
+            except BrokenProcessPool:
+                self._marcar_roto(pool)
+        raise BrokenProcessPool("El pool recién creado también está roto")
+
+    def servir(self):
+        """Atiende peticiones hasta que se llame a detener (o a una interrupción)."""
+        self._sirviendo = True
+        try:
+            self.servidor.serve_forever()
+        finally:
+            self._sirviendo = False
+
+    def detener(self):
+        """Cierra el puerto y espera a los trabajos en curso; los que siguen en cola quedan 'cancelado'."""
+        if self.servidor is not None:
+            if self._sirviendo:
+                self.servidor.shutdown()
+            self.servidor.server_close()
+        with self._bloqueo_pool:
+            self._deteniendo = True
+            if self.pool is not None:
+                self.pool.shutdown(wait=True, cancel_futures=True)
+
+    # --- archivos y trabajos --------------------------------------------------
+
+    def guardar_archivo(self, nombre: str, flujo, longitud: int) -> str:
+        """Guarda `longitud` bytes de `flujo` en la carpeta de archivos subidos y devuelve su ruta."""
+        nombre = os.path.basename(nombre or "")
+        if not nombre or not fuentes.es_compatible(nombre):
+            raise ValueError(f"Nombre de archivo no admitido: '{nombre}'")
+        if longitud > SERVICE_CONFIG["MAX_UPLOAD_MB"] << 20:
+            raise ValueError(f"El archivo supera {SERVICE_CONFIG['MAX_UPLOAD_MB']} MB")
+
+        ruta = os.path.join(self.directorio, "archivos", f"{uuid.uuid4().hex[:12]}-{nombre}")
+        with open(ruta, "wb") as archivo:
+            restantes = longitud
+            while restantes:
+                bloque = flujo.read(min(_BLOQUE_SUBIDA, restantes))
+                if not bloque:
+                    raise ValueError("El cuerpo de la petición está incompleto")
+                archivo.write(bloque)
+                restantes -= len(bloque)
+        with self.bloqueo:
+            self.archivos[ruta] = (time.time(), False)
+        self._borrar(self._purgar_archivos())
+        return ruta
+
+    def _directorio_salida(self, identificador: str, pedido: str = None) -> str:
+        """
+        Carpeta de salida del trabajo dentro de '<carpeta>/trabajos'. Un
+        directorio_salida pedido por el cliente se interpreta como subcarpeta y
+        no puede salir de ella.
+        """
+        base = os.path.realpath(os.path.join(self.directorio, "trabajos"))
+        if not pedido:
+            return os.path.join(base, identificador)
+        ruta = os.path.realpath(os.path.join(base, pedido))
+        if ruta == base or os.path.commonpath([ruta, base]) != base:
+            raise ValueError(f"directorio_salida debe ser una subcarpeta de '{base}': {pedido}")
+        return ruta
+
+    def enviar(self, config: dict) -> dict:
+        """Valida y encola una comparación; devuelve la vista del trabajo."""
+        faltantes = [campo for campo in CAMPOS_OBLIGATORIOS if not config.get(campo)]
+        if faltantes:
+            raise ValueError(f"Faltan los campos: {', '.join(faltantes)}")
+        for campo in ("archivo_base", "archivo_anterior"):
+            if config.get(campo) and not os.path.isfile(config[campo]):
+                raise ValueError(f"No existe el archivo de '{campo}': {config[campo]}")
+
+        with self.bloqueo:
+            pendientes = sum(1 for trabajo in self.trabajos.values() if trabajo["estado"] == "pendiente")
+            if pendientes >= SERVICE_CONFIG["MAX_PENDING"]:
+                raise ServicioSaturado(f"Hay {pendientes} trabajos pendientes; inténtelo más tarde")
+            identificador = uuid.uuid4().hex[:12]
+            config = dict(config)
+            pedido = config.get("directorio_salida")
+            config["directorio_salida"] = self._directorio_salida(identificador, pedido)
+            archivos = [config[campo] for campo in ("archivo_base", "archivo_anterior") if config.get(campo)]
+            trabajo = {"id": identificador, "estado": "pendiente", "titulo": config["titulo"],
+                       "mes": config["mes_actual"], "directorio_salida": config["directorio_salida"],
+                       "creado": time.time(), "archivos": archivos,
+                       # Al expulsar el trabajo solo se borra su carpeta si no la eligió el cliente
+                       "directorio_propio": not pedido,
+                       "config": config, "pool": None, "futuro": None}
+            self.trabajos[identificador] = trabajo
+
+        # El envío puede tener que crear un pool nuevo: se hace sin retener el bloqueo
+        try:
+            pool, futuro = self._someter(config)
+        except Exception as e:
+            with self.bloqueo:
+                del self.trabajos[identificador]
+            raise ServicioSaturado(f"No hay procesos disponibles para el trabajo: {e}") from e
+        with self.bloqueo:
+            trabajo["pool"], trabajo["futuro"] = pool, futuro
+            for ruta in archivos:
+                if ruta in self.archivos:
+                    self.archivos[ruta] = (self.archivos[ruta][0], True)
+        # Si el trabajo ya terminó, la función se ejecuta en este hilo
+        futuro.add_done_callback(lambda futuro: self._terminar(identificador, futuro))
+        return self.vista(trabajo)
+
+    def _terminar(self, identificador: str, futuro):
+        if futuro.cancelled():
+            resultado = {"estado": "cancelado", "error": "El servicio se detuvo antes de ejecutar el trabajo"}
+        else:
+            try:
+                resultado = futuro.result()
+            except BrokenProcessPool as e:
+                if self._reintentar(identificador):
+                    return
+                resultado = {"estado": "error", "error": f"El proceso del trabajo terminó de forma anormal: {e}"}
+            except Exception as e:
+                resultado = {"estado": "error", "error": str(e)}
+        self._registrar(identificador, resultado)
+
+    def _reintentar(self, identificador: str) -> bool:
+        """
+        Marca el pool del trabajo como roto y, si es el primer fallo del trabajo,
+        lo reenvía a un pool nuevo. Esta función corre en el hilo del pool roto:
+        el reenvío (que calienta el pool nuevo) se hace en otro hilo.
+        """
+        with self.bloqueo:
+            trabajo = self.trabajos[identificador]
+            if trabajo["pool"] is self.pool:
+                self._pool_roto = True
+            if trabajo.get("reintentado") or self._deteniendo:
+                return False
+            trabajo["reintentado"] = True
+        threading.Thread(target=self._reenviar, args=(identificador,), daemon=True).start()
+        return True
+
+    def _reenviar(self, identificador: str):
+        with self.bloqueo:
+            trabajo = self.trabajos[identificador]
+        self.log_func and self.log_func(f"Trabajo {identificador}: su proceso terminó de forma anormal; se reintenta")
+        try:
+            pool, futuro = self._someter(trabajo["config"])
+        except Exception as e:
+            self._registrar(identificador, {"estado": "error", "error": f"No se pudo reintentar el trabajo: {e}"})
+            return
+        with self.bloqueo:
+            trabajo["pool"], trabajo["futuro"] = pool, futuro
+        futuro.add_done_callback(lambda futuro: self._terminar(identificador, futuro))
+
+    def _registrar(self, identificador: str, resultado: dict):
+        """Guarda el resultado del trabajo y descarta (y borra) los terminados más antiguos."""
+        with self.bloqueo:
+            trabajo = self.trabajos[identificador]
+            trabajo.update({clave: resultado.get(clave) for clave in ("estado", "resumen", "error", "segundos", "log")})
+            trabajo["total_segundos"] = round(time.time() - trabajo["creado"], 2)
+            if resultado["estado"] == "ok":
+                self.completados += 1
+            elif resultado["estado"] == "error":
+                self.errores += 1
+            # Solo se conservan los últimos trabajos terminados
+            terminados = [clave for clave, otro in self.trabajos.items() if otro["estado"] != "pendiente"]
+            expulsados = [self.trabajos.pop(clave)
+                          for clave in terminados[:max(0, len(terminados) - SERVICE_CONFIG["MAX_FINISHED"])]]
+        directorios = [otro["directorio_salida"] for otro in expulsados if otro["directorio_propio"]]
+        self._borrar(self._purgar_archivos(), directorios)
+        self.log_func and self.log_func(f"Trabajo {identificador} ({trabajo['titulo']}, {trabajo['mes']}): "
+                                        f"{resultado['estado']}")
+
+    def _purgar_archivos(self) -> list:
+        """
+        Quita del registro (y devuelve para borrar) los archivos subidos que no
+        usa ningún trabajo conservado: los que ya usó alguno y los que nadie
+        usó en UPLOAD_TTL_SECONDS.
+        """
+        ahora = time.time()
+        with self.bloqueo:
+            en_uso = {ruta for trabajo in self.trabajos.values() for ruta in trabajo["archivos"]}
+            sobrantes = [ruta for ruta, (subido, usado) in self.archivos.items() if ruta not in en_uso
+                         and (usado or ahora - subido > SERVICE_CONFIG["UPLOAD_TTL_SECONDS"])]
+            for ruta in sobrantes:
+                del self.archivos[ruta]
+        return sobrantes
+
+    def _borrar(self, archivos: list, directorios: list = ()):
+        """Borra archivos subidos y carpetas de trabajos fuera del bloqueo; los fallos solo se registran."""
+        for ruta in archivos:
+            try:
+                os.remove(ruta)
+            except OSError as e:
+                self.log_func and self.log_func(f"No se pudo borrar '{ruta}': {e}")
+        for ruta in directorios:
+            shutil.rmtree(ruta, ignore_errors=True)
+
+    def trabajo(self, identificador: str) -> dict | None:
+        with self.bloqueo:
+            return self.trabajos.get(identificador)
+
+    @staticmethod
+    def vista(trabajo: dict) -> dict:
+        """Estado público de un trabajo (sin el futuro)."""
+        vista = {clave: valor for clave, valor in trabajo.items() if clave not in _INTERNOS}
+        if vista["estado"] == "pendiente":
+            vista["estado"] = "en_curso" if trabajo["futuro"] and trabajo["futuro"].running() else "en_cola"
+        return vista
+
+    def salud(self) -> dict:
+        with self.bloqueo:
+            vistas = [self.vista(trabajo) for trabajo in self.trabajos.values()]
+        return {"estado": "ok", "procesos": self.procesos,
+                "en_cola": sum(1 for vista in vistas if vista["estado"] == "en_cola"),
+                "en_curso": sum(1 for vista in vistas if vista["estado"] == "en_curso"),
+                "completados": self.completados, "errores": self.errores}
+
+    def historial(self, trabajo: dict, meses: list[str] = None) -> tuple[list, object]:
+        """(columnas, bloques de filas) del historial del trabajo; por defecto solo su mes."""
+        store = HistorialStore(ruta_base_datos(trabajo["directorio_salida"], trabajo["titulo"]))
+        return store.iterar_filas(meses, SERVICE_CONFIG["STREAM_ROWS"])
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    """Rutas de ServicioComparacion. HTTP/1.1 para reutilizar conexiones y transmitir por fragmentos."""
+
+    protocol_version = "HTTP/1.1"
+    _RUTA_TRABAJO = re.compile(r"^/trabajos/([0-9a-f]+)(/historial)?$")
+
+    @property
+    def servicio(self) -> ServicioComparacion:
+        return self.server.servicio
+
+    def log_message(self, formato, *args):
+        # Sin una línea por petición: los trabajos ya se registran al terminar
+        pass
+
+    def _responder(self, codigo: int, datos, cabeceras: dict = None):
+        cuerpo = json.dumps(datos, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        for nombre, valor in (cabeceras or {}).items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _error(self, codigo: int, mensaje: str):
+        self._responder(codigo, {"error": mensaje})
+
+    def _atender(self, manejar):
+        ruta = urlsplit(self.path)
+        parametros = {clave: valores[-1] for clave, valores in parse_qs(ruta.query).items()}
+        try:
+            manejar(ruta.path.rstrip("/") or "/", parametros)
+        except ServicioSaturado as e:
+            self._error(503, str(e))
+        except ValueError as e:
+            self._error(400, str(e))
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+        except Exception as e:
+            self.servicio.log_func and self.servicio.log_func(f"Error en {self.command} {self.path}: {e}")
+            self.close_connection = True
+            self._error(500, str(e))
+
+    def do_GET(self):
+        self._atender(self._get)
+
+    def do_POST(self):
+        self._atender(self._post)
+
+    def _longitud(self) -> int:
+        try:
+            return int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            raise ValueError("Content-Length no válido")
+
+    def _post(self, ruta: str, parametros: dict):
+        longitud = self._longitud()
+        if ruta == "/archivos":
+            try:
+                archivo = self.servicio.guardar_archivo(parametros.get("nombre"), self.rfile, longitud)
+            except ValueError:
+                # El cuerpo puede no haberse leído: la conexión no se reutiliza
+                self.close_connection = True
+                raise
+            self._responder(201, {"ruta": archivo})
+        elif ruta == "/trabajos":
+            try:
+                config = json.loads(self.rfile.read(longitud) or b"{}")
+            except json.JSONDecodeError as e:
+                raise ValueError(f"JSON no válido: {e}")
+            if not isinstance(config, dict):
+                raise ValueError("Se esperaba un objeto JSON con la configuración del trabajo")
+            vista = self.servicio.enviar(config)
+            self._responder(202, vista, {"Location": f"/trabajos/{vista['id']}"})
+        else:
+            self.close_connection = True
+            self._error(404, f"Ruta desconocida: {ruta}")
+
+    def _get(self, ruta: str, parametros: dict):
+        if ruta == "/salud":
+            self._responder(200, self.servicio.salud())
+            return
+        if ruta == "/trabajos":
+            with self.servicio.bloqueo:
+                vistas = [self.servicio.vista(trabajo) for trabajo in self.servicio.trabajos.values()]
+            self._responder(200, vistas)
+            return
+
+        coincidencia = self._RUTA_TRABAJO.match(ruta)
+        trabajo = coincidencia and self.servicio.trabajo(coincidencia.group(1))
+        if not trabajo:
+            self._error(404, f"Trabajo o ruta desconocidos: {ruta}")
+            return
+        if not coincidencia.group(2):
+            self._responder(200, self.servicio.vista(trabajo))
+            return
+
+        if trabajo["estado"] != "ok":
+            self._error(409, f"El trabajo está '{self.servicio.vista(trabajo)['estado']}'; el historial no está disponible")
+            return
+        formato = parametros.get("formato", "ndjson")
+        if formato not in ("ndjson", "arrow"):
+            raise ValueError(f"Formato desconocido: '{formato}' (ndjson o arrow)")
+        meses = parametros.get("meses")
+        meses = None if meses == "todos" else (meses.split(",") if meses else [trabajo["mes"]])
+        columnas, bloques = self.servicio.historial(trabajo, meses)
+
+        self.send_response(200)
+        self.send_header("Content-Type", TIPO_ARROW if formato == "arrow" else TIPO_NDJSON)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        salida = _SalidaFragmentada(self.wfile)
+        try:
+            (_escribir_arrow if formato == "arrow" else _escribir_ndjson)(salida, columnas, bloques)
+        except (BrokenPipeError, ConnectionResetError):
+            raise
+        except Exception as e:
+            # Las cabeceras ya se enviaron: se corta la conexión sin el fragmento final
+            # para que el cliente no tome el flujo truncado por completo
+            self.servicio.log_func and self.servicio.log_func(f"Error transmitiendo el historial de {trabajo['id']}: {e}")
+            self.close_connection = True
+            return
+        salida.cerrar()
+
+
+def _escribir_ndjson(salida, columnas: list, bloques):
+    """Un objeto JSON por fila del historial; cada bloque de filas sale en un fragmento."""
+    for filas in bloques:
+        salida.write("".join(json.dumps(dict(zip(columnas, fila)), ensure_ascii=False) + "\n"
+                             for fila in filas).encode("utf-8"))
+
+
+def _escribir_arrow(salida, columnas: list, bloques):
+    """Flujo IPC de Arrow (columnas de texto) con un RecordBatch por bloque de filas."""
+    import pyarrow as pa
+
+    esquema = pa.schema([(columna, pa.string()) for columna in columnas])
+    with pa.ipc.new_stream(salida, esquema) as escritor:
+        for filas in bloques:
+            escritor.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(valores, type=pa.string()) for valores in zip(*filas)], schema=esquema))
@@ -0,0 +1,74 @@
+"""
+Instantáneas de cada periodo en formato Feather (Arrow IPC) para encadenar comparaciones mensuales
+"""
+
+import os
+import re
+import uuid
+import pandas as pd
+
+from utils.data_utils import DataUtils
+
+
+class SnapshotStore:
+    """
+    Guarda la hoja actual ya normalizada de cada ejecución, identificada por
+    título y periodo. En la ejecución del periodo siguiente la hoja anterior se
+    lee de esa instantánea con memoria mapeada, sin volver a analizar el libro.
+    """
+
+    def __init__(self, directorio: str):
+        self.directorio = directorio
+
+    def ruta(self, titulo: str, mes: str) -> str:
+        nombre = re.sub(r'[\\/:*?"<>|]', "_", f"{titulo} - {mes}")
+        return os.path.join(self.directorio, f"{nombre}.feather")
+
+    def existe(self, titulo: str, mes: str) -> bool:
+        return os.path.exists(self.ruta(titulo, mes))
+
+    def guardar(self, df: pd.DataFrame, titulo: str, mes: str) -> str:
+        return self.confirmar(self.preparar(df, titulo, mes))
+
+    def preparar(self, df: pd.DataFrame, titulo: str, mes: str) -> str:
+        """
+        Escribe la instantánea en un archivo temporal (sin compresión, para poder
+        mapearla en memoria) y devuelve su ruta; no es visible hasta confirmar.
+        Las columnas categóricas se guardan como diccionarios de Arrow.
+        """
+        from pyarrow import feather
+
+        if not all(isinstance(col, str) for col in df.columns):
+            raise ValueError("Las instantáneas solo admiten nombres de columna de texto")
+        os.makedirs(self.directorio, exist_ok=True)
+        temporal = f"{self.ruta(titulo, mes)}.{uuid.uuid4().hex[:8]}.tmp"
+        feather.write_feather(df.reset_index(drop=True), temporal, compression="uncompressed")
+        return temporal
+
+    @staticmethod
+    def confirmar(temporal: str) -> str:
+        """Publica una instantánea preparada y devuelve su ruta definitiva."""
+        ruta = temporal.rsplit(".", 2)[0]
+        # Reemplazo atómico: una ejecución concurrente nunca lee un archivo a medias
+        os.replace(temporal, ruta)
+        return ruta
+
+    @staticmethod
+    def descartar(temporal: str):
+        try:
+            os.remove(temporal)
+        except OSError:
+            pass
+
+    def leer(self, titulo: str, mes: str, categorico: bool = False) -> pd.DataFrame:
+        """Lee la instantánea en la representación pedida (texto o categórica)."""
+        from pyarrow import feather
+
+        df = feather.read_table(self.ruta(titulo, mes), memory_map=True).to_pandas()
+        for col in df.columns:
+            es_categorica = DataUtils.es_categorica(df[col])
+            if categorico and not es_categorica:
+                df[col] = pd.Categorical(df[col])
+            elif not categorico and es_categorica:
+                df[col] = df[col].astype(str)
+        return df
@@ -0,0 +1,327 @@
+"""
+Vigilancia de carpeta: detecta los libros mensuales que van llegando y ejecuta sus comparaciones
+"""
+
+import fnmatch
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from config.settings import WATCH_CONFIG
+from processors.lote import ejecutar_trabajo
+
+CAMPOS_REGLA = ["patron", "titulo", "id_column", "sheet_actual"]
+# Opciones del procesador que una regla puede fijar para sus trabajos
+OPCIONES_TRABAJO = ["modo_carga", "representacion", "alineacion", "graficos", "exportar_historial", "metricas",
+                    "instantaneas"]
+
+
+def leer_configuracion(ruta: str) -> dict:
+    """
+    Lee la configuración JSON de la vigilancia:
+    {"directorio": ..., "salida": ..., "reglas": [{"patron", "titulo", "id_column",
+    "sheet_actual", ["sheet_anterior"], ["patron_mes"], ["directorio_salida"], ...}]}
+    Las rutas relativas se resuelven respecto a la carpeta del archivo.
+    """
+    with open(ruta, encoding="utf-8") as archivo:
+        config = json.load(archivo)
+
+    base = os.path.dirname(os.path.abspath(ruta))
+    if not config.get("directorio"):
+        raise ValueError("La configuración de vigilancia no indica el 'directorio'")
+    config["directorio"] = os.path.join(base, config["directorio"])
+    config["salida"] = os.path.join(base, config.get("salida") or ".")
+    for numero, regla in enumerate(config.get("reglas") or [], start=1):
+        faltantes = [campo for campo in CAMPOS_REGLA if not regla.get(campo)]
+        if faltantes:
+            raise ValueError(f"Regla {numero} sin los campos: {', '.join(faltantes)}")
+        regla["directorio_salida"] = os.path.join(config["salida"], regla.get("directorio_salida") or regla["titulo"])
+    if not config.get("reglas"):
+        raise ValueError("La configuración de vigilancia no tiene reglas")
+    return config
+
+
+class Vigilante:
+    """
+    Sondea la carpeta cada cierto intervalo y convierte cada archivo nuevo que
+    encaja con una regla en un trabajo de comparación:
+
+    - Antirrebote: un archivo solo se encola cuando su tamaño y fecha de
+      modificación no han cambiado durante `espera_estable` segundos.
+    - Sin duplicados: cada versión de archivo (ruta, tamaño, fecha) se procesa
+      una vez, también entre reinicios, porque el registro de estado se relee al arrancar.
+    - Cola acotada: con `cola_maxima` trabajos pendientes no se encolan más; los
+      archivos siguen detectados y entran cuando hay hueco.
+    - Los trabajos de un mismo título se ejecutan en orden de periodo y de uno
+      en uno, porque cada periodo se compara con el anterior (su archivo y su
+      instantánea); títulos distintos se reparten en el pool de procesos. Un
+      periodo que llega tarde se compara con el último procesado anterior a él.
+    - Si un proceso del pool muere (p. ej. sin memoria), el pool se recrea y
+      los trabajos afectados se reintentan una vez.
+
+    Cada evento (encolado, inicio, fin) y un estado periódico con la cola, los
+    trabajos en curso y el rendimiento se añaden como líneas JSON al registro de estado.
+    """
+
+    def __init__(self, config: dict, procesos: int = None, log_func=None):
+        self.config = config
+        self.reglas = config["reglas"]
+        self.procesos = procesos or os.cpu_count() or 1
+        self.log_func = log_func
+        self.intervalo = config.get("intervalo", WATCH_CONFIG["POLL_SECONDS"])
+        self.espera_estable = config.get("espera_estable", WATCH_CONFIG["STABLE_SECONDS"])
+        self.cola_maxima = config.get("cola_maxima", WATCH_CONFIG["MAX_QUEUE"])
+        self.intervalo_estado = config.get("intervalo_estado", WATCH_CONFIG["STATUS_SECONDS"])
+        self.ruta_estado = os.path.join(config["salida"], config.get("registro_estado") or WATCH_CONFIG["STATUS_FILE"])
+
+        self.cola = deque()
+        self.pendientes = {}   # ruta -> (firma, momento desde el que no cambia)
+        self.vistos = set()    # (ruta, tamaño, fecha) ya encolados o procesados
+        self.procesados = {}   # título -> {mes: archivo} de los periodos procesados
+        self.en_curso = {}     # futuro -> trabajo
+        self.pool = None
+        self.completados = 0
+        self.errores = 0
+        self.inicio = time.time()
+        self._ultimo_estado = 0.0
+        self.parar = threading.Event()
+
+        os.makedirs(config["salida"], exist_ok=True)
+        self._cargar_estado()
+
+    # --- registro de estado -------------------------------------------------
+
+    def _registrar(self, evento: str, **datos):
+        registro = {"fecha": time.strftime("%Y-%m-%dT%H:%M:%S"), "evento": evento, **datos}
+        with open(self.ruta_estado, "a", encoding="utf-8") as archivo:
+            archivo.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+
+    def _cargar_estado(self):
+        """Recupera del registro las versiones ya procesadas y el último periodo de cada título."""
+        if not os.path.exists(self.ruta_estado):
+            return
+        with open(self.ruta_estado, encoding="utf-8") as archivo:
+            for linea in archivo:
+                try:
+                    registro = json.loads(linea)
+                except json.JSONDecodeError:
+                    continue
+                if registro.get("evento") != "fin":
+                    continue
+                self.vistos.add((registro["archivo"], *registro["firma"]))
+                if registro.get("estado") in ("ok", "base"):
+                    self._avanzar(registro["titulo"], registro["mes"], registro["archivo"])
+
+    def _avanzar(self, titulo: str, mes: str, archivo: str):
+        self.procesados.setdefault(titulo, {})[mes] = archivo
+
+    def _periodo_anterior(self, titulo: str, mes: str) -> tuple[str, str] | None:
+        """(mes, archivo) del último periodo procesado del título estrictamente anterior a `mes`."""
+        anteriores = [otro for otro in self.procesados.get(titulo, {}) if otro < mes]
+        if not anteriores:
+            return None
+        anterior = max(anteriores)
+        return anterior, self.procesados[titulo][anterior]
+
+    def _estado_periodico(self, forzar: bool = False):
+        ahora = time.time()
+        if not forzar and ahora - self._ultimo_estado < self.intervalo_estado:
+            return
+        self._ultimo_estado = ahora
+        horas = max(ahora - self.inicio, 1e-9) / 3600
+        self._registrar("estado", cola=len(self.cola), en_curso=len(self.en_curso),
+                        detectados=len(self.pendientes), completados=self.completados, errores=self.errores,
+                        trabajos_por_hora=round(self.completados / horas, 2))
+
+    # --- detección ----------------------------------------------------------
+
+    def _regla(self, nombre: str):
+        return next((regla for regla in self.reglas if fnmatch.fnmatch(nombre, regla["patron"])), None)
+
+    def _mes(self, regla: dict, ruta: str, fecha_ns: int) -> str:
+        """Periodo del archivo: el grupo del patrón de mes en el nombre o, si no aparece, su año-mes de modificación."""
+        coincidencia = re.search(regla.get("patron_mes") or WATCH_CONFIG["PERIOD_PATTERN"], os.path.basename(ruta))
+        if coincidencia:
+            return coincidencia.group(1) if coincidencia.groups() else coincidencia.group(0)
+        return time.strftime("%Y-%m", time.localtime(fecha_ns / 1e9))
+
+    def escanear(self):
+        """Recorre la carpeta y encola (en orden de periodo) los archivos que ya no cambian."""
+        ahora = time.time()
+        presentes = set()
+        listos = []
+        with os.scandir(self.config["directorio"]) as entradas:
+            for entrada in entradas:
+                regla = self._regla(entrada.name) if entrada.is_file() else None
+                # Los temporales de Office ('~$libro.xlsx') nunca son datos
+                if regla is None or entrada.name.startswith("~$"):
+                    continue
+                ruta = entrada.path
+                estado = entrada.stat()
+                firma = (estado.st_size, estado.st_mtime_ns)
+                presentes.add(ruta)
+                if (ruta, *firma) in self.vistos:
+                    self.pendientes.pop(ruta, None)
+                    continue
+                anterior = self.pendientes.get(ruta)
+                if anterior is None or anterior[0] != firma:
+                    # Nuevo o aún escribiéndose: el plazo de espera empieza de nuevo
+                    self.pendientes[ruta] = (firma, ahora)
+                elif ahora - anterior[1] >= self.espera_estable:
+                    listos.append((self._mes(regla, ruta, firma[1]), ruta, firma, regla))
+
+        for ruta in set(self.pendientes) - presentes:
+            del self.pendientes[ruta]
+
+        for mes, ruta, firma, regla in sorted(listos, key=lambda listo: (listo[0], listo[1])):
+            if len(self.cola) >= self.cola_maxima:
+                self.log_func and self.log_func(f"Cola llena ({self.cola_maxima}); {os.path.basename(ruta)} espera")
+                break
+            trabajo = {"archivo": ruta, "firma": list(firma), "titulo": regla["titulo"], "mes": mes,
+                       "regla": regla, "encolado": time.time()}
+            self.cola.append(trabajo)
+            self.vistos.add((ruta, *firma))
+            del self.pendientes[ruta]
+            self._registrar("encolado", archivo=ruta, firma=trabajo["firma"], titulo=trabajo["titulo"], mes=mes,
+                            cola=len(self.cola))
+            self.log_func and self.log_func(f"Encolado {os.path.basename(ruta)} ({regla['titulo']}, {mes})")
+
+    # --- ejecución ------------------------------------------------------------
+
+    def _configuracion_trabajo(self, trabajo: dict) -> dict | None:
+        """Configuración de procesar_comparacion; None si es el primer periodo de un título sin hoja anterior."""
+        regla = trabajo["regla"]
+        config = {
+            "archivo_base": trabajo["archivo"],
+            "sheet_actual": regla["sheet_actual"],
+            "id_column": regla["id_column"],
+            "titulo": regla["titulo"],
+            "mes_actual": trabajo["mes"],
+            "directorio_salida": regla["directorio_salida"],
+            # El periodo siguiente del título carga su hoja anterior de esta instantánea
+            "instantaneas": True,
+            **{opcion: regla[opcion] for opcion in OPCIONES_TRABAJO if opcion in regla}
+        }
+        if regla.get("sheet_anterior"):
+            # Cada libro contiene las dos hojas
+            config["sheet_anterior"] = regla["sheet_anterior"]
+            return config
+
+        # Un libro por periodo: se compara con el último periodo procesado anterior a este
+        anterior = self._periodo_anterior(regla["titulo"], trabajo["mes"])
+        posteriores = [otro for otro in self.procesados.get(regla["titulo"], {}) if otro > trabajo["mes"]]
+        if posteriores:
+            self.log_func and self.log_func(
+                f"{regla['titulo']} ({trabajo['mes']}) llega después de {max(posteriores)}; se compara con "
+                f"{anterior[0] if anterior else 'ningún periodo anterior'}")
+        if anterior is None:
+            return None
+        config.update(sheet_anterior=regla["sheet_actual"], archivo_anterior=anterior[1], mes_anterior=anterior[0])
+        return config
+
+    def despachar(self):
+        """Lanza los trabajos de la cola cuyo título no tiene otro en curso, hasta llenar el pool."""
+        ocupados = {trabajo["titulo"] for trabajo in self.en_curso.values()}
+        for trabajo in list(self.cola):
+            if len(self.en_curso) >= self.procesos:
+                break
+            if trabajo["titulo"] in ocupados:
+                continue
+            self.cola.remove(trabajo)
+            espera = round(time.time() - trabajo["encolado"], 2)
+            config = self._configuracion_trabajo(trabajo)
+            if config is None:
+                # Primer periodo: queda como base del siguiente
+                self._finalizar(trabajo, {"estado": "base", "segundos": 0.0}, espera)
+                continue
+            trabajo["espera"] = espera
+            self._registrar("inicio", archivo=trabajo["archivo"], titulo=trabajo["titulo"], mes=trabajo["mes"],
+                            espera_segundos=espera, cola=len(self.cola))
+            try:
+                futuro = self.pool.submit(ejecutar_trabajo, config)
+            except BrokenProcessPool:
+                self._reiniciar_pool()
+                futuro = self.pool.submit(ejecutar_trabajo, config)
+            trabajo["pool"] = self.pool
+            self.en_curso[futuro] = trabajo
+            ocupados.add(trabajo["titulo"])
+
+    def _finalizar(self, trabajo: dict, resultado: dict, espera: float):
+        if resultado["estado"] == "error":
+            self.errores += 1
+        else:
+            self.completados += 1
+            self._avanzar(trabajo["titulo"], trabajo["mes"], trabajo["archivo"])
+        self._registrar("fin", archivo=trabajo["archivo"], firma=trabajo["firma"], titulo=trabajo["titulo"],
+                        mes=trabajo["mes"], estado=resultado["estado"], segundos=resultado.get("segundos"),
+                        espera_segundos=espera, resumen=resultado.get("resumen"), error=resultado.get("error"),
+                        log=resultado.get("log"), cola=len(self.cola))
+        if resultado["estado"] == "ok":
+            detalle = f"{resultado['resumen']['Total de Cambios']} cambios"
+        elif resultado["estado"] == "base":
+            detalle = "primer periodo"
+        else:
+            detalle = resultado.get("error") or "error sin mensaje"
+        self.log_func and self.log_func(f"{trabajo['titulo']} ({trabajo['mes']}): {resultado['estado']} - {detalle}")
+
+    def _reiniciar_pool(self):
+        """Sustituye un pool roto (un proceso murió) por uno nuevo."""
+        self.log_func and self.log_func("Un proceso del pool terminó de forma anormal; se crea un pool nuevo")
+        self._registrar("pool_reiniciado", en_curso=len(self.en_curso), cola=len(self.cola))
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.pool = ProcessPoolExecutor(max_workers=self.procesos)
+
+    def _recoger(self, timeout: float):
+        """Espera hasta `timeout` segundos a que termine algún trabajo y registra los terminados."""
+        if not self.en_curso:
+            self.parar.wait(timeout)
+            return
+        terminados, _ = wait(list(self.en_curso), timeout=timeout, return_when=FIRST_COMPLETED)
+        for futuro in terminados:
+            trabajo = self.en_curso.pop(futuro)
+            try:
+                resultado = futuro.result()
+            except BrokenProcessPool as e:
+                # Todos los trabajos del pool roto fallan a la vez; se desconoce cuál lo rompió
+                if trabajo["pool"] is self.pool:
+                    self._reiniciar_pool()
+                if not trabajo.get("reintentado"):
+                    trabajo["reintentado"] = True
+                    self.cola.appendleft(trabajo)
+                    self.log_func and self.log_func(f"{trabajo['titulo']} ({trabajo['mes']}): se reintenta tras "
+                                                    f"la caída del proceso")
+                    continue
+                resultado = {"estado": "error", "error": f"El proceso del trabajo terminó de forma anormal: {e}",
+                             "segundos": None}
+            except Exception as e:
+                resultado = {"estado": "error", "error": str(e), "segundos": None}
+            self._finalizar(trabajo, resultado, trabajo["espera"])
+
+    def ejecutar(self, una_vez: bool = False):
+        """
+        Bucle principal hasta que se active `parar`. Con una_vez=True termina
+        cuando no quedan archivos pendientes, trabajos en cola ni en curso.
+        """
+        self.log_func and self.log_func(f"Vigilando {self.config['directorio']} cada {self.intervalo} s "
+                                        f"({len(self.reglas)} reglas, {self.procesos} procesos)")
+        self._estado_periodico(forzar=True)
+        self.pool = ProcessPoolExecutor(max_workers=self.procesos)
+        try:
+            while not self.parar.is_set():
+                self.escanear()
+                self.despachar()
+                self._estado_periodico()
+                if una_vez and not (self.pendientes or self.cola or self.en_curso):
+                    break
+                self._recoger(self.intervalo)
+            # Al parar se esperan los trabajos lanzados para no perder su registro
+            while self.en_curso:
+                self._recoger(None)
+        finally:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+        self._estado_periodico(forzar=True)
@@ -0,0 +1,27 @@
+import pandas as pd
+
+from utils.data_utils import DataUtils
+
+
+def test_alinear_por_id_empareja_filas_desordenadas():
+    df1 = pd.DataFrame({"ID": ["A", "B", "C"], "Valor": ["1", "2", "3"]})
+    df2 = pd.DataFrame({"ID": ["C", "A", "D"], "Valor": ["3", "9", "4"]})
+
+    alineado1, alineado2 = DataUtils.alinear_dataframes(df1, df2, "ID")
+
+    assert alineado1["ID"].fillna("").tolist() == ["A", "B", "C", ""]
+    assert alineado2["ID"].fillna("").tolist() == ["A", "", "C", "D"]
+    assert alineado2["Valor"].fillna("").tolist() == ["9", "", "3", "4"]
+
+
+def test_alinear_sin_columna_id_en_una_hoja_usa_la_posicion():
+    df1 = pd.DataFrame({"ID": ["A", "B"], "Valor": ["1", "2"]})
+    df2 = pd.DataFrame({"Valor": ["1", "5"]})
+
+    alineado1, alineado2 = DataUtils.alinear_dataframes(df1, df2, "ID")
+
+    # Por posición: cada fila se compara con la de su misma posición, sin filas añadidas
+    assert len(alineado1) == len(alineado2) == 2
+    assert alineado1["Valor"].tolist() == ["1", "2"]
+    assert alineado2["Valor"].tolist() == ["1", "5"]
+    assert alineado2["ID"].isna().all()
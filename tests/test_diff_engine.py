@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+from processors.diff_engine import (COLUMNAS_HISTORIAL, MODIFICACION, NUEVO_REGISTRO, NUEVO_REGISTRO_CAMPO,
+                                    REGISTRO_ELIMINADO, crear_historial_vectorizado)
+from utils.data_utils import DataUtils
+
+
+def test_filas_con_id_vacio_se_descartan():
+    # Tras normalizar, las celdas de ID vacías quedan como "" y no deben contarse como IDs duplicados
+    anterior = DataUtils.normalizar_df(pd.DataFrame({"ID": ["A", None, "B", None], "Valor": ["1", "2", "3", "4"]}))
+    actual = DataUtils.normalizar_df(pd.DataFrame({"ID": ["A", None, "B", "C"], "Valor": ["1", "9", "5", "6"]}))
+
+    historial = crear_historial_vectorizado(anterior, actual, "2024-01", "ID")
+
+    assert "" not in set(historial["ID"].astype(str))
+    modificaciones = historial[historial["Tipo de Cambio"].astype(str) == MODIFICACION]
+    assert modificaciones["ID"].astype(str).tolist() == ["B"]
+    nuevos = historial[historial["Tipo de Cambio"].astype(str).str.startswith(NUEVO_REGISTRO)]
+    assert set(nuevos["ID"].astype(str)) == {"C"}
+
+
+def test_fila_con_id_vacio_en_una_sola_hoja_no_cuenta_como_nueva():
+    # Antes de descartar los IDs vacíos, "" se comparaba como un ID más y esta fila salía como nuevo registro
+    anterior = DataUtils.normalizar_df(pd.DataFrame({"ID": ["A"], "Valor": ["1"]}))
+    actual = DataUtils.normalizar_df(pd.DataFrame({"ID": ["A", ""], "Valor": ["1", "2"]}))
+
+    historial = crear_historial_vectorizado(anterior, actual, "2024-01", "ID")
+
+    assert historial.empty
+
+
+def test_id_nulo_sin_normalizar_tambien_se_descarta():
+    anterior = pd.DataFrame({"ID": ["A", None], "Valor": ["1", "2"]})
+    actual = pd.DataFrame({"ID": ["A", float("nan")], "Valor": ["1", "3"]})
+
+    historial = crear_historial_vectorizado(anterior, actual, "2024-01", "ID")
+
+    assert historial.empty
+
+
+def _historial_de_referencia(df1, df2, mes, id_column):
+    """Recorrido registro a registro de la versión original de crear_historial_de_cambios."""
+    historial = []
+    df1_clean = df1.dropna(subset=[id_column]).copy()
+    df2_clean = df2.dropna(subset=[id_column]).copy()
+    df1_clean[id_column] = df1_clean[id_column].astype(str)
+    df2_clean[id_column] = df2_clean[id_column].astype(str)
+    dict_df1 = df1_clean.set_index(id_column).to_dict("index")
+    dict_df2 = df2_clean.set_index(id_column).to_dict("index")
+
+    def fila(facility_id, columna, anterior, nuevo, tipo):
+        return {id_column: facility_id, "Fila (índice)": f"ID: {facility_id}", "Columna": columna,
+                "Valor Anterior": anterior, "Valor Nuevo": nuevo, "Mes": mes, "Tipo de Cambio": tipo}
+
+    for facility_id in dict_df1.keys() & dict_df2.keys():
+        for col in df1_clean.columns:
+            if col in df2_clean.columns and col != id_column:
+                val1, val2 = dict_df1[facility_id].get(col, ""), dict_df2[facility_id].get(col, "")
+                if ("" if pd.isna(val1) else str(val1)) != ("" if pd.isna(val2) else str(val2)):
+                    historial.append(fila(facility_id, col, val1, val2, MODIFICACION))
+    for facility_id in dict_df2.keys() - dict_df1.keys():
+        registro = dict_df2[facility_id]
+        historial.append(fila(facility_id, "Nuevo Registro Completo", "N/A",
+                              f"Nuevo registro con {len(registro)} campos", NUEVO_REGISTRO))
+        historial += [fila(facility_id, col, "N/A", val, NUEVO_REGISTRO_CAMPO) for col, val in registro.items()]
+    for facility_id in dict_df1.keys() - dict_df2.keys():
+        historial.append(fila(facility_id, "Registro Eliminado Completo",
+                              f"Registro eliminado con {len(dict_df1[facility_id])} campos", "N/A",
+                              REGISTRO_ELIMINADO))
+    return pd.DataFrame(historial, columns=["ID", *COLUMNAS_HISTORIAL])
+
+
+def _filas(historial):
+    """Filas del historial como tuplas de texto ordenadas (NaN y None se escriben igual)."""
+    texto = historial.astype(object).map(lambda valor: "<nulo>" if pd.isna(valor) else str(valor))
+    return sorted(map(tuple, texto[["ID", *COLUMNAS_HISTORIAL]].to_numpy()))
+
+
+def test_historial_vectorizado_coincide_con_el_recorrido_original():
+    anterior = pd.DataFrame({
+        "ID": ["1", "2", "3", "4", "5", None],
+        "Nombre": ["Ana", "Luis", None, "Eva", "Sol", "Sin ID"],
+        "Ciudad": ["Lima", None, "Quito", float("nan"), "Cali", "X"],
+        "Importe": ["10", "20", "30", "40", "50", "60"],
+    })
+    actual = pd.DataFrame({
+        "ID": ["2", "1", "3", "6", "4", None],
+        "Nombre": ["Luis", "Ana María", None, "Nuevo", "Eva", "Otro"],
+        "Ciudad": [float("nan"), "Lima", "Cuenca", None, None, "Y"],
+        "Importe": ["20", "10", "31", "5", "40", "70"],
+    })
+
+    historial = crear_historial_vectorizado(anterior, actual, "2024-01", "ID")
+    referencia = _historial_de_referencia(anterior, actual, "2024-01", "ID")
+
+    assert set(referencia["Tipo de Cambio"]) == {MODIFICACION, NUEVO_REGISTRO, NUEVO_REGISTRO_CAMPO,
+                                                 REGISTRO_ELIMINADO}
+    assert _filas(historial) == _filas(referencia)
+
+
+def test_historial_vectorizado_coincide_en_hojas_normalizadas_grandes():
+    generador = np.random.default_rng(7)
+    ids = [f"R{numero}" for numero in range(400)]
+
+    def hoja(ids_hoja, cambio):
+        valores = generador.integers(0, 3, size=(len(ids_hoja), 6)).astype(str)
+        valores[generador.random(valores.shape) < cambio] = ""
+        return DataUtils.normalizar_df(pd.DataFrame(valores, columns=[f"C{j}" for j in range(6)]).assign(ID=ids_hoja))
+
+    anterior = hoja(ids[:350], 0.1)
+    actual = hoja(list(generador.permutation(ids[50:])), 0.1)
+
+    historial = crear_historial_vectorizado(anterior, actual, "2024-02", "ID")
+
+    assert _filas(historial) == _filas(_historial_de_referencia(anterior, actual, "2024-02", "ID"))
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from processors.estimacion import _hash_ids, muestrear_hoja
+from processors.excel_processor import ExcelProcessor
+from utils import lector_xlsx
+from utils.cache_libros import cache_libros
+
+DATOS = pd.DataFrame({
+    "ID": [f"R{numero}" if numero % 7 else None for numero in range(60)],
+    "Nombre": [f"Nombre {numero}" for numero in range(60)],
+    "Importe": [numero * 1.5 if numero % 5 else None for numero in range(60)],
+})
+
+
+@pytest.fixture
+def libro(tmp_path):
+    ruta = tmp_path / "libro.xlsx"
+    actual = DATOS.assign(Nombre=DATOS["Nombre"].where(DATOS.index % 3 != 0, "Cambiado"))
+    with pd.ExcelWriter(ruta) as writer:
+        DATOS.to_excel(writer, sheet_name="Anterior", index=False)
+        actual.to_excel(writer, sheet_name="Actual", index=False)
+    cache_libros.limpiar()
+    yield str(ruta)
+    cache_libros.limpiar()
+
+
+def test_iterar_valores_solo_decodifica_las_columnas_y_filas_pedidas(libro):
+    completas = list(lector_xlsx.iterar_valores(libro, "Anterior"))
+    filtradas = list(lector_xlsx.iterar_valores(libro, "Anterior", columnas={0}, filas={1, 4}))
+
+    assert len(filtradas) == len(completas)
+    assert filtradas[0][0] == "ID" and filtradas[3][0] == completas[3][0]
+    assert all(valor is None for fila in filtradas if fila for valor in fila[1:])
+    assert all(fila is None for numero, fila in enumerate(filtradas, start=1) if numero not in (1, 4))
+
+
+def test_la_muestra_coincide_con_las_filas_de_la_lectura_completa(libro):
+    columnas, ids, muestra, umbral = muestrear_hoja(libro, "Anterior", "ID", 10)
+
+    esperados = DATOS["ID"].dropna().to_numpy(dtype=object)
+    assert columnas == ["ID", "Nombre", "Importe"]
+    assert list(ids) == list(esperados)
+    menores = esperados[np.argsort(_hash_ids(esperados))[:10]]
+    assert sorted(muestra["ID"]) == sorted(menores)
+    assert umbral == _hash_ids(menores).max()
+
+    filas = DATOS.set_index("ID").loc[muestra["ID"]]
+    assert list(muestra["Nombre"]) == list(filas["Nombre"])
+    assert list(muestra["Importe"]) == [f"{valor:g}" if pd.notna(valor) else "" for valor in filas["Importe"]]
+
+
+def test_estimar_comparacion_con_la_muestra_en_dos_pasadas(libro):
+    config = {"archivo_base": libro, "sheet_anterior": "Anterior", "sheet_actual": "Actual", "id_column": "ID",
+              "mes_actual": "2024-01", "tamano_muestra": 1000}
+
+    estimacion = ExcelProcessor().estimar_comparacion(config)
+
+    # Con una muestra mayor que la hoja la estimación es exacta
+    cambiados = sum(1 for numero in range(60) if numero % 7 and numero % 3 == 0)
+    assert estimacion["registros_muestra"] == estimacion["registros_comunes"] == DATOS["ID"].notna().sum()
+    assert estimacion["resumen"].loc[0, "Modificaciones"] == cambiados
+    assert estimacion["top_columnas"].loc[0, "Columna"] == "Nombre"
@@ -0,0 +1,122 @@
+import json
+
+import pandas as pd
+import pytest
+
+from processors.excel_processor import ExcelProcessor
+from processors.historial_store import HistorialStore, ruta_base_datos
+from utils.cache_libros import cache_libros
+
+ANTERIOR = pd.DataFrame({
+    "ID": [1, 2, 3, 4, 5],
+    "Nombre": ["Ana", "Luis", None, "Eva", "Sol"],
+    "Ciudad": ["Lima", None, "Quito", "Cali", "Bogotá"],
+    "Importe": [10, 20.5, 30, None, 50],
+})
+ACTUAL = pd.DataFrame({
+    "ID": [2, 1, 3, 6, 4],
+    "Nombre": ["Luis", "Ana María", None, "Nuevo", "Eva"],
+    "Ciudad": [None, "Lima", "Cuenca", "Quito", None],
+    "Importe": [20.5, 10, 31, 5, None],
+})
+
+
+@pytest.fixture
+def libro(tmp_path):
+    ruta = tmp_path / "libro.xlsx"
+    with pd.ExcelWriter(ruta) as writer:
+        ANTERIOR.to_excel(writer, sheet_name="Anterior", index=False)
+        ACTUAL.to_excel(writer, sheet_name="Actual", index=False)
+    # Cada combinación de modo y representación debe leer el libro, no reutilizar otra
+    cache_libros.limpiar()
+    yield str(ruta)
+    cache_libros.limpiar()
+
+
+def _config(libro, directorio, **extra):
+    return {"archivo_base": libro, "sheet_anterior": "Anterior", "sheet_actual": "Actual", "id_column": "ID",
+            "titulo": "Prueba", "mes_actual": "2024-01", "directorio_salida": str(directorio),
+            "instantaneas": False, **extra}
+
+
+def _historial(directorio):
+    """Filas del historial guardado, como texto y sin depender del orden."""
+    historial = HistorialStore(ruta_base_datos(str(directorio), "Prueba")).leer()
+    return sorted(map(tuple, historial.astype(object).fillna("").astype(str).to_numpy()))
+
+
+def test_todos_los_modos_de_carga_y_representaciones_dan_el_mismo_historial(libro, tmp_path):
+    historiales = {}
+    for modo in ("pandas", "streaming", "externo"):
+        for representacion in ("category", "str"):
+            directorio = tmp_path / f"{modo}-{representacion}"
+            ExcelProcessor().procesar_comparacion(
+                _config(libro, directorio, modo_carga=modo, representacion=representacion))
+            historiales[modo, representacion] = _historial(directorio)
+
+    referencia = historiales["pandas", "category"]
+    assert any(fila[-1] == "Modificación" for fila in referencia)
+    for combinacion, historial in historiales.items():
+        assert historial == referencia, combinacion
+
+
+@pytest.mark.parametrize("hoja_sin_id", ["Anterior", "Actual"])
+def test_modo_externo_trata_una_hoja_sin_columna_id_como_los_modos_en_memoria(tmp_path, hoja_sin_id):
+    ruta = tmp_path / "libro.xlsx"
+    with pd.ExcelWriter(ruta) as writer:
+        for hoja, datos in (("Anterior", ANTERIOR), ("Actual", ACTUAL)):
+            if hoja == hoja_sin_id:
+                datos = datos.drop(columns=["ID"])
+            datos.to_excel(writer, sheet_name=hoja, index=False)
+    cache_libros.limpiar()
+
+    historiales = {}
+    for modo in ("pandas", "externo"):
+        mensajes = []
+        ExcelProcessor().procesar_comparacion(_config(str(ruta), tmp_path / modo, modo_carga=modo), mensajes.append)
+        historiales[modo] = _historial(tmp_path / modo)
+
+    assert historiales["externo"] == historiales["pandas"]
+    tipo_esperado = "Registro Eliminado" if hoja_sin_id == "Actual" else "Nuevo Registro"
+    assert {fila[-1] for fila in historiales["externo"]} >= {tipo_esperado}
+    assert any("no existe en la hoja" in mensaje for mensaje in mensajes)
+
+
+def test_un_fallo_de_los_graficos_no_hace_fallar_la_comparacion(libro, tmp_path, monkeypatch):
+    def fallar(*args):
+        raise RuntimeError("sin backend gráfico")
+
+    monkeypatch.setattr("processors.excel_processor.renderizar_graficos", fallar)
+    mensajes = []
+
+    ExcelProcessor().procesar_comparacion(_config(libro, tmp_path, graficos=True), mensajes.append)
+
+    hojas = pd.ExcelFile(tmp_path / "Prueba-procedimiento-2024-01.xlsx").sheet_names
+    assert "Gráficos" not in hojas and "Solo Cambios" in hojas
+    assert any("sin backend gráfico" in mensaje for mensaje in mensajes)
+
+
+def test_la_instantanea_solo_se_guarda_si_la_comparacion_termina(libro, tmp_path, monkeypatch):
+    carpeta = tmp_path / "instantaneas"
+
+    def fallar(*args):
+        raise RuntimeError("disco lleno")
+
+    with monkeypatch.context() as parche:
+        parche.setattr(ExcelProcessor, "crear_reemplazo", fallar)
+        with pytest.raises(RuntimeError, match="disco lleno"):
+            ExcelProcessor().procesar_comparacion(_config(libro, tmp_path, instantaneas=True))
+    assert not carpeta.exists() or not list(carpeta.iterdir())
+
+    ExcelProcessor().procesar_comparacion(_config(libro, tmp_path, instantaneas=True))
+    assert [ruta.name for ruta in carpeta.iterdir()] == ["Prueba - 2024-01.feather"]
+
+
+@pytest.mark.parametrize("modo", ["pandas", "externo"])
+def test_las_metricas_cuentan_el_almacen_del_historial(libro, tmp_path, modo):
+    ExcelProcessor().procesar_comparacion(_config(libro, tmp_path, modo_carga=modo, metricas=True))
+
+    with open(tmp_path / "Prueba-metricas-2024-01.json", encoding="utf-8") as archivo:
+        etapas = {etapa["etapa"]: etapa for etapa in json.load(archivo)["etapas"]}
+    etapa_historial = etapas["guardar_historial" if modo == "pandas" else "fusionar_historial"]
+    assert etapa_historial["bytes_escritos"] > 0
@@ -0,0 +1,46 @@
+import os
+
+import pandas as pd
+import pytest
+
+from processors.historial_store import COLUMNAS_EXCEL, HistorialStore
+
+HISTORIAL = pd.DataFrame([
+    ["1", "ID: 1", "Estado", "N/A", "null", "2024-01", "Modificación"],
+    ["2", "ID: 2", "Nuevo Registro Completo", "N/A", "Nuevo registro con 2 campos", "2024-01", "Nuevo Registro"],
+    ["3", "ID: 3", "Estado", "NA", "", "2024-02", "Modificación"],
+], columns=["ID", *COLUMNAS_EXCEL])
+
+
+@pytest.fixture
+def excel_historial(tmp_path):
+    ruta = tmp_path / "Prueba - Historial de Cambios.xlsx"
+    HISTORIAL.to_excel(ruta, sheet_name="Historial", index=False)
+    return str(ruta)
+
+
+def test_importar_conserva_textos_que_pandas_tomaria_por_nulos(excel_historial, tmp_path):
+    store = HistorialStore.abrir(str(tmp_path / "historial.sqlite"), excel_historial)
+
+    leido = store.leer()
+    assert leido["Valor Anterior"].tolist() == ["N/A", "N/A", "NA"]
+    assert leido["Valor Nuevo"].tolist()[0] == "null"
+    assert store.leer_resumen()["Total de Cambios"].tolist() == [2, 1]
+
+
+def test_importacion_fallida_se_repite_en_la_siguiente_apertura(excel_historial, tmp_path, monkeypatch):
+    ruta = str(tmp_path / "historial.sqlite")
+    guardar_mes = HistorialStore.guardar_mes
+
+    def fallar_en_el_segundo_mes(self, filas, mes, *args, **kwargs):
+        if mes == "2024-02":
+            raise OSError("disco lleno")
+        return guardar_mes(self, filas, mes, *args, **kwargs)
+
+    with monkeypatch.context() as parche:
+        parche.setattr(HistorialStore, "guardar_mes", fallar_en_el_segundo_mes)
+        with pytest.raises(OSError):
+            HistorialStore.abrir(ruta, excel_historial)
+    assert not os.path.exists(ruta)
+
+    assert HistorialStore.abrir(ruta, excel_historial).meses() == ["2024-01", "2024-02"]
@@ -0,0 +1,62 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+import pytest
+
+from processors.lote import ejecutar_lote, ejecutar_trabajo, leer_manifiesto
+
+CABECERA = "archivo_base,sheet_anterior,sheet_actual,id_column,titulo,mes_actual,exportar_historial,graficos\n"
+
+
+def test_manifiesto_csv_interpreta_booleanos(tmp_path):
+    manifiesto = tmp_path / "lote.csv"
+    manifiesto.write_text(CABECERA + "a.xlsx,A,B,ID,T1,2024-01,False,\nb.xlsx,A,B,ID,T2,2024-01,sí,0\n",
+                          encoding="utf-8")
+
+    primero, segundo = leer_manifiesto(str(manifiesto))
+
+    assert primero["exportar_historial"] is False
+    assert "graficos" not in primero
+    assert segundo["exportar_historial"] is True
+    assert segundo["graficos"] is False
+
+
+def test_manifiesto_csv_rechaza_booleano_desconocido(tmp_path):
+    manifiesto = tmp_path / "lote.csv"
+    manifiesto.write_text(CABECERA + "a.xlsx,A,B,ID,T1,2024-01,quizás,\n", encoding="utf-8")
+
+    with pytest.raises(ValueError, match="exportar_historial"):
+        leer_manifiesto(str(manifiesto))
+
+
+def test_trabajo_con_carpeta_invalida_queda_en_error(tmp_path):
+    bloqueo = tmp_path / "archivo"
+    bloqueo.write_text("", encoding="utf-8")
+    config = {"archivo_base": "a.xlsx", "sheet_anterior": "A", "sheet_actual": "B", "id_column": "ID",
+              "titulo": "T", "mes_actual": "2024-01", "directorio_salida": str(bloqueo / "salida")}
+
+    resultado = ejecutar_trabajo(config)
+
+    assert resultado["estado"] == "error"
+    assert resultado["error"]
+
+
+class _PoolRoto(ThreadPoolExecutor):
+    """Pool cuyos trabajos terminan como si el proceso hubiera muerto."""
+
+    def submit(self, funcion, *args, **kwargs):
+        futuro = Future()
+        futuro.set_exception(BrokenProcessPool("proceso muerto"))
+        return futuro
+
+
+def test_lote_resume_trabajos_cuyo_proceso_muere(tmp_path):
+    trabajos = [{"archivo_base": "a.xlsx", "titulo": "T", "mes_actual": "2024-01"}]
+
+    with mock.patch("processors.lote.ProcessPoolExecutor", _PoolRoto):
+        resumen = ejecutar_lote(trabajos)
+
+    assert list(resumen["Estado"]) == ["error", "0/1 ok"]
+    assert "muerto" in resumen.loc[0, "Error"]
+
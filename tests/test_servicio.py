@@ -0,0 +1,122 @@
+import io
+import os
+import time
+
+import pytest
+
+from config.settings import SERVICE_CONFIG
+from processors import servicio
+from processors.servicio import ServicioComparacion
+
+
+def _escribir_salida(config):
+    """Sustituto de ejecutar_trabajo: solo deja un archivo en la carpeta de salida."""
+    os.makedirs(config["directorio_salida"], exist_ok=True)
+    with open(os.path.join(config["directorio_salida"], "salida.txt"), "w", encoding="utf-8") as archivo:
+        archivo.write(config["titulo"])
+    time.sleep(config.get("espera", 0))
+    return {"estado": "ok", "resumen": {"Total de Cambios": 0}, "segundos": 0.0, "log": None}
+
+
+def _morir_la_primera_vez(config):
+    """El primer intento mata su proceso (como un fallo sin memoria); el segundo termina bien."""
+    marca = os.path.join(config["directorio_salida"], "intentado")
+    if not os.path.exists(marca):
+        os.makedirs(config["directorio_salida"], exist_ok=True)
+        open(marca, "w").close()
+        os._exit(1)
+    return _escribir_salida(config)
+
+
+@pytest.fixture
+def crear_servicio(tmp_path):
+    servicios = []
+
+    def crear(funcion, **parametros):
+        servicio.ejecutar_trabajo = funcion
+        nuevo = ServicioComparacion(puerto=0, procesos=1, directorio=str(tmp_path / "servicio"), **parametros)
+        nuevo.iniciar()
+        servicios.append(nuevo)
+        return nuevo
+
+    original = servicio.ejecutar_trabajo
+    yield crear
+    for creado in servicios:
+        creado.detener()
+    servicio.ejecutar_trabajo = original
+
+
+def _subir(servicio_http, nombre="libro.xlsx"):
+    return servicio_http.guardar_archivo(nombre, io.BytesIO(b"datos"), 5)
+
+
+def _config(archivo, titulo="T", **extra):
+    return {"archivo_base": archivo, "sheet_anterior": "A", "sheet_actual": "B", "id_column": "ID",
+            "titulo": titulo, "mes_actual": "2024-01", **extra}
+
+
+def _esperar(servicio_http, identificador, limite=30):
+    final = time.monotonic() + limite
+    while time.monotonic() < final:
+        trabajo = servicio_http.trabajo(identificador)
+        if trabajo is None or trabajo["estado"] != "pendiente":
+            return trabajo
+        time.sleep(0.05)
+    raise AssertionError(f"El trabajo {identificador} no terminó")
+
+
+def test_expulsar_un_trabajo_borra_su_carpeta_y_su_archivo(crear_servicio, monkeypatch):
+    monkeypatch.setitem(SERVICE_CONFIG, "MAX_FINISHED", 1)
+    servicio_http = crear_servicio(_escribir_salida)
+    subido = _subir(servicio_http)
+
+    primero = servicio_http.enviar(_config(subido, "Uno"))
+    _esperar(servicio_http, primero["id"])
+    assert os.path.isfile(os.path.join(primero["directorio_salida"], "salida.txt"))
+
+    segundo = servicio_http.enviar(_config(_subir(servicio_http), "Dos", directorio_salida="propia"))
+    _esperar(servicio_http, segundo["id"])
+    tercero = servicio_http.enviar(_config(_subir(servicio_http), "Tres"))
+    _esperar(servicio_http, tercero["id"])
+
+    assert servicio_http.trabajo(primero["id"]) is None
+    assert not os.path.exists(primero["directorio_salida"])
+    assert not os.path.exists(subido)
+    # La carpeta que eligió el cliente se conserva aunque su trabajo se haya descartado
+    assert os.path.isdir(segundo["directorio_salida"])
+
+
+def test_directorio_salida_fuera_del_servicio_se_rechaza(crear_servicio):
+    servicio_http = crear_servicio(_escribir_salida)
+    subido = _subir(servicio_http)
+
+    for pedido in ("../../fuera", "/tmp/fuera", "."):
+        with pytest.raises(ValueError, match="directorio_salida"):
+            servicio_http.enviar(_config(subido, directorio_salida=pedido))
+    assert not servicio_http.trabajos
+
+
+def test_trabajo_cuyo_proceso_muere_se_reintenta_en_un_pool_nuevo(crear_servicio):
+    mensajes = []
+    servicio_http = crear_servicio(_morir_la_primera_vez, log_func=mensajes.append)
+    pool_original = servicio_http.pool
+
+    trabajo = servicio_http.enviar(_config(_subir(servicio_http)))
+    trabajo = _esperar(servicio_http, trabajo["id"])
+
+    assert trabajo["estado"] == "ok"
+    assert trabajo["reintentado"] is True
+    assert servicio_http.pool is not pool_original
+    assert any("se crea un pool nuevo" in mensaje for mensaje in mensajes)
+
+
+def test_detener_marca_como_cancelados_los_trabajos_en_cola(crear_servicio):
+    servicio_http = crear_servicio(_escribir_salida)
+    subido = _subir(servicio_http)
+    trabajos = [servicio_http.enviar(_config(subido, f"T{numero}", espera=0.3)) for numero in range(4)]
+
+    servicio_http.detener()
+
+    estados = [servicio_http.trabajo(trabajo["id"])["estado"] for trabajo in trabajos]
+    assert "pendiente" not in estados
+    assert "cancelado" in estados
@@ -0,0 +1,60 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+from processors.vigilancia import Vigilante
+
+REGLA = {"patron": "Ventas *.xlsx", "titulo": "Ventas", "id_column": "ID", "sheet_actual": "Datos"}
+
+
+def _vigilante(tmp_path):
+    regla = dict(REGLA, directorio_salida=str(tmp_path / "salida"))
+    return Vigilante({"directorio": str(tmp_path), "salida": str(tmp_path), "reglas": [regla]}, procesos=1)
+
+
+def _trabajo(vigilante, mes):
+    return {"archivo": f"Ventas {mes}.xlsx", "firma": (1, 1), "titulo": "Ventas", "mes": mes,
+            "regla": vigilante.reglas[0], "encolado": 0.0, "espera": 0.0}
+
+
+def _roto():
+    futuro = Future()
+    futuro.set_exception(BrokenProcessPool("proceso muerto"))
+    return futuro
+
+
+def test_periodo_tardio_se_compara_con_su_predecesor(tmp_path):
+    vigilante = _vigilante(tmp_path)
+    vigilante._avanzar("Ventas", "2024-01", "Ventas 2024-01.xlsx")
+    vigilante._avanzar("Ventas", "2024-03", "Ventas 2024-03.xlsx")
+
+    assert vigilante._periodo_anterior("Ventas", "2024-02") == ("2024-01", "Ventas 2024-01.xlsx")
+    assert vigilante._periodo_anterior("Ventas", "2024-01") is None
+
+    config = vigilante._configuracion_trabajo(_trabajo(vigilante, "2024-02"))
+    assert config["mes_anterior"] == "2024-01"
+    assert config["archivo_anterior"] == "Ventas 2024-01.xlsx"
+
+
+def test_trabajo_de_un_pool_roto_se_reintenta_una_vez(tmp_path):
+    vigilante = _vigilante(tmp_path)
+    trabajo = _trabajo(vigilante, "2024-02")
+
+    with mock.patch("processors.vigilancia.ProcessPoolExecutor", ThreadPoolExecutor):
+        vigilante.pool = pool_roto = ThreadPoolExecutor(max_workers=1)
+        trabajo["pool"] = pool_roto
+        vigilante.en_curso = {_roto(): trabajo}
+        vigilante._recoger(0)
+
+        assert vigilante.pool is not pool_roto
+        assert list(vigilante.cola) == [trabajo] and trabajo["reintentado"]
+        assert vigilante.errores == 0
+
+        vigilante.cola.clear()
+        trabajo["pool"] = vigilante.pool
+        vigilante.en_curso = {_roto(): trabajo}
+        vigilante._recoger(0)
+        vigilante.pool.shutdown()
+
+    assert not vigilante.cola
+    assert vigilante.errores == 1
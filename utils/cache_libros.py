@@ -0,0 +1,135 @@
+"""
+Caché de libros (Excel y formatos planos) ya leídos, compartida por la interfaz y el procesador
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+from config.settings import CACHE_CONFIG
+from utils import fuentes
+
+
+class CacheLibros:
+    """
+    Caché LRU acotada por memoria de hojas ya leídas y normalizadas y de los
+    metadatos de los libros (nombres de hojas, encabezados y sondeos); todas
+    las entradas comparten el mismo límite y el mismo orden de expulsión.
+    Las entradas se identifican por ruta + fecha de modificación + tamaño,
+    así que un archivo modificado se vuelve a leer automáticamente.
+    """
+
+    def __init__(self, max_mb: float):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.bytes_usados = 0
+        self._entradas = OrderedDict()  # (tipo, firma, ...) -> valor
+        self._tamanos = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def firma(archivo: str) -> tuple:
+        """Identifica una versión concreta de un archivo."""
+        estado = os.stat(archivo)
+        return os.path.abspath(archivo), estado.st_mtime_ns, estado.st_size
+
+    @staticmethod
+    def _tamano(valor) -> int:
+        """Memoria aproximada de una entrada: DataFrames con memory_usage y el resto por sus elementos."""
+        if isinstance(valor, pd.DataFrame):
+            return int(valor.memory_usage(index=True, deep=True).sum())
+        if isinstance(valor, (list, tuple)):
+            return sys.getsizeof(valor) + sum(CacheLibros._tamano(elemento) for elemento in valor)
+        return sys.getsizeof(valor)
+
+    def _buscar(self, entrada: tuple):
+        """Valor de la entrada (marcada como la más reciente) o None si no está."""
+        valor = self._entradas.get(entrada)
+        if valor is not None:
+            self._entradas.move_to_end(entrada)
+        return valor
+
+    def _memorizar(self, entrada: tuple, calcular):
+        """Devuelve la entrada; si no está, la calcula con calcular() y la guarda."""
+        with self._lock:
+            valor = self._buscar(entrada)
+            if valor is None:
+                valor = calcular()
+                self._guardar(entrada, valor)
+            return valor
+
+    def nombres_hojas(self, archivo: str) -> list[str]:
+        """Devuelve los nombres de las hojas del libro."""
+        return self._memorizar(("nombres", self.firma(archivo)), lambda: fuentes.nombres_hojas(archivo))
+
+    def columnas(self, archivo: str, hoja: str) -> list:
+        """Devuelve los encabezados de la hoja, sin leerla si ya está en caché."""
+        clave = self.firma(archivo)
+        with self._lock:
+            for (tipo, firma, *resto), valor in self._entradas.items():
+                if tipo in ("hoja", "sondeo") and firma == clave and resto[0] == hoja:
+                    return valor.columns.tolist() if tipo == "hoja" else valor[0]
+            return self._memorizar(("columnas", clave, hoja), lambda: fuentes.columnas(archivo, hoja))
+
+    def sondeo(self, archivo: str, hoja: str) -> tuple[list, pd.DataFrame, int | None]:
+        """Encabezados, primeras filas y número de filas de la hoja (ver fuentes.sondear)."""
+        return self._memorizar(("sondeo", self.firma(archivo), hoja), lambda: fuentes.sondear(archivo, hoja))
+
+    def obtener_hojas(self, archivo: str, hojas: list[str], modo: str, cargador) -> dict:
+        """
+        Devuelve {hoja: DataFrame} para las hojas pedidas. Solo se leen las que
+        no están en caché, llamando una vez a cargador(hojas_faltantes) -> dict.
+        """
+        clave = self.firma(archivo)
+        resultado = {}
+        with self._lock:
+            for hoja in hojas:
+                df = self._buscar(("hoja", clave, hoja, modo))
+                if df is not None:
+                    resultado[hoja] = df
+
+        faltantes = [hoja for hoja in dict.fromkeys(hojas) if hoja not in resultado]
+        if faltantes:
+            leidas = cargador(faltantes)
+            with self._lock:
+                for hoja in faltantes:
+                    resultado[hoja] = leidas[hoja]
+                    self._guardar(("hoja", clave, hoja, modo), leidas[hoja])
+
+        # Copias superficiales: quien las reciba puede añadir columnas sin alterar la caché
+        return {hoja: df.copy(deep=False) for hoja, df in resultado.items()}
+
+    def _guardar(self, entrada: tuple, valor):
+        tamano = self._tamano(valor)
+        if tamano > self.max_bytes:
+            return
+        if entrada in self._entradas:
+            del self._entradas[entrada]
+            self.bytes_usados -= self._tamanos.pop(entrada)
+        self._entradas[entrada] = valor
+        self._tamanos[entrada] = tamano
+        self.bytes_usados += tamano
+        self._expulsar()
+
+    def _expulsar(self):
+        while self.bytes_usados > self.max_bytes:
+            expulsada, _ = self._entradas.popitem(last=False)
+            self.bytes_usados -= self._tamanos.pop(expulsada)
+
+    def limitar(self, max_mb: float):
+        """Cambia el límite de memoria (0 desactiva la caché) y expulsa lo que sobre."""
+        with self._lock:
+            self.max_bytes = int(max_mb * 1024 * 1024)
+            self._expulsar()
+
+    def limpiar(self):
+        """Vacía la caché."""
+        with self._lock:
+            self._entradas.clear()
+            self._tamanos.clear()
+            self.bytes_usados = 0
+
+
+# Instancia única del proceso
+cache_libros = CacheLibros(CACHE_CONFIG["MAX_MB"])
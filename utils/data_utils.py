@@ -2,38 +2,185 @@
 Utilidades para el manejo y manipulación de datos
 """
 
+import numpy as np
 import pandas as pd
 
+# Multiplicador para combinar huellas de columnas en una huella por fila
+_PRIMO_HUELLA = np.uint64(0x100000001B3)
+_UNO = np.uint64(1)
+
 
 class DataUtils:
     """Clase con utilidades para el manejo de datos"""
     
     @staticmethod
-    def normalizar_df(df):
-        """Normaliza el DataFrame para comparación."""
-        return df.fillna("").astype(str)
+    def normalizar_df(df, categorico=False):
+        """
+        Normaliza el DataFrame para comparación.
+        Con categorico=True cada columna queda codificada como diccionario
+        (pd.Categorical), mucho más compacta en columnas de baja cardinalidad.
+        """
+        if not categorico:
+            return pd.DataFrame({col: DataUtils._texto_columna(df[col]) for col in df.columns}, index=df.index)
+        return pd.DataFrame(
+            {col: pd.Categorical(DataUtils._texto_columna(df[col])) for col in df.columns},
+            index=df.index)
+
+    @staticmethod
+    def _texto_columna(serie):
+        """
+        Texto de cada celda, con "" para los vacíos. En una columna decimal (p. ej.
+        de enteros con huecos) los valores enteros se escriben sin ".0", igual que
+        en la lectura celda a celda (FileUtils._celda_a_texto): así todos los modos
+        de carga producen el mismo texto.
+        """
+        if not pd.api.types.is_float_dtype(serie):
+            return serie.fillna("").astype(str)
+        texto = serie.astype(str)
+        enteros = serie.notna() & np.isfinite(serie) & (serie == np.floor(serie))
+        if enteros.any():
+            pequenos = enteros & (serie.abs() < 2 ** 63)
+            texto[pequenos] = serie[pequenos].astype(np.int64).astype(str)
+            grandes = enteros & ~pequenos
+            texto[grandes] = serie[grandes].map(lambda valor: str(int(valor)))
+        texto[serie.isna()] = ""
+        return texto
+
+    @staticmethod
+    def es_categorica(serie):
+        return isinstance(serie.dtype, pd.CategoricalDtype)
 
     @staticmethod
-    def alinear_dataframes(df1, df2):
+    def unificar_categorias(df1, df2):
+        """
+        Hace que cada columna categórica comparta el mismo diccionario en ambos
+        DataFrames, de modo que la igualdad se resuelva comparando códigos.
+        No modifica los DataFrames recibidos.
+        """
+        columnas1, columnas2 = {}, {}
+        for col in df1.columns.intersection(df2.columns):
+            s1, s2 = df1[col], df2[col]
+            if not (DataUtils.es_categorica(s1) or DataUtils.es_categorica(s2)):
+                continue
+            cats1 = s1.cat.categories if DataUtils.es_categorica(s1) else pd.Index(s1.dropna().unique())
+            cats2 = s2.cat.categories if DataUtils.es_categorica(s2) else pd.Index(s2.dropna().unique())
+            if cats1.equals(cats2) and DataUtils.es_categorica(s1) and DataUtils.es_categorica(s2):
+                continue
+            categorias = cats1.append(cats2[~cats2.isin(cats1)])
+            tipo = pd.CategoricalDtype(categorias)
+            columnas1[col] = s1.astype(tipo)
+            columnas2[col] = s2.astype(tipo)
+        if columnas1:
+            df1, df2 = df1.copy(deep=False), df2.copy(deep=False)
+            for col in columnas1:
+                df1[col] = columnas1[col]
+                df2[col] = columnas2[col]
+        return df1, df2
+
+    @staticmethod
+    def alinear_dataframes(df1, df2, id_column=None, modo="id"):
         """
         Alinea dos DataFrames para asegurar una comparación adecuada,
         incluso cuando tienen diferentes cantidades de filas o columnas.
+        No modifica los DataFrames recibidos.
+        modo = "id" -> empareja las filas por el valor de id_column (las filas
+                       que solo están en df2 se añaden al final, en su orden)
+        modo = "posicion" -> empareja las filas por posición
+        Si id_column no existe en ambos DataFrames se alinea por posición.
         """
+        # La columna ID debe existir en las hojas originales, antes de completar columnas
+        por_id = modo == "id" and id_column in df1.columns and id_column in df2.columns
+
         # Aseguramos que ambos DataFrames tengan las mismas columnas
         all_columns = sorted(list(set(df1.columns) | set(df2.columns)))
-        
-        # Añadimos columnas faltantes con valores NaN
-        for col in all_columns:
-            if col not in df1.columns:
-                df1[col] = pd.NA
-            if col not in df2.columns:
-                df2[col] = pd.NA
-        
-        # Alineamos ambos DataFrames, permitiendo filas y columnas nuevas
-        df1_aligned, df2_aligned = df1.align(df2, join='outer', axis=None)
-        
-        return df1_aligned, df2_aligned
+        df1, df2 = df1.reindex(columns=all_columns), df2.reindex(columns=all_columns)
+
+        if por_id:
+            claves1, claves2 = DataUtils.claves_alineacion(df1, id_column), DataUtils.claves_alineacion(df2, id_column)
+            # Índice hash sobre las claves: la unión conserva el orden de df1
+            orden = claves1.append(claves2[~claves2.isin(claves1)])
+            df1_aligned = df1.set_axis(claves1).reindex(orden).reset_index(drop=True)
+            df2_aligned = df2.set_axis(claves2).reindex(orden).reset_index(drop=True)
+        else:
+            # Alineamos ambos DataFrames, permitiendo filas y columnas nuevas
+            df1_aligned, df2_aligned = df1.align(df2, join='outer', axis=None)
+
+        # Las columnas codificadas como diccionario comparten categorías
+        return DataUtils.unificar_categorias(df1_aligned, df2_aligned)
+
+    @staticmethod
+    def claves_alineacion(df, id_column):
+        """
+        Clave de emparejamiento por fila: (ID como texto, número de aparición).
+        Los IDs repetidos (o vacíos) se emparejan en orden de aparición.
+        """
+        ids = df[id_column].astype(str).fillna("").reset_index(drop=True)
+        return pd.MultiIndex.from_arrays([ids, ids.groupby(ids, sort=False).cumcount()])
     
+    @staticmethod
+    def texto_comparable(serie):
+        """Devuelve la columna como arreglo de texto, con '' para los nulos."""
+        if DataUtils.es_categorica(serie):
+            serie = serie.astype(object)
+        return serie.fillna("").astype(str).to_numpy(dtype=object)
+
+    @staticmethod
+    def comparables_por_codigo(serie1, serie2):
+        """
+        Indica si valores_comparables compara las dos columnas por sus códigos
+        enteros (comparten diccionario), sin pasar por texto.
+        """
+        return DataUtils.es_categorica(serie1) and DataUtils.es_categorica(serie2) \
+            and serie1.cat.categories.equals(serie2.cat.categories)
+
+    @staticmethod
+    def valores_comparables(serie1, serie2):
+        """
+        Devuelve dos arreglos cuya igualdad elemento a elemento equivale a la de
+        los textos normalizados. Si ambas columnas comparten diccionario se
+        comparan los códigos enteros (los nulos cuentan como '').
+        """
+        if DataUtils.comparables_por_codigo(serie1, serie2):
+            categorias = serie1.cat.categories
+            vacio = categorias.get_loc("") if "" in categorias else -1
+            codigos1 = serie1.cat.codes.to_numpy()
+            codigos2 = serie2.cat.codes.to_numpy()
+            return np.where(codigos1 < 0, vacio, codigos1), np.where(codigos2 < 0, vacio, codigos2)
+        return DataUtils.texto_comparable(serie1), DataUtils.texto_comparable(serie2)
+
+    @staticmethod
+    def huellas_columna(serie, nulos_como_vacio=True):
+        """Calcula un hash de 64 bits por celda de la columna."""
+        if DataUtils.es_categorica(serie):
+            # Se hashea el diccionario una vez y se indexa por código; el
+            # resultado coincide con el hash de los valores en texto
+            if nulos_como_vacio:
+                # El código -1 (nulo) indexa el último elemento, el hash de ''
+                categorias = serie.cat.categories.astype(str).to_numpy(dtype=object)
+                return pd.util.hash_array(np.append(categorias, ""))[serie.cat.codes.to_numpy()]
+            return pd.util.hash_pandas_object(serie, index=False).to_numpy()
+        valores = DataUtils.texto_comparable(serie) if nulos_como_vacio else serie.to_numpy(dtype=object)
+        return pd.util.hash_array(valores)
+
+    @staticmethod
+    def combinar_huellas(huellas_filas, huellas_columna, posicion):
+        """
+        Acumula las huellas de la columna en la posición dada en las huellas por
+        fila. La suma ponderada (módulo 2**64) no depende del orden de
+        acumulación, así que pueden sumarse huellas parciales de fragmentos.
+        """
+        peso = _PRIMO_HUELLA * np.uint64(2 * posicion) + _UNO
+        return huellas_filas + huellas_columna * peso
+
+    @staticmethod
+    def huellas_filas(df, nulos_como_vacio=True):
+        """Calcula una huella por fila sobre todas las columnas, en su orden."""
+        huellas = np.zeros(len(df), dtype=np.uint64)
+        for posicion in range(df.shape[1]):
+            huellas = DataUtils.combinar_huellas(
+                huellas, DataUtils.huellas_columna(df.iloc[:, posicion], nulos_como_vacio), posicion)
+        return huellas
+
     @staticmethod
     def validar_columna_existe(df, columna):
         """Valida si una columna existe en el DataFrame"""
@@ -48,6 +195,23 @@ class DataUtils:
                 id_columns.append(col)
         return id_columns
     
+    @staticmethod
+    def ordenar_columnas_id(df):
+        """
+        Ordena las columnas de una muestra de mayor a menor idoneidad como ID:
+        proporción de filas con un valor no vacío y único dentro de la muestra.
+        A igualdad, se prefieren los nombres que contienen 'id' y después el
+        orden original. Devuelve [(columna, proporción)].
+        """
+        puntuaciones = []
+        for posicion, col in enumerate(df.columns):
+            valores = pd.Series(DataUtils.texto_comparable(df[col]))
+            valores = valores[valores != ""]
+            unicos = int((~valores.duplicated(keep=False)).sum())
+            proporcion = unicos / len(df) if len(df) else 0.0
+            puntuaciones.append((-proporcion, 'id' not in str(col).lower(), posicion, col))
+        return [(col, -negativa) for negativa, _, _, col in sorted(puntuaciones)]
+
     @staticmethod
     def detectar_tipos_datos(df):
         """Detecta y devuelve información sobre los tipos de datos del DataFrame"""
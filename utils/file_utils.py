@@ -3,14 +3,73 @@ Utilidades para el manejo de archivos Excel y formateo
 """
 
 import os
+import numpy as np
+import pandas as pd
+
+from config.settings import FILE_CONFIG
+from utils import lector_xlsx
+from utils.tabla_comparacion import TablaComparacion
 
 
 class FileUtils:
     """Clase con utilidades para el manejo de archivos"""
     
     @staticmethod
-    def escribir_formateado(writer, sheet_name, df, mask_cambios=None, resaltar=False):
-        """Escribe un DataFrame en Excel con formato condicional para resaltar cambios."""
+    def _mascara_resaltado(df, mask_cambios=None):
+        """
+        Calcula de una vez qué celdas se resaltan: las que contienen "➔" o las
+        marcadas en mask_cambios (alineada por etiquetas con df).
+        """
+        mascara = np.zeros(df.shape, dtype=bool)
+        for j in range(df.shape[1]):
+            columna = df.iloc[:, j]
+            if pd.api.types.is_object_dtype(columna) or pd.api.types.is_string_dtype(columna):
+                mascara[:, j] = columna.str.contains("➔", regex=False, na=False).to_numpy(dtype=bool)
+
+        if mask_cambios is not None:
+            if mask_cambios.shape == df.shape and mask_cambios.index.equals(df.index):
+                alineada = mask_cambios
+            else:
+                alineada = mask_cambios.reindex(index=df.index, columns=df.columns, fill_value=False)
+            mascara |= alineada.fillna(False).to_numpy(dtype=bool)
+        return mascara
+
+    @staticmethod
+    def _tramos(fila_mascara):
+        """Divide una fila en tramos contiguos (inicio, fin, resaltado) con el mismo formato."""
+        cortes = np.flatnonzero(np.diff(fila_mascara)) + 1
+        inicios = [0, *cortes.tolist()]
+        fines = [*cortes.tolist(), len(fila_mascara)]
+        return [(inicio, fin, bool(fila_mascara[inicio])) for inicio, fin in zip(inicios, fines)]
+
+    @staticmethod
+    def _bloques(df, mask_cambios, resaltar, filas_por_bloque):
+        """
+        Recorre df por bloques de filas como (inicio, índices, valores, máscara de
+        resaltado). Una TablaComparacion entrega sus bloques ya resueltos y se
+        resaltan sus celdas cambiadas, sin buscar "➔" en el texto.
+        """
+        if isinstance(df, TablaComparacion):
+            for inicio in range(0, len(df), filas_por_bloque):
+                indices, valores, mascara = df.bloque(inicio, inicio + filas_por_bloque)
+                yield inicio, indices.tolist(), valores, mascara if resaltar else None
+            return
+
+        mascara = FileUtils._mascara_resaltado(df, mask_cambios) if resaltar else None
+        for inicio in range(0, df.shape[0], filas_por_bloque):
+            bloque = df.iloc[inicio:inicio + filas_por_bloque]
+            valores = bloque.to_numpy(dtype=object)
+            valores[pd.isna(valores)] = None
+            yield (inicio, bloque.index.tolist(), valores,
+                   mascara[inicio:inicio + filas_por_bloque] if mascara is not None else None)
+
+    @staticmethod
+    def escribir_formateado(writer, sheet_name, df, mask_cambios=None, resaltar=False, filas_por_bloque=10000):
+        """
+        Escribe un DataFrame (o una TablaComparacion) en Excel resaltando los cambios.
+        Las filas se escriben completas (o por tramos con el mismo formato) y en
+        orden, por lo que es compatible con el modo constant_memory de xlsxwriter.
+        """
         workbook = writer.book
         worksheet = workbook.add_worksheet(sheet_name)
         writer.sheets[sheet_name] = worksheet
@@ -20,40 +79,173 @@ class FileUtils:
         formato_cambio = workbook.add_format({'bg_color': '#FF9999', 'border': 1})
         formato_header = workbook.add_format({'bold': True, 'bg_color': '#D9D9D9', 'border': 1})
 
-        # Escribir índice
+        # Escribir encabezados
         worksheet.write(0, 0, "Index", formato_header)
-        for row_idx, index_val in enumerate(df.index, start=1):
-            worksheet.write(row_idx, 0, index_val, formato_general)
+        worksheet.write_row(0, 1, list(df.columns), formato_header)
 
-        # Escribir encabezados
-        for col_idx, col_name in enumerate(df.columns, start=1):
-            worksheet.write(0, col_idx, col_name, formato_header)
-
-        # Escribir datos
-        for row_idx in range(df.shape[0]):
-            for col_idx in range(df.shape[1]):
-                valor = df.iat[row_idx, col_idx]
-                formato = formato_general
-                
-                if resaltar:
-                    if isinstance(valor, str) and "➔" in valor:
-                        formato = formato_cambio
-                    elif mask_cambios is not None and mask_cambios.iat[row_idx, col_idx]:
-                        formato = formato_cambio
-                        
-                worksheet.write(row_idx + 1, col_idx + 1, valor, formato)
+        # Escribir índice y datos por bloques de filas
+        for inicio, indices, valores, mascara in FileUtils._bloques(df, mask_cambios, resaltar, filas_por_bloque):
+            for i, fila in enumerate(valores.tolist()):
+                row_idx = inicio + i + 1
+                worksheet.write(row_idx, 0, indices[i], formato_general)
+
+                fila_mascara = mascara[i] if mascara is not None else None
+                if fila_mascara is None or not fila_mascara.any():
+                    worksheet.write_row(row_idx, 1, fila, formato_general)
+                    continue
+                for desde, hasta, resaltado in FileUtils._tramos(fila_mascara):
+                    formato = formato_cambio if resaltado else formato_general
+                    worksheet.write_row(row_idx, desde + 1, fila[desde:hasta], formato)
 
         # Ajustar ancho de columnas
         worksheet.set_column(0, df.shape[1], 20)
-    
+
+    @staticmethod
+    def _celda_a_texto(valor):
+        """Convierte el valor de una celda al texto usado en la comparación."""
+        if valor is None:
+            return ""
+        if isinstance(valor, float) and valor.is_integer():
+            return str(int(valor))
+        return str(valor)
+
+    @staticmethod
+    def _nombres_columnas(encabezados):
+        """Nombra columnas vacías y duplicadas igual que pandas ('Unnamed: n', 'col.1')."""
+        nombres = []
+        vistos = {}
+        for i, nombre in enumerate(encabezados):
+            if nombre is None:
+                nombre = f"Unnamed: {i}"
+            if nombre in vistos:
+                vistos[nombre] += 1
+                nombre = f"{nombre}.{vistos[nombre]}"
+            vistos.setdefault(nombre, 0)
+            nombres.append(nombre)
+        return nombres
+
+    @staticmethod
+    def _volcar_bloque(bloque, columnas, diccionarios):
+        """Transpone un bloque de filas y añade cada columna como códigos de su diccionario."""
+        for j, (codigos, diccionario) in enumerate(zip(columnas, diccionarios)):
+            textos = [FileUtils._celda_a_texto(fila[j] if j < len(fila) else None) for fila in bloque]
+            codigos.append(np.array([diccionario.setdefault(t, len(diccionario)) for t in textos], dtype=np.int32))
+
+    @staticmethod
+    def leer_hoja_streaming(ruta_archivo, hoja, filas_por_bloque=50000, categorico=False):
+        """
+        Lee una hoja fila a fila con el iterador de solo lectura de openpyxl y
+        devuelve un DataFrame ya normalizado a texto, sin cargar el libro completo.
+        Cada columna se acumula como códigos enteros sobre un diccionario de
+        valores; con categorico=True se devuelve así, como pd.Categorical.
+        """
+        from openpyxl import load_workbook
+
+        libro = load_workbook(ruta_archivo, read_only=True, data_only=True)
+        try:
+            filas = libro[hoja].iter_rows(values_only=True)
+            encabezados = list(next(filas, ()))
+            columnas = [[] for _ in encabezados]
+            diccionarios = [{} for _ in encabezados]
+
+            bloque = []
+            for fila in filas:
+                if any(valor is not None for valor in fila):
+                    bloque.append(fila)
+                if len(bloque) >= filas_por_bloque:
+                    FileUtils._volcar_bloque(bloque, columnas, diccionarios)
+                    bloque = []
+            FileUtils._volcar_bloque(bloque, columnas, diccionarios)
+        finally:
+            libro.close()
+
+        datos = {}
+        nombres = FileUtils._nombres_columnas(encabezados)
+        for nombre, original, partes, diccionario in zip(nombres, encabezados, columnas, diccionarios):
+            codigos = np.concatenate(partes) if partes else np.array([], dtype=np.int32)
+            # Igual que pandas, se descartan columnas sin encabezado ni datos
+            if original is None and not any(diccionario):
+                continue
+            categorias = pd.Index(list(diccionario), dtype=str)
+            if categorico:
+                datos[nombre] = pd.Categorical.from_codes(codigos, categories=categorias)
+            else:
+                datos[nombre] = categorias.take(codigos)
+        return pd.DataFrame(datos)
+
+    @staticmethod
+    def iterar_filas_streaming(ruta_archivo, hoja, ligero=False):
+        """
+        Generador que recorre una hoja en modo solo lectura sin acumularla:
+        primero produce la lista de nombres de columna y después cada fila no
+        vacía como lista de textos, con el mismo criterio que leer_hoja_streaming.
+        Con ligero=True el XML se lee con utils/lector_xlsx.py en lugar de openpyxl.
+        """
+        if ligero:
+            filas = lector_xlsx.iterar_valores(ruta_archivo, hoja)
+            yield from FileUtils._filas_como_texto(filas)
+            return
+
+        from openpyxl import load_workbook
+
+        libro = load_workbook(ruta_archivo, read_only=True, data_only=True)
+        try:
+            yield from FileUtils._filas_como_texto(libro[hoja].iter_rows(values_only=True))
+        finally:
+            libro.close()
+
+    @staticmethod
+    def valores_columna_streaming(ruta_archivo, hoja, posicion):
+        """
+        Generador de (número de fila, texto) de la columna `posicion` (base 0)
+        de una hoja .xlsx, sin decodificar las demás columnas. Se omiten el
+        encabezado y las celdas vacías.
+        """
+        filas = lector_xlsx.iterar_valores(ruta_archivo, hoja, columnas={posicion})
+        for numero, fila in enumerate(filas, start=1):
+            if numero > 1 and posicion < len(fila) and fila[posicion] is not None:
+                yield numero, FileUtils._celda_a_texto(fila[posicion])
+
+    @staticmethod
+    def leer_filas_streaming(ruta_archivo, hoja, numeros):
+        """
+        DataFrame de texto con solo las filas `numeros` (números de fila de la
+        hoja; la 1 es el encabezado), en orden. La lectura se detiene tras la última pedida.
+        """
+        pendientes = set(numeros)
+        filas = lector_xlsx.iterar_valores(ruta_archivo, hoja, filas={1} | pendientes)
+        try:
+            encabezados = list(next(filas, ()))
+            datos = []
+            for numero, fila in enumerate(filas if pendientes else (), start=2):
+                if fila is None:
+                    continue
+                datos.append([FileUtils._celda_a_texto(fila[j] if j < len(fila) else None)
+                              for j in range(len(encabezados))])
+                pendientes.discard(numero)
+                if not pendientes:
+                    break
+        finally:
+            filas.close()
+        return pd.DataFrame(datos, columns=FileUtils._nombres_columnas(encabezados))
+
+    @staticmethod
+    def _filas_como_texto(filas):
+        encabezados = list(next(filas, ()))
+        yield FileUtils._nombres_columnas(encabezados)
+        for fila in filas:
+            if any(valor is not None for valor in fila):
+                yield [FileUtils._celda_a_texto(fila[j] if j < len(fila) else None)
+                       for j in range(len(encabezados))]
+
     @staticmethod
     def validar_archivo_excel(ruta_archivo):
-        """Valida si el archivo es un Excel válido y existe"""
+        """Valida si el archivo existe y tiene un formato compatible (Excel, CSV, Parquet o Feather/Arrow)"""
         if not os.path.exists(ruta_archivo):
             return False, "El archivo no existe"
         
-        if not ruta_archivo.lower().endswith(('.xlsx', '.xls')):
-            return False, "El archivo no es un archivo Excel válido"
+        if not ruta_archivo.lower().endswith(tuple(FILE_CONFIG["EXCEL_EXTENSIONS"])):
+            return False, "El formato del archivo no es compatible"
         
         return True, "Archivo válido"
     
@@ -0,0 +1,201 @@
+"""
+Fuentes de datos: lectores por formato para las instantáneas anterior y actual.
+
+Los libros Excel pueden tener varias hojas; los formatos planos (CSV, Parquet,
+Feather/Arrow IPC) contienen una única tabla, que se presenta como una hoja con
+el nombre del archivo sin extensión. Cada formato usa el lector más rápido
+disponible: pyarrow (CSV multihilo, IPC con memoria mapeada) y, si no está
+instalado, pandas.
+"""
+
+import csv
+import os
+from itertools import islice
+import pandas as pd
+
+from config.settings import FILE_CONFIG
+from utils import lector_xlsx
+from utils.data_utils import DataUtils
+from utils.file_utils import FileUtils
+
+EXTENSIONES_EXCEL = (".xlsx", ".xls")
+
+# extensión -> (leer(ruta) -> DataFrame, columnas(ruta) -> list,
+#              muestra(ruta, filas) -> (DataFrame con las primeras filas, total de filas o None))
+_FORMATOS = {}
+
+
+def registrar_formato(extensiones, leer, columnas, muestra=None):
+    """
+    Registra (o reemplaza) el lector de un formato plano. Sin lector de
+    muestra, sondear() lee la tabla completa y se queda con las primeras filas.
+    """
+    if muestra is None:
+        def muestra(ruta, filas):
+            tabla = leer(ruta)
+            return tabla.head(filas), len(tabla)
+    for extension in extensiones:
+        _FORMATOS[extension.lower()] = (leer, columnas, muestra)
+
+
+def _es_xlsx(ruta: str) -> bool:
+    return es_excel(ruta) and extension(ruta) != ".xls"
+
+
+def extension(ruta: str) -> str:
+    return os.path.splitext(ruta)[1].lower()
+
+
+def es_excel(ruta: str) -> bool:
+    return extension(ruta) in EXTENSIONES_EXCEL
+
+
+def es_compatible(ruta: str) -> bool:
+    return es_excel(ruta) or extension(ruta) in _FORMATOS
+
+
+def _formato(ruta: str):
+    try:
+        return _FORMATOS[extension(ruta)]
+    except KeyError:
+        raise ValueError(f"Formato de archivo no soportado: '{extension(ruta)}'")
+
+
+def nombres_hojas(ruta: str) -> list[str]:
+    """Hojas del libro o, en formatos planos, una única hoja con el nombre del archivo."""
+    if _es_xlsx(ruta):
+        return lector_xlsx.nombres_hojas(ruta)
+    if es_excel(ruta):
+        with pd.ExcelFile(ruta) as excel:
+            return list(excel.sheet_names)
+    _formato(ruta)
+    return [os.path.splitext(os.path.basename(ruta))[0]]
+
+
+def columnas(ruta: str, hoja: str = None) -> list:
+    """Encabezados de la tabla sin leer los datos."""
+    if _es_xlsx(ruta):
+        return sondear(ruta, hoja, 0)[0]
+    if es_excel(ruta):
+        return pd.read_excel(ruta, sheet_name=hoja, nrows=0).columns.tolist()
+    return _formato(ruta)[1](ruta)
+
+
+def leer_tabla(ruta: str, hoja: str = None) -> pd.DataFrame:
+    """Lee la tabla completa sin normalizar; en formatos planos se ignora la hoja."""
+    if es_excel(ruta):
+        return pd.read_excel(ruta, sheet_name=hoja)
+    return _formato(ruta)[0](ruta)
+
+
+def sondear(ruta: str, hoja: str = None, filas: int = None) -> tuple[list, pd.DataFrame, int | None]:
+    """
+    Devuelve (encabezados, primeras filas como texto, número de filas de datos
+    o None si no se conoce) sin leer la tabla completa. En .xlsx solo se lee
+    la etiqueta <dimension> y el principio del XML de la hoja.
+    """
+    filas = FILE_CONFIG["PROBE_ROWS"] if filas is None else filas
+    if _es_xlsx(ruta):
+        declaradas = lector_xlsx.filas_declaradas(lector_xlsx.dimension(ruta, hoja))
+        lector = FileUtils.iterar_filas_streaming(ruta, hoja, ligero=True)
+        try:
+            encabezados = next(lector)
+            muestra = pd.DataFrame(list(islice(lector, filas)), columns=encabezados)
+        finally:
+            lector.close()
+        return encabezados, muestra, declaradas - 1 if declaradas else None
+    if es_excel(ruta):
+        muestra = pd.read_excel(ruta, sheet_name=hoja, nrows=filas)
+        total = None
+    else:
+        muestra, total = _formato(ruta)[2](ruta, filas)
+    return muestra.columns.tolist(), DataUtils.normalizar_df(muestra), total
+
+
+# --- CSV ---------------------------------------------------------------------
+
+def _columnas_csv(ruta: str) -> list:
+    with open(ruta, newline="", encoding=FILE_CONFIG["CSV_ENCODING"]) as archivo:
+        encabezados = next(csv.reader(archivo, delimiter=FILE_CONFIG["CSV_DELIMITER"]), [])
+    # Se quita la marca BOM que deja utf-8 en la primera columna
+    return [encabezados[0].lstrip("\ufeff")] + encabezados[1:] if encabezados else []
+
+
+def _leer_csv(ruta: str) -> pd.DataFrame:
+    """
+    Todas las columnas se leen como texto, igual que se comparan: así no se
+    pierden ceros a la izquierda ni se convierten enteros en decimales.
+    """
+    try:
+        import pyarrow as pa
+        from pyarrow import csv as pa_csv
+    except ImportError:
+        return pd.read_csv(ruta, sep=FILE_CONFIG["CSV_DELIMITER"], encoding=FILE_CONFIG["CSV_ENCODING"],
+                           dtype=str, keep_default_na=False)
+
+    nombres = _columnas_csv(ruta)
+    tabla = pa_csv.read_csv(
+        ruta,
+        read_options=pa_csv.ReadOptions(encoding=FILE_CONFIG["CSV_ENCODING"], use_threads=True),
+        parse_options=pa_csv.ParseOptions(delimiter=FILE_CONFIG["CSV_DELIMITER"]),
+        convert_options=pa_csv.ConvertOptions(column_types={nombre: pa.string() for nombre in nombres}))
+    return tabla.to_pandas()
+
+
+def _muestra_csv(ruta: str, filas: int) -> tuple[pd.DataFrame, None]:
+    muestra = pd.read_csv(ruta, sep=FILE_CONFIG["CSV_DELIMITER"], encoding=FILE_CONFIG["CSV_ENCODING"],
+                          dtype=str, keep_default_na=False, nrows=filas)
+    # Contar las filas exigiría recorrer todo el archivo
+    return muestra, None
+
+
+registrar_formato([".csv"], _leer_csv, _columnas_csv, _muestra_csv)
+
+
+# --- Parquet -----------------------------------------------------------------
+
+def _leer_parquet(ruta: str) -> pd.DataFrame:
+    from pyarrow import parquet as pq
+    return pq.read_table(ruta, memory_map=True, use_threads=True).to_pandas()
+
+
+def _columnas_parquet(ruta: str) -> list:
+    from pyarrow import parquet as pq
+    return pq.read_schema(ruta).names
+
+
+def _muestra_parquet(ruta: str, filas: int) -> tuple[pd.DataFrame, int]:
+    from pyarrow import parquet as pq
+
+    with pq.ParquetFile(ruta, memory_map=True) as archivo:
+        total = archivo.metadata.num_rows
+        lote = next(archivo.iter_batches(batch_size=max(filas, 1)), None)
+        muestra = lote.to_pandas() if lote is not None else archivo.schema_arrow.empty_table().to_pandas()
+    return muestra.head(filas), total
+
+
+registrar_formato([".parquet", ".pq"], _leer_parquet, _columnas_parquet, _muestra_parquet)
+
+
+# --- Feather / Arrow IPC -------------------------------------------------------
+
+def _leer_ipc(ruta: str) -> pd.DataFrame:
+    from pyarrow import feather
+    return feather.read_table(ruta, memory_map=True).to_pandas()
+
+
+def _columnas_ipc(ruta: str) -> list:
+    import pyarrow as pa
+    with pa.memory_map(ruta) as fuente:
+        return pa.ipc.open_file(fuente).schema.names
+
+
+def _muestra_ipc(ruta: str, filas: int) -> tuple[pd.DataFrame, int]:
+    from pyarrow import feather
+
+    # Con memoria mapeada, leer la tabla solo mapea el archivo; se convierten las primeras filas
+    tabla = feather.read_table(ruta, memory_map=True)
+    return tabla.slice(0, filas).to_pandas(), tabla.num_rows
+
+
+registrar_formato([".feather", ".arrow", ".ipc"], _leer_ipc, _columnas_ipc, _muestra_ipc)
@@ -0,0 +1,234 @@
+"""
+Lector ligero de .xlsx: recorre el XML de las hojas directamente desde el zip.
+
+openpyxl crea varios objetos por celda incluso en modo solo lectura; aquí cada
+fila se decodifica a una lista de valores con ElementTree.iterparse y se
+descarta. Produce los mismos valores que iter_rows(values_only=True) de
+openpyxl con data_only=True (cadenas compartidas y en línea, números, booleanos
+y fechas según el formato de la celda).
+"""
+
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+
+_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PAQUETE = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_TIPO_DOCUMENTO = "/officeDocument"
+
+
+def _relaciones(libro: zipfile.ZipFile, miembro: str) -> dict[str, tuple[str, str]]:
+    """Relaciones de un miembro del paquete: id -> (tipo, ruta absoluta dentro del zip)."""
+    carpeta, nombre = posixpath.split(miembro)
+    ruta_rels = posixpath.join(carpeta, "_rels", f"{nombre}.rels")
+    if ruta_rels not in libro.namelist():
+        return {}
+    relaciones = {}
+    for rel in ET.fromstring(libro.read(ruta_rels)).iter(f"{_NS_PAQUETE}Relationship"):
+        destino = rel.get("Target", "")
+        destino = destino.lstrip("/") if destino.startswith("/") else posixpath.normpath(posixpath.join(carpeta, destino))
+        relaciones[rel.get("Id")] = (rel.get("Type", ""), destino)
+    return relaciones
+
+
+def ruta_libro(libro: zipfile.ZipFile) -> str:
+    """Ruta del workbook.xml según el manifiesto del paquete."""
+    for tipo, destino in _relaciones(libro, "").values():
+        if tipo.endswith(_TIPO_DOCUMENTO):
+            return destino
+    return "xl/workbook.xml"
+
+
+def rutas_hojas(libro: zipfile.ZipFile) -> dict[str, str]:
+    """Nombre de cada hoja -> miembro del zip con su XML, en el orden del libro."""
+    miembro = ruta_libro(libro)
+    relaciones = _relaciones(libro, miembro)
+    hojas = {}
+    for hoja in ET.fromstring(libro.read(miembro)).iter(f"{_NS}sheet"):
+        relacion = relaciones.get(hoja.get(f"{_NS_REL}id"))
+        if relacion is not None:
+            hojas[hoja.get("name")] = relacion[1]
+    return hojas
+
+
+class _CadenasCompartidas:
+    """
+    Tabla de cadenas compartidas leída bajo demanda: solo se analiza el XML
+    hasta el índice más alto pedido, así que leer el encabezado y unas pocas
+    filas no recorre toda la tabla de un libro grande.
+    """
+
+    def __init__(self, libro: zipfile.ZipFile, relaciones: dict):
+        ruta = next((destino for tipo, destino in relaciones.values() if tipo.endswith("/sharedStrings")), None)
+        self.cadenas = []
+        self._eventos = ET.iterparse(libro.open(ruta)) if ruta is not None else iter(())
+
+    def __getitem__(self, indice: int) -> str:
+        while indice >= len(self.cadenas):
+            evento = next(self._eventos, None)
+            if evento is None:
+                raise IndexError(f"Cadena compartida {indice} fuera de rango")
+            elemento = evento[1]
+            if elemento.tag == f"{_NS}si":
+                texto = elemento.find(f"{_NS}t")
+                if texto is None:
+                    # Texto enriquecido: se unen los fragmentos <r><t>
+                    self.cadenas.append("".join(r.findtext(f"{_NS}t") or "" for r in elemento.iter(f"{_NS}r")))
+                else:
+                    self.cadenas.append(texto.text or "")
+                elemento.clear()
+        return self.cadenas[indice]
+
+
+def _estilos_fecha(libro: zipfile.ZipFile, relaciones: dict) -> tuple[set, set]:
+    """Índices de estilo de celda con formato de fecha y, entre ellos, los de duración."""
+    from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+
+    ruta = next((destino for tipo, destino in relaciones.values() if tipo.endswith("/styles")), None)
+    if ruta is None:
+        return set(), set()
+    estilos = ET.fromstring(libro.read(ruta))
+    formatos = dict(BUILTIN_FORMATS)
+    for formato in estilos.iter(f"{_NS}numFmt"):
+        formatos[int(formato.get("numFmtId"))] = formato.get("formatCode", "")
+
+    fechas, duraciones = set(), set()
+    celdas = estilos.find(f"{_NS}cellXfs")
+    for indice, xf in enumerate(celdas if celdas is not None else []):
+        codigo = formatos.get(int(xf.get("numFmtId", 0)), "")
+        if is_date_format(codigo):
+            fechas.add(indice)
+            if is_timedelta_format(codigo):
+                duraciones.add(indice)
+    return fechas, duraciones
+
+
+def _columna(referencia: str) -> int:
+    """Índice (base 0) de la columna de una referencia como 'AB12'."""
+    indice = 0
+    for caracter in referencia:
+        if caracter.isdigit():
+            break
+        indice = indice * 26 + ord(caracter.upper()) - 64
+    return indice - 1
+
+
+def _numero(texto: str):
+    # Igual que openpyxl: entero salvo que tenga parte decimal o exponente
+    if "." in texto or "E" in texto or "e" in texto:
+        return float(texto)
+    return int(texto)
+
+
+def nombres_hojas(ruta_archivo: str) -> list[str]:
+    """Nombres de las hojas leyendo solo el manifiesto del libro."""
+    with zipfile.ZipFile(ruta_archivo) as libro:
+        return list(rutas_hojas(libro))
+
+
+def dimension(ruta_archivo: str, hoja: str) -> str | None:
+    """
+    Rango declarado en la etiqueta <dimension> de la hoja (p. ej. 'A1:T20001'),
+    que precede a los datos; solo se descomprime el principio del XML.
+    """
+    with zipfile.ZipFile(ruta_archivo) as libro:
+        hojas = rutas_hojas(libro)
+        if hoja not in hojas:
+            raise ValueError(f"La hoja '{hoja}' no existe en el libro")
+        with libro.open(hojas[hoja]) as archivo:
+            for _, elemento in ET.iterparse(archivo, events=("start",)):
+                if elemento.tag == f"{_NS}dimension":
+                    return elemento.get("ref")
+                if elemento.tag == f"{_NS}sheetData":
+                    return None
+    return None
+
+
+def filas_declaradas(referencia: str | None) -> int | None:
+    """Número de la última fila de un rango como 'A1:T20001' (None si no se conoce)."""
+    if not referencia:
+        return None
+    ultima = referencia.split(":")[-1].lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz$")
+    return int(ultima) if ultima.isdigit() else None
+
+
+def iterar_valores(ruta_archivo: str, hoja: str, columnas: set[int] = None, filas: set[int] = None):
+    """
+    Generador de las filas de una hoja como listas de valores (None en las
+    celdas vacías), desde la fila 1. Las filas ausentes del XML se producen
+    vacías para conservar la numeración. Las fórmulas devuelven
+    su último valor calculado, como openpyxl con data_only=True.
+    columnas: índices (base 0) de las únicas columnas que se decodifican; el resto queda None.
+    filas: números (base 1) de las únicas filas que se decodifican; el resto se produce como None.
+    """
+    from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel, from_ISO8601
+
+    with zipfile.ZipFile(ruta_archivo) as libro:
+        hojas = rutas_hojas(libro)
+        if hoja not in hojas:
+            raise ValueError(f"La hoja '{hoja}' no existe en el libro")
+        miembro_libro = ruta_libro(libro)
+        relaciones = _relaciones(libro, miembro_libro)
+        cadenas = _CadenasCompartidas(libro, relaciones)
+        fechas, duraciones = _estilos_fecha(libro, relaciones)
+        propiedades = ET.fromstring(libro.read(miembro_libro)).find(f"{_NS}workbookPr")
+        es_1904 = propiedades is not None and propiedades.get("date1904") in ("1", "true")
+        epoca = CALENDAR_MAC_1904 if es_1904 else CALENDAR_WINDOWS_1900
+
+        etiqueta_fila, etiqueta_celda = f"{_NS}row", f"{_NS}c"
+        etiqueta_valor, etiqueta_texto = f"{_NS}v", f"{_NS}t"
+        numero_fila = 0
+        with libro.open(hojas[hoja]) as archivo:
+            datos, ancho = None, 0
+            for evento, elemento in ET.iterparse(archivo, events=("start", "end")):
+                if evento == "start":
+                    if elemento.tag == f"{_NS}sheetData":
+                        datos = elemento
+                    continue
+                if elemento.tag == f"{_NS}dimension":
+                    # Como openpyxl, las filas se completan hasta el ancho declarado de la hoja
+                    ancho = _columna(elemento.get("ref", "A1").split(":")[-1]) + 1
+                if elemento.tag != etiqueta_fila:
+                    continue
+                actual = int(elemento.get("r", numero_fila + 1))
+                while numero_fila + 1 < actual:
+                    numero_fila += 1
+                    yield [None] * ancho if filas is None or numero_fila in filas else None
+                numero_fila = actual
+                if filas is not None and actual not in filas:
+                    datos.clear()
+                    yield None
+                    continue
+
+                fila = []
+                for celda in elemento.iter(etiqueta_celda):
+                    referencia = celda.get("r")
+                    columna = _columna(referencia) if referencia else len(fila)
+                    if columnas is not None and columna not in columnas:
+                        continue
+                    tipo = celda.get("t", "n")
+                    if tipo == "inlineStr":
+                        valor = "".join(t.text or "" for t in celda.iter(etiqueta_texto))
+                    else:
+                        valor = celda.findtext(etiqueta_valor) or None
+                        if valor is not None:
+                            if tipo == "n":
+                                valor = _numero(valor)
+                                estilo = int(celda.get("s", 0))
+                                if estilo in fechas:
+                                    valor = from_excel(valor, epoca, timedelta=estilo in duraciones)
+                            elif tipo == "s":
+                                valor = cadenas[int(valor)]
+                            elif tipo == "b":
+                                valor = bool(int(valor))
+                            elif tipo == "d":
+                                valor = from_ISO8601(valor)
+                    if columna >= len(fila):
+                        fila.extend([None] * (columna + 1 - len(fila)))
+                    fila[columna] = valor
+                if len(fila) < ancho:
+                    fila.extend([None] * (ancho - len(fila)))
+                # Se sueltan las filas ya leídas para no acumular el árbol de la hoja
+                datos.clear()
+                yield fila
@@ -0,0 +1,76 @@
+"""
+Instrumentación por etapas: tiempo, CPU, memoria y volumen de datos
+"""
+
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+
+class MedidorEtapas:
+    """
+    Registra por etapa el tiempo de reloj, el tiempo de CPU, el pico de memoria
+    trazada, las filas de entrada/salida y los bytes escritos. Desactivado, cada
+    etapa es un nullcontext y no se mide nada.
+    """
+
+    def __init__(self, activo: bool = False, memoria: bool = False):
+        self.activo = activo
+        self.memoria = activo and memoria
+        self.etapas = []
+
+    def etapa(self, nombre: str, filas_entrada: int = None):
+        """
+        Context manager que mide una etapa. Devuelve un dict en el que la etapa
+        puede anotar "filas_salida" y "archivos" (rutas cuyo tamaño se suma
+        como bytes escritos).
+        """
+        if not self.activo:
+            return nullcontext({"archivos": []})
+        return self._medir(nombre, filas_entrada)
+
+    @contextmanager
+    def _medir(self, nombre: str, filas_entrada: int = None):
+        registro = {"etapa": nombre, "filas_entrada": filas_entrada, "filas_salida": None, "archivos": []}
+        iniciar_traza = self.memoria and not tracemalloc.is_tracing()
+        if iniciar_traza:
+            tracemalloc.start()
+        elif self.memoria:
+            tracemalloc.reset_peak()
+
+        inicio, inicio_cpu = time.perf_counter(), time.process_time()
+        try:
+            yield registro
+        finally:
+            registro["segundos"] = round(time.perf_counter() - inicio, 4)
+            registro["segundos_cpu"] = round(time.process_time() - inicio_cpu, 4)
+            if self.memoria:
+                registro["pico_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 2)
+                if iniciar_traza:
+                    tracemalloc.stop()
+            archivos = registro.pop("archivos")
+            registro["bytes_escritos"] = sum(os.path.getsize(ruta) for ruta in archivos if os.path.exists(ruta))
+            self.etapas.append(registro)
+
+    def tabla_resumen(self) -> list[str]:
+        """Devuelve las líneas de una tabla de texto con las etapas medidas."""
+        lineas = [f"{'Etapa':<28}{'Reloj (s)':>10}{'CPU (s)':>10}{'Pico (MB)':>11}"
+                  f"{'Filas ent.':>12}{'Filas sal.':>12}{'Escrito (MB)':>14}"]
+        for registro in self.etapas:
+            pico = registro.get("pico_mb")
+            lineas.append(
+                f"{registro['etapa']:<28}{registro['segundos']:>10.2f}{registro['segundos_cpu']:>10.2f}"
+                f"{'-' if pico is None else f'{pico:.1f}':>11}"
+                f"{'-' if registro['filas_entrada'] is None else registro['filas_entrada']:>12}"
+                f"{'-' if registro['filas_salida'] is None else registro['filas_salida']:>12}"
+                f"{registro['bytes_escritos'] / 1024 / 1024:>14.2f}")
+        total = sum(registro["segundos"] for registro in self.etapas)
+        lineas.append(f"{'Total':<28}{total:>10.2f}")
+        return lineas
+
+    def guardar_json(self, ruta: str, extra: dict = None):
+        """Guarda las métricas en un archivo JSON."""
+        with open(ruta, "w", encoding="utf-8") as archivo:
+            json.dump({**(extra or {}), "etapas": self.etapas}, archivo, ensure_ascii=False, indent=2)
@@ -0,0 +1,111 @@
+"""
+Tabla de comparación dispersa: solo las celdas cambiadas guardan su texto "anterior ➔ nuevo"
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.data_utils import DataUtils
+
+SEPARADOR_CAMBIO = " ➔ "
+
+
+class TablaComparacion:
+    """
+    Tabla de comparación sin materializar. Las celdas sin cambios se leen de la
+    hoja anterior (fuente) al escribir; las celdas cambiadas guardan su texto
+    "anterior ➔ nuevo" en un arreglo, en el orden de np.nonzero(mascara).
+    Una vista (p. ej. "Solo Cambios") comparte fuente, máscara y textos y solo
+    guarda las posiciones de sus filas.
+    """
+
+    def __init__(self, fuente: pd.DataFrame, mascara: np.ndarray, textos: np.ndarray,
+                 posiciones: np.ndarray = None, _desplazamientos: np.ndarray = None):
+        self.fuente = fuente
+        self.mascara = mascara
+        self.textos = textos
+        self.posiciones = posiciones
+        # Inicio de los textos de cada fila de la fuente dentro de `textos`
+        if _desplazamientos is None:
+            _desplazamientos = np.concatenate(([0], np.cumsum(mascara.sum(axis=1))))
+        self._desplazamientos = _desplazamientos
+
+    @classmethod
+    def construir(cls, df1: pd.DataFrame, df2: pd.DataFrame, mascara) -> "TablaComparacion":
+        """
+        Crea la tabla a partir de dos DataFrames alineados y de la máscara de
+        celdas cambiadas; solo se generan textos para las celdas marcadas. Los
+        nulos se muestran como celda vacía.
+        """
+        mascara = np.asarray(mascara, dtype=bool)
+        filas, columnas = np.nonzero(mascara)
+        textos = np.empty(len(filas), dtype=object)
+
+        # Se agrupan las coordenadas por columna para convertir cada columna una sola vez
+        orden = np.argsort(columnas, kind="stable")
+        limites = np.searchsorted(columnas[orden], np.arange(mascara.shape[1] + 1))
+        for j in range(mascara.shape[1]):
+            grupo = orden[limites[j]:limites[j + 1]]
+            if not len(grupo):
+                continue
+            anteriores = DataUtils.texto_comparable(df1.iloc[filas[grupo], j])
+            nuevos = DataUtils.texto_comparable(df2.iloc[filas[grupo], j])
+            textos[grupo] = anteriores + SEPARADOR_CAMBIO + nuevos
+        return cls(df1, mascara, textos)
+
+    @property
+    def columns(self) -> pd.Index:
+        return self.fuente.columns
+
+    @property
+    def index(self) -> pd.Index:
+        return self.fuente.index if self.posiciones is None else self.fuente.index[self.posiciones]
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return len(self), self.fuente.shape[1]
+
+    def __len__(self) -> int:
+        return len(self.fuente) if self.posiciones is None else len(self.posiciones)
+
+    def filas_con_cambios(self) -> np.ndarray:
+        """Marca las filas de la vista con alguna celda cambiada."""
+        cuentas = np.diff(self._desplazamientos)
+        return (cuentas if self.posiciones is None else cuentas[self.posiciones]) > 0
+
+    def solo_cambios(self) -> "TablaComparacion":
+        """Vista con las filas que tienen cambios; no copia la fuente ni los textos."""
+        posiciones = np.arange(len(self)) if self.posiciones is None else self.posiciones
+        posiciones = posiciones[self.filas_con_cambios()]
+        return TablaComparacion(self.fuente, self.mascara, self.textos, posiciones, self._desplazamientos)
+
+    def bloque(self, inicio: int, fin: int) -> tuple[pd.Index, np.ndarray, np.ndarray]:
+        """
+        Materializa las filas [inicio, fin) de la vista como
+        (índice, valores object con None en los nulos, máscara de cambios).
+        """
+        if self.posiciones is None:
+            fin = min(fin, len(self.fuente))
+            posiciones = np.arange(inicio, max(fin, inicio))
+            sub = self.fuente.iloc[inicio:fin]
+        else:
+            posiciones = self.posiciones[inicio:fin]
+            sub = self.fuente.iloc[posiciones]
+        valores = sub.to_numpy(dtype=object)
+        valores[pd.isna(valores)] = None
+        mascara = self.mascara[posiciones]
+
+        # Los textos de las filas pedidas se recogen con índices vectorizados
+        # porque cada fila ocupa un tramo contiguo de `textos`
+        cuentas = self._desplazamientos[posiciones + 1] - self._desplazamientos[posiciones]
+        total = int(cuentas.sum())
+        if total:
+            desde = np.repeat(self._desplazamientos[posiciones], cuentas)
+            dentro = np.arange(total) - np.repeat(np.cumsum(cuentas) - cuentas, cuentas)
+            valores[mascara] = self.textos[desde + dentro]
+        return sub.index, valores, mascara
+
+    def a_dataframe(self) -> pd.DataFrame:
+        """Materializa la vista completa (solo para volúmenes pequeños o pruebas)."""
+        indice, valores, _ = self.bloque(0, len(self))
+        return pd.DataFrame(valores, index=indice, columns=self.columns)